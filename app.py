@@ -1,14 +1,18 @@
 from flask import Flask, jsonify
-from config import Config
-from extensions import db, migrate, bcrypt, cors, mail, socketio
+from config import Config, validate_socketio_settings
+from extensions import db, migrate, bcrypt, cors, mail, socketio, leaderboard, leaderboard_broadcaster, token_revocation, payment_outbox_worker, mpesa_callback_applier, payment_reconciler, newsletter_delivery_worker, like_counter, socket_rooms
 from flask_jwt_extended import JWTManager
 from resources import api_bp
+from services.http_client import http_client
+from services.socketio_bridge import client_manager_for
+from socketio_events import register_socket_events
 
 jwt = JWTManager()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    validate_socketio_settings(app.config)
 
     # Register blueprints
     app.register_blueprint(api_bp, url_prefix="/api")
@@ -17,7 +21,16 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
     bcrypt.init_app(app)
+    mail.init_app(app)
     jwt.init_app(app)
+    leaderboard.init_app(app)
+    token_revocation.init_app(app)
+    http_client.init_app(app)
+
+    # Reject tokens revoked at logout
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return token_revocation.is_revoked(jwt_payload["jti"])
 
     # CORS for REST API routes
     cors.init_app(app, resources={
@@ -29,11 +42,20 @@ def create_app():
         }
     }, supports_credentials=True)
 
-    # Socket.IO CORS: Allow frontend domains
-    socketio.init_app(app, cors_allowed_origins=[
-        "http://localhost:5173",
-        "https://edu-hive-frontend.vercel.app"
-    ])
+    # Socket.IO CORS: Allow frontend domains. With a message queue, emits from any
+    # worker (or script) reach clients connected to every other worker
+    socketio.init_app(app, cors_allowed_origins=app.config['SOCKETIO_CORS_ORIGINS'],
+        client_manager=client_manager_for(app.config),
+        async_mode=app.config.get('SOCKETIO_ASYNC_MODE'),
+        transports=app.config.get('SOCKETIO_TRANSPORTS'))
+    socket_rooms.init_app(app, socketio)
+    register_socket_events(socketio)
+    leaderboard_broadcaster.init_app(app, socketio, leaderboard)
+    payment_outbox_worker.init_app(app, socketio)
+    mpesa_callback_applier.init_app(app, socketio)
+    payment_reconciler.init_app(app, socketio)
+    newsletter_delivery_worker.init_app(app, socketio)
+    like_counter.init_app(app, socketio, socket_rooms)
 
     # Root health check
     @app.route("/")
@@ -42,6 +64,17 @@ def create_app():
 
     return app
 
+def start_background_workers(app):
+    """Start this process's background jobs; called by the server entry points, not by scripts"""
+    if not app.config.get('BACKGROUND_WORKERS_ENABLED', True):
+        return
+
+    payment_outbox_worker.start()
+    mpesa_callback_applier.start()
+    payment_reconciler.start()
+    newsletter_delivery_worker.start()
+
 if __name__ == "__main__":
     app = create_app()
+    start_background_workers(app)
     socketio.run(app, host="0.0.0.0", port=5000, debug=True)
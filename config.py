@@ -1,5 +1,5 @@
 import os
-from decouple import config
+from decouple import config, Csv
 
 class Config:
     # Basic Flask configuration
@@ -36,17 +36,112 @@ class Config:
     MPESA_CALLBACK_URL = config('MPESA_CALLBACK_URL', default='http://localhost:5000/api/mpesa/callback')
     MPESA_TIMEOUT_URL = config('MPESA_TIMEOUT_URL', default='http://localhost:5000/api/mpesa/timeout')
     
-    # Mailchimp Configuration
+    # Mailchimp Configuration (MAILCHIMP_API_URL defaults to the data center in the API key)
+    MAILCHIMP_API_KEY = config('MAILCHIMP_API_KEY', default=None)
+    MAILCHIMP_AUDIENCE_ID = config('MAILCHIMP_AUDIENCE_ID', default=None)
+    MAILCHIMP_API_URL = config('MAILCHIMP_API_URL', default=None)
+    ADMIN_EMAIL = config('ADMIN_EMAIL', default=None)
+
     SQLALCHEMY_DATABASE_URI = config("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     MAIL_SERVER = config("MAIL_SERVER", default="smtp.gmail.com")
     MAIL_PORT = config("MAIL_PORT", default=587, cast=int)
-    MAIL_USE_TLS = True
+    MAIL_USE_TLS = config("MAIL_USE_TLS", default=True, cast=bool)
     MAIL_USERNAME = config("MAIL_USERNAME")
     MAIL_PASSWORD = config("MAIL_PASSWORD")
+    MAIL_DEFAULT_SENDER = config("MAIL_DEFAULT_SENDER", default=MAIL_USERNAME)
+
+
+
+
+    # Leaderboard configuration ('local' keeps the ranking in-process, 'redis' shares it between workers)
+    LEADERBOARD_BACKEND = config('LEADERBOARD_BACKEND', default='local')
+    LEADERBOARD_REFRESH_SECONDS = config('LEADERBOARD_REFRESH_SECONDS', default=60, cast=int)
+    LEADERBOARD_REDIS_KEY = config('LEADERBOARD_REDIS_KEY', default='eduhive:leaderboard')
+    LEADERBOARD_BROADCAST_WINDOW = config('LEADERBOARD_BROADCAST_WINDOW', default=1.0, cast=float)
+    LEADERBOARD_BROADCAST_SIZE = config('LEADERBOARD_BROADCAST_SIZE', default=10, cast=int)
+    # Sequence and last pushed board shared by the workers when SOCKETIO_BACKEND=redis
+    LEADERBOARD_BROADCAST_REDIS_KEY = config('LEADERBOARD_BROADCAST_REDIS_KEY', default='eduhive:leaderboard:broadcast')
+    REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+
+    # Token revocation ('sql' uses the revoked_tokens table, 'redis' uses REDIS_URL)
+    JWT_REVOCATION_BACKEND = config('JWT_REVOCATION_BACKEND', default='sql')
+    JWT_REVOCATION_SYNC_SECONDS = config('JWT_REVOCATION_SYNC_SECONDS', default=5, cast=int)
+    JWT_REVOCATION_BLOOM_CAPACITY = config('JWT_REVOCATION_BLOOM_CAPACITY', default=100000, cast=int)
+    JWT_REVOCATION_REDIS_PREFIX = config('JWT_REVOCATION_REDIS_PREFIX', default='eduhive:revoked')
+
+    # Outbound HTTP (M-Pesa, Google, Mailchimp): seconds, retries for idempotent calls, pooled connections per host
+    OUTBOUND_HTTP_CONNECT_TIMEOUT = config('OUTBOUND_HTTP_CONNECT_TIMEOUT', default=3.05, cast=float)
+    OUTBOUND_HTTP_READ_TIMEOUT = config('OUTBOUND_HTTP_READ_TIMEOUT', default=30, cast=float)
+    OUTBOUND_HTTP_RETRIES = config('OUTBOUND_HTTP_RETRIES', default=2, cast=int)
+    OUTBOUND_HTTP_POOL_SIZE = config('OUTBOUND_HTTP_POOL_SIZE', default=20, cast=int)
+
+    # Background jobs started by run.py / app.py in every server process
+    BACKGROUND_WORKERS_ENABLED = config('BACKGROUND_WORKERS_ENABLED', default=True, cast=bool)
+
+    # STK push outbox worker
+    PAYMENT_OUTBOX_CONCURRENCY = config('PAYMENT_OUTBOX_CONCURRENCY', default=4, cast=int)
+    PAYMENT_OUTBOX_POLL_SECONDS = config('PAYMENT_OUTBOX_POLL_SECONDS', default=0.5, cast=float)
+    PAYMENT_OUTBOX_MAX_ATTEMPTS = config('PAYMENT_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+    PAYMENT_OUTBOX_LOCK_SECONDS = config('PAYMENT_OUTBOX_LOCK_SECONDS', default=120, cast=int)
+
+    # M-Pesa callback applier: callbacks per batch, and how long and how often an unmatched one is retried
+    MPESA_CALLBACK_BATCH_SIZE = config('MPESA_CALLBACK_BATCH_SIZE', default=200, cast=int)
+    MPESA_CALLBACK_POLL_SECONDS = config('MPESA_CALLBACK_POLL_SECONDS', default=0.5, cast=float)
+    MPESA_CALLBACK_UNMATCHED_SECONDS = config('MPESA_CALLBACK_UNMATCHED_SECONDS', default=600, cast=int)
+    MPESA_CALLBACK_RETRY_SECONDS = config('MPESA_CALLBACK_RETRY_SECONDS', default=5, cast=int)
+
+    # Payment reconciler: STK queries for payments whose callback never came, capped at RATE queries per second
+    PAYMENT_RECONCILE_INTERVAL_SECONDS = config('PAYMENT_RECONCILE_INTERVAL_SECONDS', default=60, cast=float)
+    PAYMENT_RECONCILE_STALE_SECONDS = config('PAYMENT_RECONCILE_STALE_SECONDS', default=120, cast=int)
+    PAYMENT_RECONCILE_BATCH_SIZE = config('PAYMENT_RECONCILE_BATCH_SIZE', default=100, cast=int)
+    PAYMENT_RECONCILE_CONCURRENCY = config('PAYMENT_RECONCILE_CONCURRENCY', default=8, cast=int)
+    PAYMENT_RECONCILE_RATE = config('PAYMENT_RECONCILE_RATE', default=5, cast=float)
+    # Payments whose push may have reached Safaricom but got no answer are timed out after this long without a callback
+    PAYMENT_UNCONFIRMED_SECONDS = config('PAYMENT_UNCONFIRMED_SECONDS', default=900, cast=int)
+
+    # Newsletter delivery queue: signup emails and Mailchimp upserts sent by background workers
+    NEWSLETTER_DELIVERY_CONCURRENCY = config('NEWSLETTER_DELIVERY_CONCURRENCY', default=2, cast=int)
+    NEWSLETTER_DELIVERY_BATCH_SIZE = config('NEWSLETTER_DELIVERY_BATCH_SIZE', default=50, cast=int)
+    NEWSLETTER_DELIVERY_POLL_SECONDS = config('NEWSLETTER_DELIVERY_POLL_SECONDS', default=1.0, cast=float)
+    NEWSLETTER_DELIVERY_MAX_ATTEMPTS = config('NEWSLETTER_DELIVERY_MAX_ATTEMPTS', default=5, cast=int)
+    NEWSLETTER_DELIVERY_LOCK_SECONDS = config('NEWSLETTER_DELIVERY_LOCK_SECONDS', default=300, cast=int)
 
+    # Bulk subscriber import: rows per upsert, and how many row errors the report lists
+    SUBSCRIBER_IMPORT_CHUNK_SIZE = config('SUBSCRIBER_IMPORT_CHUNK_SIZE', default=1000, cast=int)
+    SUBSCRIBER_IMPORT_MAX_ERRORS = config('SUBSCRIBER_IMPORT_MAX_ERRORS', default=1000, cast=int)
 
+    # Community feed: posts per page (and the most a client may ask for), and comments inlined per post
+    COMMUNITY_FEED_PAGE_SIZE = config('COMMUNITY_FEED_PAGE_SIZE', default=20, cast=int)
+    COMMUNITY_FEED_MAX_PAGE_SIZE = config('COMMUNITY_FEED_MAX_PAGE_SIZE', default=50, cast=int)
+    COMMUNITY_FEED_COMMENTS = config('COMMUNITY_FEED_COMMENTS', default=3, cast=int)
 
+    # Community likes: seconds of likes summed into one counter update and broadcast per post
+    COMMUNITY_LIKE_FLUSH_SECONDS = config('COMMUNITY_LIKE_FLUSH_SECONDS', default=1.0, cast=float)
+
+    # Socket.IO message queue ('none' for one process, 'redis' shares emits between workers through
+    # SOCKETIO_MESSAGE_QUEUE, 'local' bridges servers inside one process for tests)
+    SOCKETIO_BACKEND = config('SOCKETIO_BACKEND', default='none')
+    SOCKETIO_MESSAGE_QUEUE = config('SOCKETIO_MESSAGE_QUEUE', default=REDIS_URL)
+    SOCKETIO_CHANNEL = config('SOCKETIO_CHANNEL', default='eduhive-socketio')
+
+    # Socket.IO server: async mode ('eventlet', 'gevent' or 'threading'; empty picks whatever is
+    # installed), transports ('websocket' alone when several workers sit behind one port) and the
+    # browser origins allowed to connect
+    SOCKETIO_ASYNC_MODE = config('SOCKETIO_ASYNC_MODE', default='') or None
+    SOCKETIO_TRANSPORTS = config('SOCKETIO_TRANSPORTS', default='polling,websocket', cast=Csv())
+    SOCKETIO_CORS_ORIGINS = config(
+        'SOCKETIO_CORS_ORIGINS',
+        default='http://localhost:5173,https://edu-hive-frontend.vercel.app',
+        cast=Csv()
+    )
+
+    # Socket.IO rooms: forum/post rooms one socket may be subscribed to at once
+    SOCKET_MAX_ROOMS = config('SOCKET_MAX_ROOMS', default=50, cast=int)
+
+    # Auth cache: seconds a user's role/approval state is reused between requests
+    AUTH_CACHE_TTL = config('AUTH_CACHE_TTL', default=30, cast=int)
+    AUTH_CACHE_SIZE = config('AUTH_CACHE_SIZE', default=10000, cast=int)
 
     # Other configurations
     DEBUG = config('DEBUG', default=True, cast=bool)
@@ -56,6 +151,33 @@ class Config:
     # CORS settings
     CORS_ORIGINS = config('CORS_ORIGINS', default='*')
 
+SOCKETIO_ASYNC_MODES = ('eventlet', 'gevent', 'threading')
+SOCKETIO_BACKENDS = ('none', 'redis', 'local')
+
+
+def validate_socketio_settings(settings, workers=1):
+    """Raise ValueError for Socket.IO settings that can't work with this many server processes"""
+    async_mode = settings.get('SOCKETIO_ASYNC_MODE')
+    backend = settings.get('SOCKETIO_BACKEND', 'none')
+    transports = settings.get('SOCKETIO_TRANSPORTS') or ['polling', 'websocket']
+
+    if async_mode and async_mode not in SOCKETIO_ASYNC_MODES:
+        raise ValueError(f"Unknown SOCKETIO_ASYNC_MODE: {async_mode}")
+    if backend not in SOCKETIO_BACKENDS:
+        raise ValueError(f"Unknown SOCKETIO_BACKEND: {backend}")
+    unknown = set(transports) - {'polling', 'websocket'}
+    if unknown:
+        raise ValueError(f"Unknown SOCKETIO_TRANSPORTS: {', '.join(sorted(unknown))}")
+
+    if workers > 1:
+        # Each worker only knows its own sockets; emits must travel through a shared queue
+        if backend != 'redis':
+            raise ValueError("Several workers need SOCKETIO_BACKEND=redis so emits reach every worker's clients")
+        # Long-polling needs every request of a session to hit the same worker, which gunicorn can't promise
+        if 'polling' in transports:
+            raise ValueError("Several workers behind one port need SOCKETIO_TRANSPORTS=websocket (no sticky sessions)")
+
+
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = config(
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+# Unit tests run against an in-memory database and never reach real services
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough-for-hs256')
+os.environ.setdefault('MAIL_USERNAME', 'test@example.com')
+os.environ.setdefault('MAIL_PASSWORD', 'test')
+
+# test_mpesa.py drives a running server against the Daraja sandbox; run it by hand with python
+collect_ignore = ['test_mpesa.py']
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
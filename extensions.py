@@ -7,10 +7,20 @@ from flask_jwt_extended import JWTManager
 from flask_socketio import SocketIO
 from flask_mail import Mail
 
+from services.leaderboard_service import LeaderboardEngine
+from services.leaderboard_broadcaster import LeaderboardBroadcaster
+from services.token_revocation import TokenRevocationStore
+from services.payment_outbox import PaymentOutboxWorker
+from services.mpesa_callbacks import MpesaCallbackApplier
+from services.payment_reconciler import PaymentReconciler
+from services.newsletter_delivery import NewsletterDeliveryWorker
+from services.like_counter import LikeCounter
+from services.socket_rooms import SocketRoomRegistry
+
 
 
 jwt = JWTManager()
-blacklist = set()
+token_revocation = TokenRevocationStore()
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -21,3 +31,12 @@ mail = Mail()
 
 # socketio = SocketIO()
 socketio = SocketIO(cors_allowed_origins="*") 
+
+leaderboard = LeaderboardEngine()
+leaderboard_broadcaster = LeaderboardBroadcaster()
+payment_outbox_worker = PaymentOutboxWorker()
+mpesa_callback_applier = MpesaCallbackApplier()
+payment_reconciler = PaymentReconciler()
+newsletter_delivery_worker = NewsletterDeliveryWorker()
+like_counter = LikeCounter()
+socket_rooms = SocketRoomRegistry()
@@ -0,0 +1,37 @@
+"""Production server settings: gunicorn -c gunicorn.conf.py run:app
+
+Websockets are long-lived, so the default worker is eventlet: one process
+holds thousands of sockets as green threads instead of pinning an OS
+thread (or a whole sync worker) per client. SOCKETIO_ASYNC_MODE=threading
+falls back to gthread workers with SOCKETIO_THREADS threads each, which
+caps a worker at that many sockets.
+"""
+import os
+
+# Must be settled before Config is read so the app and the worker class agree
+if not os.environ.get('SOCKETIO_ASYNC_MODE'):
+    os.environ['SOCKETIO_ASYNC_MODE'] = 'eventlet'
+
+from config import Config, validate_socketio_settings  # noqa: E402
+
+WORKER_CLASSES = {
+    'eventlet': 'eventlet',
+    'gevent': 'gevent',
+    'threading': 'gthread',
+}
+
+async_mode = Config.SOCKETIO_ASYNC_MODE
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+validate_socketio_settings(vars(Config), workers)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = WORKER_CLASSES[async_mode]
+# Open sockets per eventlet/gevent worker
+worker_connections = int(os.getenv('SOCKETIO_WORKER_CONNECTIONS', '2000'))
+threads = int(os.getenv('SOCKETIO_THREADS', '100')) if async_mode == 'threading' else 1
+
+# Websocket requests stay open for as long as the client does
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
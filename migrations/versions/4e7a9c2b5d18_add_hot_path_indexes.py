@@ -0,0 +1,79 @@
+"""add indexes for hot filter columns
+
+Revision ID: 4e7a9c2b5d18
+Revises: 8c1d2f4a7b9e
+Create Date: 2026-10-17 11:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7a9c2b5d18'
+down_revision = '8c1d2f4a7b9e'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    with op.batch_alter_table('quiz_attempts', schema=None) as batch_op:
+        batch_op.create_index('ix_quiz_attempts_quiz_id_user_id_status', ['quiz_id', 'user_id', 'status'], unique=False)
+        batch_op.create_index('ix_quiz_attempts_user_id_status', ['user_id', 'status'], unique=False)
+        batch_op.create_index('ix_quiz_attempts_quiz_id_status_time_completed', ['quiz_id', 'status', 'time_completed'], unique=False)
+        batch_op.create_index('ix_quiz_attempts_status_time_completed', ['status', 'time_completed'], unique=False)
+
+    with op.batch_alter_table('question_attempts', schema=None) as batch_op:
+        batch_op.create_index('ix_question_attempts_quiz_attempt_id_question_id', ['quiz_attempt_id', 'question_id'], unique=False)
+
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.create_index('ix_quiz_questions_quiz_id_order_index', ['quiz_id', 'order_index'], unique=False)
+
+    with op.batch_alter_table('quizzes', schema=None) as batch_op:
+        batch_op.create_index('ix_quizzes_is_active_deadline', ['is_active', 'deadline'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quizzes_created_by'), ['created_by'], unique=False)
+
+    with op.batch_alter_table('leaderboard_entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_leaderboard_entries_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_leaderboard_entries_points'), ['points'], unique=False)
+
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_status_created_at', ['status', 'created_at'], unique=False)
+
+    # community_posts is not created by the earlier migrations on every database
+    if _has_table('community_posts'):
+        with op.batch_alter_table('community_posts', schema=None) as batch_op:
+            batch_op.create_index('ix_community_posts_forum_created_at', ['forum', 'created_at'], unique=False)
+
+
+def downgrade():
+    if _has_table('community_posts'):
+        with op.batch_alter_table('community_posts', schema=None) as batch_op:
+            batch_op.drop_index('ix_community_posts_forum_created_at')
+
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('ix_payments_status_created_at')
+
+    with op.batch_alter_table('leaderboard_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_leaderboard_entries_points'))
+        batch_op.drop_index(batch_op.f('ix_leaderboard_entries_user_id'))
+
+    with op.batch_alter_table('quizzes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quizzes_created_by'))
+        batch_op.drop_index('ix_quizzes_is_active_deadline')
+
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.drop_index('ix_quiz_questions_quiz_id_order_index')
+
+    with op.batch_alter_table('question_attempts', schema=None) as batch_op:
+        batch_op.drop_index('ix_question_attempts_quiz_attempt_id_question_id')
+
+    with op.batch_alter_table('quiz_attempts', schema=None) as batch_op:
+        batch_op.drop_index('ix_quiz_attempts_status_time_completed')
+        batch_op.drop_index('ix_quiz_attempts_quiz_id_status_time_completed')
+        batch_op.drop_index('ix_quiz_attempts_user_id_status')
+        batch_op.drop_index('ix_quiz_attempts_quiz_id_user_id_status')
@@ -0,0 +1,36 @@
+"""add quiz stats rollup
+
+Revision ID: 8c1d2f4a7b9e
+Revises: 36fe040b0096
+Create Date: 2026-10-17 09:12:40.318511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1d2f4a7b9e'
+down_revision = '36fe040b0096'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('quiz_stats',
+    sa.Column('quiz_id', sa.String(length=50), nullable=False),
+    sa.Column('total_attempts', sa.Integer(), nullable=False),
+    sa.Column('unique_users', sa.Integer(), nullable=False),
+    sa.Column('passed_attempts', sa.Integer(), nullable=False),
+    sa.Column('score_total', sa.Float(), nullable=False),
+    sa.Column('score_counts', sa.JSON(), nullable=True),
+    sa.Column('time_total', sa.Integer(), nullable=False),
+    sa.Column('timed_attempts', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id')
+    )
+
+
+def downgrade():
+    op.drop_table('quiz_stats')
@@ -0,0 +1,28 @@
+"""add mpesa callbacks reference
+
+Revision ID: a3d7f1c9e642
+Revises: e8a4c6d2f931
+Create Date: 2026-10-17 22:41:08.317205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7f1c9e642'
+down_revision = 'e8a4c6d2f931'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('mpesa_callbacks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reference', sa.String(length=100), nullable=True))
+        batch_op.create_index(batch_op.f('ix_mpesa_callbacks_reference'), ['reference'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('mpesa_callbacks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_mpesa_callbacks_reference'))
+        batch_op.drop_column('reference')
@@ -0,0 +1,26 @@
+"""add payments created_at id index
+
+Revision ID: a7c3e5f9b214
+Revises: f4b8d2c6a913
+Create Date: 2026-10-17 16:52:13.918204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f9b214'
+down_revision = 'f4b8d2c6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('ix_payments_created_at_id')
@@ -0,0 +1,41 @@
+"""add revoked tokens
+
+Revision ID: b3f5d8e1a6c4
+Revises: 4e7a9c2b5d18
+Create Date: 2026-10-17 12:41:09.873215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f5d8e1a6c4'
+down_revision = '4e7a9c2b5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=False),
+    sa.Column('token_type', sa.String(length=10), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_jti'), ['jti'], unique=True)
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_revoked_at'), ['revoked_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_revoked_tokens_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_revoked_tokens_revoked_at'))
+        batch_op.drop_index(batch_op.f('ix_revoked_tokens_jti'))
+
+    op.drop_table('revoked_tokens')
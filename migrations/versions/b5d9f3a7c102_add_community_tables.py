@@ -0,0 +1,64 @@
+"""add community tables
+
+Revision ID: b5d9f3a7c102
+Revises: d3f7b1c8e520
+Create Date: 2026-10-17 19:26:40.118352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d9f3a7c102'
+down_revision = 'd3f7b1c8e520'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _has_index(table, name):
+    return any(index['name'] == name for index in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def upgrade():
+    # Some databases already have these tables from db.create_all(); only fill in what's missing
+    if not _has_table('community_posts'):
+        op.create_table('community_posts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('forum', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('likes', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_index('community_posts', 'ix_community_posts_forum_created_at'):
+        with op.batch_alter_table('community_posts', schema=None) as batch_op:
+            batch_op.create_index('ix_community_posts_forum_created_at', ['forum', 'created_at'], unique=False)
+
+    if not _has_table('comments'):
+        op.create_table('comments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['post_id'], ['community_posts.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_index('comments', 'ix_comments_post_id_created_at'):
+        with op.batch_alter_table('comments', schema=None) as batch_op:
+            batch_op.create_index('ix_comments_post_id_created_at', ['post_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    # The tables may predate this migration, so only the comments index is removed
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index('ix_comments_post_id_created_at')
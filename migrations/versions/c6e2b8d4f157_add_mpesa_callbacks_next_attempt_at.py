@@ -0,0 +1,26 @@
+"""add mpesa callbacks next attempt at
+
+Revision ID: c6e2b8d4f157
+Revises: a3d7f1c9e642
+Create Date: 2026-10-17 23:12:44.905126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e2b8d4f157'
+down_revision = 'a3d7f1c9e642'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('mpesa_callbacks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('mpesa_callbacks', schema=None) as batch_op:
+        batch_op.drop_column('next_attempt_at')
@@ -0,0 +1,26 @@
+"""add newsletter subscribed_at index
+
+Revision ID: c9e2a4b6d817
+Revises: a7c3e5f9b214
+Create Date: 2026-10-17 17:31:46.502719
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e2a4b6d817'
+down_revision = 'a7c3e5f9b214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('newsletter_subscribers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_newsletter_subscribers_subscribed_at'), ['subscribed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('newsletter_subscribers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_newsletter_subscribers_subscribed_at'))
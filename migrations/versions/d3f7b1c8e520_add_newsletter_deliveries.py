@@ -0,0 +1,48 @@
+"""add newsletter deliveries
+
+Revision ID: d3f7b1c8e520
+Revises: c9e2a4b6d817
+Create Date: 2026-10-17 18:14:02.337160
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f7b1c8e520'
+down_revision = 'c9e2a4b6d817'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('newsletter_deliveries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscriber_id', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(length=30), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('claim_token', sa.String(length=36), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['subscriber_id'], ['newsletter_subscribers.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('newsletter_deliveries', schema=None) as batch_op:
+        batch_op.create_index('ix_newsletter_deliveries_status_available_at', ['status', 'available_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_newsletter_deliveries_subscriber_id'), ['subscriber_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_newsletter_deliveries_claim_token'), ['claim_token'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('newsletter_deliveries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_newsletter_deliveries_claim_token'))
+        batch_op.drop_index(batch_op.f('ix_newsletter_deliveries_subscriber_id'))
+        batch_op.drop_index('ix_newsletter_deliveries_status_available_at')
+
+    op.drop_table('newsletter_deliveries')
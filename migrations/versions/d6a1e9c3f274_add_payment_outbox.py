@@ -0,0 +1,50 @@
+"""add payment outbox
+
+Revision ID: d6a1e9c3f274
+Revises: b3f5d8e1a6c4
+Create Date: 2026-10-17 14:05:52.219664
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6a1e9c3f274'
+down_revision = 'b3f5d8e1a6c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mpesa_checkout_request_id', sa.String(length=100), nullable=True))
+        batch_op.create_index(batch_op.f('ix_payments_mpesa_checkout_request_id'), ['mpesa_checkout_request_id'], unique=True)
+
+    op.create_table('payment_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payment_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['payment_id'], ['payments.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('payment_id')
+    )
+    with op.batch_alter_table('payment_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_outbox_status_available_at', ['status', 'available_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_outbox_status_available_at')
+
+    op.drop_table('payment_outbox')
+
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payments_mpesa_checkout_request_id'))
+        batch_op.drop_column('mpesa_checkout_request_id')
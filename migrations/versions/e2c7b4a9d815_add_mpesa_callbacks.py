@@ -0,0 +1,42 @@
+"""add mpesa callbacks
+
+Revision ID: e2c7b4a9d815
+Revises: d6a1e9c3f274
+Create Date: 2026-10-17 15:22:37.610458
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c7b4a9d815'
+down_revision = 'd6a1e9c3f274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('mpesa_callbacks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('checkout_request_id', sa.String(length=100), nullable=False),
+    sa.Column('merchant_request_id', sa.String(length=100), nullable=True),
+    sa.Column('result_code', sa.Integer(), nullable=True),
+    sa.Column('result_desc', sa.String(length=200), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('applied_at', sa.DateTime(), nullable=True),
+    sa.Column('outcome', sa.String(length=20), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'checkout_request_id', name='uq_mpesa_callbacks_kind_checkout_request_id')
+    )
+    with op.batch_alter_table('mpesa_callbacks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_mpesa_callbacks_applied_at'), ['applied_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('mpesa_callbacks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_mpesa_callbacks_applied_at'))
+
+    op.drop_table('mpesa_callbacks')
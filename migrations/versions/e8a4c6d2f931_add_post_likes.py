@@ -0,0 +1,38 @@
+"""add post likes
+
+Revision ID: e8a4c6d2f931
+Revises: b5d9f3a7c102
+Create Date: 2026-10-17 20:05:17.662904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a4c6d2f931'
+down_revision = 'b5d9f3a7c102'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_likes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['post_id'], ['community_posts.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('post_id', 'user_id', name='uq_post_likes_post_id_user_id')
+    )
+    with op.batch_alter_table('post_likes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_post_likes_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post_likes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_post_likes_user_id'))
+
+    op.drop_table('post_likes')
@@ -0,0 +1,26 @@
+"""add payments status updated_at index
+
+Revision ID: f4b8d2c6a913
+Revises: e2c7b4a9d815
+Create Date: 2026-10-17 16:08:51.204377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8d2c6a913'
+down_revision = 'e2c7b4a9d815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_status_updated_at', ['status', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('ix_payments_status_updated_at')
@@ -9,12 +9,18 @@ from .user import User
 from flask import Blueprint
 from flask_restful import Api
 from .payment import Payment
+from .payment_outbox import PaymentOutbox
+from .mpesa_callback import MpesaCallback
 from .leaderboard import LeaderboardEntry
 from .newsletter import NewsletterSubscriber  # Import the newsletter subscriber model
+from .newsletter_delivery import NewsletterDelivery
 from .subscription import Subscription
 from .testimonial import Testimonial
 from .quiz import Quiz, QuizQuestion, QuestionAttempt
 from .quiz_attempt import QuizAttempt
+from .quiz_stats import QuizStats
+from .revoked_token import RevokedToken
+from .community import CommunityPost, Comment, PostLike
 
 
 # from .stats import UserStats
@@ -4,6 +4,9 @@ from datetime import datetime
 
 class CommunityPost(db.Model, SerializerMixin):
     __tablename__ = 'community_posts'
+    __table_args__ = (
+        db.Index('ix_community_posts_forum_created_at', 'forum', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -20,6 +23,10 @@ class CommunityPost(db.Model, SerializerMixin):
 
 class Comment(db.Model, SerializerMixin):
     __tablename__ = 'comments'
+    __table_args__ = (
+        # Counting and picking the latest comments of a page of posts
+        db.Index('ix_comments_post_id_created_at', 'post_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('community_posts.id'), nullable=False)
@@ -28,3 +35,15 @@ class Comment(db.Model, SerializerMixin):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     serialize_rules = ('-post.comments', '-author.password_hash',)
+
+class PostLike(db.Model):
+    """One user's like of a post; CommunityPost.likes is the running total"""
+    __tablename__ = 'post_likes'
+    __table_args__ = (
+        db.UniqueConstraint('post_id', 'user_id', name='uq_post_likes_post_id_user_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('community_posts.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -6,9 +6,9 @@ class LeaderboardEntry(db.Model):
     __tablename__ = 'leaderboard_entries'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
 
-    points = db.Column(db.Integer, default=0, nullable=False)
+    points = db.Column(db.Integer, default=0, nullable=False, index=True)
     activity_type = db.Column(db.String(50), nullable=False)  # e.g., "Courses", "Quizzes"
     joined_date = db.Column(db.Date, default=datetime.utcnow)
 
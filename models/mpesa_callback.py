@@ -0,0 +1,30 @@
+from extensions import db
+from datetime import datetime
+
+class MpesaCallback(db.Model):
+    """Append-only log of callbacks received from Safaricom"""
+    __tablename__ = 'mpesa_callbacks'
+    __table_args__ = (
+        # Safaricom retries deliveries; a second copy of the same callback is dropped
+        db.UniqueConstraint('kind', 'checkout_request_id', name='uq_mpesa_callbacks_kind_checkout_request_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # result, timeout, query
+    checkout_request_id = db.Column(db.String(100), nullable=False)
+    merchant_request_id = db.Column(db.String(100), nullable=True)
+    # Our checkout_request_id, echoed back through the ref parameter of the CallBackURL
+    reference = db.Column(db.String(100), nullable=True, index=True)
+    result_code = db.Column(db.Integer, nullable=True)
+    result_desc = db.Column(db.String(200), nullable=True)
+    payload = db.Column(db.JSON)
+
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Set once the callback has been applied to its payment (or given up on)
+    applied_at = db.Column(db.DateTime, nullable=True, index=True)
+    outcome = db.Column(db.String(20), nullable=True)  # applied, ignored, unmatched
+    # Unmatched callbacks are left out of batches until then
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<MpesaCallback {self.kind} {self.checkout_request_id}>'
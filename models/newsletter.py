@@ -9,4 +9,4 @@ class NewsletterSubscriber(db.Model, SerializerMixin):
     name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20), nullable=False, unique=True)
     email = db.Column(db.String(120), nullable=False, unique=True)
-    subscribed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    subscribed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,35 @@
+from extensions import db
+from datetime import datetime
+
+class NewsletterDelivery(db.Model):
+    """Queued side effect of a newsletter signup: an email or a Mailchimp upsert"""
+    __tablename__ = 'newsletter_deliveries'
+    __table_args__ = (
+        db.Index('ix_newsletter_deliveries_status_available_at', 'status', 'available_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subscriber_id = db.Column(db.Integer, db.ForeignKey('newsletter_subscribers.id'), nullable=True, index=True)
+
+    # Possible kinds: confirmation_email, admin_email, mailchimp
+    kind = db.Column(db.String(30), nullable=False)
+    # Name, email and phone at signup time, so the delivery doesn't depend on later edits
+    payload = db.Column(db.JSON, nullable=False)
+
+    # Possible statuses: pending, processing, sent, dead
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.String(500), nullable=True)
+
+    # Earliest time the delivery may be (re)tried, and which worker batch holds it
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    claim_token = db.Column(db.String(36), nullable=True, index=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    subscriber = db.relationship('NewsletterSubscriber', backref='deliveries')
+
+    def __repr__(self):
+        return f'<NewsletterDelivery {self.id}: {self.kind} {self.status}>'
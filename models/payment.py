@@ -1,12 +1,34 @@
 from extensions import db
 from datetime import datetime
 
+# Allowed status changes; completed, failed and cancelled are final, and a
+# timeout can still be overtaken by the real result arriving late
+PAYMENT_TRANSITIONS = {
+    'pending': {'sent_to_phone', 'unconfirmed', 'completed', 'failed', 'cancelled', 'timeout'},
+    'sent_to_phone': {'completed', 'failed', 'cancelled', 'timeout'},
+    # The push may or may not have reached the phone; settled by its callback or expired by the reconciler
+    'unconfirmed': {'completed', 'failed', 'cancelled', 'timeout'},
+    'timeout': {'completed', 'failed', 'cancelled'},
+    'completed': set(),
+    'failed': set(),
+    'cancelled': set(),
+}
+
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_status_created_at', 'status', 'created_at'),
+        # Reconciler sweep for payments stuck in one status
+        db.Index('ix_payments_status_updated_at', 'status', 'updated_at'),
+        # Keyset pagination and exports, newest or oldest first
+        db.Index('ix_payments_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     checkout_request_id = db.Column(db.String(100), unique=True, nullable=False, index=True)
     merchant_request_id = db.Column(db.String(100), nullable=True, index=True)
+    # CheckoutRequestID assigned by Safaricom once the STK push is accepted
+    mpesa_checkout_request_id = db.Column(db.String(100), unique=True, nullable=True, index=True)
     phone_number = db.Column(db.String(15), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     account_reference = db.Column(db.String(100), nullable=True)
@@ -18,7 +40,7 @@ class Payment(db.Model):
     
     # Status tracking - Updated statuses
     status = db.Column(db.String(20), default='pending')  
-    # Possible statuses: pending, sent_to_phone, completed, failed, cancelled, timeout
+    # Possible statuses: pending, sent_to_phone, unconfirmed, completed, failed, cancelled, timeout
     
     result_code = db.Column(db.Integer, nullable=True)
     result_desc = db.Column(db.String(200), nullable=True)
@@ -29,12 +51,22 @@ class Payment(db.Model):
     
     def __repr__(self):
         return f'<Payment {self.checkout_request_id}: {self.status}>'
+
+    @staticmethod
+    def can_transition(from_status, to_status):
+        return to_status in PAYMENT_TRANSITIONS.get(from_status, set())
+
+    @staticmethod
+    def statuses_allowing(to_status):
+        """Statuses a payment may move to `to_status` from"""
+        return sorted(status for status, targets in PAYMENT_TRANSITIONS.items() if to_status in targets)
     
     def to_dict(self):
         return {
             'id': self.id,
             'checkout_request_id': self.checkout_request_id,
             'merchant_request_id': self.merchant_request_id,
+            'mpesa_checkout_request_id': self.mpesa_checkout_request_id,
             'phone_number': self.phone_number,
             'amount': self.amount,
             'account_reference': self.account_reference,
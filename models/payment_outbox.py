@@ -0,0 +1,28 @@
+from extensions import db
+from datetime import datetime
+
+class PaymentOutbox(db.Model):
+    __tablename__ = 'payment_outbox'
+    __table_args__ = (
+        db.Index('ix_payment_outbox_status_available_at', 'status', 'available_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.Integer, db.ForeignKey('payments.id'), unique=True, nullable=False)
+
+    # Possible statuses: pending, processing, sent, unconfirmed, failed
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.String(500), nullable=True)
+
+    # Earliest time the job may be (re)tried, and when a worker claimed it
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    payment = db.relationship('Payment', backref=db.backref('outbox', uselist=False))
+
+    def __repr__(self):
+        return f'<PaymentOutbox {self.id}: payment {self.payment_id} {self.status}>'
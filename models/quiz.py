@@ -1,11 +1,15 @@
 from extensions import db
+from sqlalchemy import func, case
 from sqlalchemy_serializer import SerializerMixin
 from datetime import datetime
 
 class Quiz(db.Model, SerializerMixin):
     __tablename__ = 'quizzes'
+    __table_args__ = (
+        db.Index('ix_quizzes_is_active_deadline', 'is_active', 'deadline'),
+    )
 
-    serialize_rules = ('-quiz_attempts.quiz', '-module.quizzes', '-questions.quiz')
+    serialize_rules = ('-quiz_attempts.quiz', '-module.quizzes', '-questions.quiz', '-stats')
 
     id = db.Column(db.String(50), primary_key=True)
     unit = db.Column(db.String(10), nullable=False)
@@ -23,7 +27,7 @@ class Quiz(db.Model, SerializerMixin):
 
     # Foreign keys
     module_id = db.Column(db.Integer, db.ForeignKey('modules.id'), nullable=True)
-    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
 
     # Relationships
     module = db.relationship('Module', backref='quizzes')
@@ -50,27 +54,67 @@ class Quiz(db.Model, SerializerMixin):
         from models.quiz_attempt import QuizAttempt
         return QuizAttempt.query.filter_by(quiz_id=self.id, user_id=user_id).all()
 
-    def get_user_best_score(self, user_id):
+    @staticmethod
+    def get_user_attempt_summaries(user_id, quiz_ids=None):
+        """Get attempt count, best score and completed flag per quiz for a user in one query"""
+        from models.quiz_attempt import QuizAttempt
+
+        query = db.session.query(
+            QuizAttempt.quiz_id,
+            func.count(QuizAttempt.id).label('attempts_count'),
+            func.max(QuizAttempt.score).label('best_score'),
+            func.max(case((QuizAttempt.status == 'completed', 1), else_=0)).label('has_completed')
+        ).filter(QuizAttempt.user_id == user_id)
+
+        if quiz_ids is not None:
+            query = query.filter(QuizAttempt.quiz_id.in_(quiz_ids))
+
+        return {
+            row.quiz_id: {
+                'attempts_count': row.attempts_count,
+                'best_score': row.best_score,
+                'has_completed': bool(row.has_completed)
+            }
+            for row in query.group_by(QuizAttempt.quiz_id).all()
+        }
+
+    def get_user_attempt_summary(self, user_id):
+        """Get the attempt summary for a specific user on this quiz"""
+        summaries = Quiz.get_user_attempt_summaries(user_id, quiz_ids=[self.id])
+        return summaries.get(self.id) or dict(EMPTY_ATTEMPT_SUMMARY)
+
+    def get_user_best_score(self, user_id, summary=None):
         """Get user's best score for this quiz"""
-        attempts = self.get_user_attempts(user_id)
-        if not attempts:
-            return None
-        return max(attempt.score for attempt in attempts)
+        if summary is None:
+            summary = self.get_user_attempt_summary(user_id)
+        return summary['best_score']
 
-    def can_user_attempt(self, user_id):
+    def can_user_attempt(self, user_id, summary=None):
         """Check if user can attempt this quiz"""
         if not self.is_active or self.status != 'Active':
             return False, "Quiz is not available"
 
-        attempts = self.get_user_attempts(user_id)
-        if len(attempts) >= self.max_attempts:
+        if summary is None:
+            summary = self.get_user_attempt_summary(user_id)
+        if summary['attempts_count'] >= self.max_attempts:
             return False, f"Maximum attempts ({self.max_attempts}) exceeded"
 
         return True, "Can attempt"
 
 
+# Summary used for quizzes the user has never attempted
+EMPTY_ATTEMPT_SUMMARY = {
+    'attempts_count': 0,
+    'best_score': None,
+    'has_completed': False
+}
+
+
 class QuizQuestion(db.Model, SerializerMixin):
     __tablename__ = 'quiz_questions'
+    __table_args__ = (
+        db.Index('ix_quiz_questions_quiz_id_order_index', 'quiz_id', 'order_index'),
+    )
 
     serialize_rules = ('-quiz.questions', '-quiz_attempts.question')
 
@@ -109,6 +153,9 @@ class QuizQuestion(db.Model, SerializerMixin):
 
 class QuestionAttempt(db.Model, SerializerMixin):
     __tablename__ = 'question_attempts'
+    __table_args__ = (
+        db.Index('ix_question_attempts_quiz_attempt_id_question_id', 'quiz_attempt_id', 'question_id'),
+    )
 
     serialize_rules = ('-quiz_attempt.question_attempts', '-question.question_attempts')
 
@@ -124,4 +171,32 @@ class QuestionAttempt(db.Model, SerializerMixin):
     question_id = db.Column(db.Integer, db.ForeignKey('quiz_questions.id'), nullable=False)
 
     def __repr__(self):
-        return f'<QuestionAttempt {self.id}: Q{self.question_id} - {"Correct" if self.is_correct else "Incorrect"}>'
\ No newline at end of file
+        return f'<QuestionAttempt {self.id}: Q{self.question_id} - {"Correct" if self.is_correct else "Incorrect"}>'
+
+    @staticmethod
+    def get_accuracy_by_question(quiz_id):
+        """Get answer totals, correct counts and difficulty per question across completed attempts"""
+        from models.quiz_attempt import QuizAttempt
+        from utils.helpers import get_accuracy_difficulty_rating
+
+        rows = db.session.query(
+            QuestionAttempt.question_id,
+            func.count(QuestionAttempt.id).label('total_attempts'),
+            func.coalesce(func.sum(case((QuestionAttempt.is_correct.is_(True), 1), else_=0)), 0).label('correct_answers')
+        ).join(
+            QuizAttempt, QuizAttempt.id == QuestionAttempt.quiz_attempt_id
+        ).filter(
+            QuizAttempt.quiz_id == quiz_id,
+            QuizAttempt.status == 'completed'
+        ).group_by(QuestionAttempt.question_id).all()
+
+        accuracy = {}
+        for row in rows:
+            accuracy_rate = (row.correct_answers / row.total_attempts) * 100
+            accuracy[row.question_id] = {
+                'total_attempts': row.total_attempts,
+                'correct_answers': int(row.correct_answers),
+                'accuracy_rate': accuracy_rate,
+                'difficulty_rating': get_accuracy_difficulty_rating(accuracy_rate)
+            }
+        return accuracy
\ No newline at end of file
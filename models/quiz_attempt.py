@@ -1,9 +1,16 @@
 from extensions import db
+from sqlalchemy import func, case
 from sqlalchemy_serializer import SerializerMixin
 from datetime import datetime
 
 class QuizAttempt(db.Model, SerializerMixin):
     __tablename__ = 'quiz_attempts'
+    __table_args__ = (
+        db.Index('ix_quiz_attempts_quiz_id_user_id_status', 'quiz_id', 'user_id', 'status'),
+        db.Index('ix_quiz_attempts_user_id_status', 'user_id', 'status'),
+        db.Index('ix_quiz_attempts_quiz_id_status_time_completed', 'quiz_id', 'status', 'time_completed'),
+        db.Index('ix_quiz_attempts_status_time_completed', 'status', 'time_completed'),
+    )
 
     serialize_rules = ('-user.quiz_attempts', '-quiz.quiz_attempts', '-question_attempts.quiz_attempt')
 
@@ -34,17 +41,85 @@ class QuizAttempt(db.Model, SerializerMixin):
 
     def calculate_score(self):
         """Calculate and update the score based on question attempts"""
-        if not self.question_attempts:
+        from models.quiz import QuizQuestion, QuestionAttempt
+
+        totals = db.session.query(
+            func.count(QuestionAttempt.id),
+            func.coalesce(func.sum(QuestionAttempt.points_earned), 0),
+            func.coalesce(func.sum(QuizQuestion.points), 0),
+            func.coalesce(func.sum(case((QuestionAttempt.is_correct.is_(True), 1), else_=0)), 0)
+        ).join(
+            QuizQuestion, QuizQuestion.id == QuestionAttempt.question_id
+        ).filter(
+            QuestionAttempt.quiz_attempt_id == self.id
+        ).one()
+
+        answered, total_points, max_points, correct_count = totals
+        if not answered:
             return 0.0
 
-        total_points = sum(qa.points_earned for qa in self.question_attempts)
-        max_points = sum(qa.question.points for qa in self.question_attempts)
-        correct_count = sum(1 for qa in self.question_attempts if qa.is_correct)
+        return self._apply_totals(answered, total_points, max_points, correct_count)
+
+    def grade_answers(self, answers):
+        """Grade submitted answers in memory and bulk insert the question attempts"""
+        from models.quiz import QuizQuestion, QuestionAttempt
+
+        # One query for the quiz's questions and one for answers already recorded
+        questions = {
+            question.id: question
+            for question in QuizQuestion.query.filter_by(quiz_id=self.quiz_id).all()
+        }
+        graded = {
+            row.question_id: (row.is_correct, row.points_earned or 0)
+            for row in db.session.query(
+                QuestionAttempt.question_id,
+                QuestionAttempt.is_correct,
+                QuestionAttempt.points_earned
+            ).filter(QuestionAttempt.quiz_attempt_id == self.id).all()
+        }
+
+        new_rows = []
+        for question_id, user_answer in answers.items():
+            try:
+                question_id = int(question_id)
+            except (TypeError, ValueError):
+                continue
+
+            question = questions.get(question_id)
+            # Skip unknown questions and answers that were already submitted
+            if not question or question_id in graded:
+                continue
+
+            is_correct = question.is_correct_answer(user_answer)
+            points_earned = question.points if is_correct else 0
+
+            new_rows.append({
+                'quiz_attempt_id': self.id,
+                'question_id': question_id,
+                'user_answer': str(user_answer),
+                'is_correct': is_correct,
+                'points_earned': points_earned
+            })
+            graded[question_id] = (is_correct, points_earned)
+
+        if new_rows:
+            db.session.bulk_insert_mappings(QuestionAttempt, new_rows)
+
+        if not graded:
+            return 0.0
+
+        total_points = sum(points for _, points in graded.values())
+        max_points = sum(questions[qid].points or 0 for qid in graded if qid in questions)
+        correct_count = sum(1 for is_correct, _ in graded.values() if is_correct)
 
+        return self._apply_totals(len(graded), total_points, max_points, correct_count)
+
+    def _apply_totals(self, answered, total_points, max_points, correct_count):
+        """Store score totals on the attempt and return the percentage score"""
         self.total_points = total_points
         self.max_points = max_points
         self.correct_answers = correct_count
-        self.total_questions = len(self.question_attempts)
+        self.total_questions = answered
 
         # Calculate percentage score
         if max_points > 0:
@@ -54,8 +129,14 @@ class QuizAttempt(db.Model, SerializerMixin):
 
         return self.score
 
-    def submit_attempt(self):
+    def submit_attempt(self, answers=None):
         """Mark the attempt as completed and calculate final score"""
+        # Grade the submitted answers in memory, or fall back to the stored ones
+        if answers is not None:
+            self.grade_answers(answers)
+        else:
+            self.calculate_score()
+
         self.status = 'completed'
         self.time_completed = datetime.utcnow()
 
@@ -63,11 +144,20 @@ class QuizAttempt(db.Model, SerializerMixin):
             time_diff = self.time_completed - self.time_started
             self.time_taken = int(time_diff.total_seconds())
 
-        self.calculate_score()
+        # Keep the per-quiz rollup in step with the completed attempts
+        from models.quiz_stats import QuizStats
+        QuizStats.record_attempt(self)
+
         db.session.commit()
 
         return self.score
 
+    @staticmethod
+    def passed_case():
+        """SQL expression that is 1 for a passed attempt (query must join Quiz)"""
+        from models.quiz import Quiz
+        return case((QuizAttempt.score >= Quiz.passing_score, 1), else_=0)
+
     @property
     def is_passed(self):
         """Check if the attempt passed based on quiz passing score"""
@@ -0,0 +1,235 @@
+from extensions import db
+from sqlalchemy import func, case
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from utils.helpers import calculate_grade_from_score
+
+class QuizStats(db.Model):
+    __tablename__ = 'quiz_stats'
+
+    quiz_id = db.Column(db.String(50), db.ForeignKey('quizzes.id'), primary_key=True)
+    total_attempts = db.Column(db.Integer, default=0, nullable=False)
+    unique_users = db.Column(db.Integer, default=0, nullable=False)
+    passed_attempts = db.Column(db.Integer, default=0, nullable=False)
+    score_total = db.Column(db.Float, default=0.0, nullable=False)
+    # Number of completed attempts per exact score, e.g. {"85.0": 3}
+    score_counts = db.Column(db.JSON, default=dict)
+    time_total = db.Column(db.Integer, default=0, nullable=False)
+    timed_attempts = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    quiz = db.relationship('Quiz', backref=db.backref('stats', uselist=False, cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<QuizStats {self.quiz_id}: {self.total_attempts} attempts>'
+
+    @classmethod
+    def get_for_update(cls, quiz_id):
+        """Get the locked stats row for a quiz, creating it if needed"""
+        stats = cls.query.filter_by(quiz_id=quiz_id).with_for_update().first()
+        if stats:
+            return stats
+
+        stats = cls(quiz_id=quiz_id, total_attempts=0, unique_users=0, passed_attempts=0,
+                    score_total=0.0, score_counts={}, time_total=0, timed_attempts=0)
+        try:
+            with db.session.begin_nested():
+                db.session.add(stats)
+        except IntegrityError:
+            # Another submission created the row first
+            stats = cls.query.filter_by(quiz_id=quiz_id).with_for_update().one()
+        return stats
+
+    @classmethod
+    def record_attempt(cls, attempt):
+        """Fold a newly completed attempt into its quiz's stats row"""
+        from models.quiz_attempt import QuizAttempt
+
+        # Lock first: a concurrent submit by the same user then sees this one as committed
+        stats = cls.get_for_update(attempt.quiz_id)
+
+        is_new_user = QuizAttempt.query.filter(
+            QuizAttempt.quiz_id == attempt.quiz_id,
+            QuizAttempt.user_id == attempt.user_id,
+            QuizAttempt.status == 'completed',
+            QuizAttempt.id != attempt.id
+        ).first() is None
+
+        score = attempt.score or 0.0
+
+        stats.total_attempts += 1
+        stats.score_total += score
+        if is_new_user:
+            stats.unique_users += 1
+        if attempt.is_passed:
+            stats.passed_attempts += 1
+        if attempt.time_taken:
+            stats.time_total += attempt.time_taken
+            stats.timed_attempts += 1
+
+        # Reassign the JSON column so the change is persisted
+        score_counts = dict(stats.score_counts or {})
+        key = str(float(score))
+        score_counts[key] = score_counts.get(key, 0) + 1
+        stats.score_counts = score_counts
+
+        return stats
+
+    @staticmethod
+    def _aggregate(quiz_id=None):
+        """Stats values computed from the completed attempts, keyed by quiz id"""
+        from models.quiz import Quiz
+        from models.quiz_attempt import QuizAttempt
+
+        totals_query = db.session.query(
+            QuizAttempt.quiz_id,
+            func.count(QuizAttempt.id).label('total_attempts'),
+            func.count(func.distinct(QuizAttempt.user_id)).label('unique_users'),
+            func.coalesce(func.sum(QuizAttempt.passed_case()), 0).label('passed_attempts'),
+            func.coalesce(func.sum(QuizAttempt.score), 0).label('score_total'),
+            func.coalesce(func.sum(QuizAttempt.time_taken), 0).label('time_total'),
+            func.coalesce(func.sum(case((QuizAttempt.time_taken > 0, 1), else_=0)), 0).label('timed_attempts')
+        ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(
+            QuizAttempt.status == 'completed'
+        )
+        scores_query = db.session.query(
+            QuizAttempt.quiz_id,
+            QuizAttempt.score,
+            func.count(QuizAttempt.id).label('count')
+        ).filter(QuizAttempt.status == 'completed')
+
+        if quiz_id is not None:
+            totals_query = totals_query.filter(QuizAttempt.quiz_id == quiz_id)
+            scores_query = scores_query.filter(QuizAttempt.quiz_id == quiz_id)
+
+        score_counts = {}
+        for row in scores_query.group_by(QuizAttempt.quiz_id, QuizAttempt.score).all():
+            counts = score_counts.setdefault(row.quiz_id, {})
+            key = str(float(row.score or 0.0))
+            counts[key] = counts.get(key, 0) + row.count
+
+        return {
+            row.quiz_id: {
+                'total_attempts': row.total_attempts,
+                'unique_users': row.unique_users,
+                'passed_attempts': int(row.passed_attempts),
+                'score_total': float(row.score_total),
+                'score_counts': score_counts.get(row.quiz_id, {}),
+                'time_total': int(row.time_total),
+                'timed_attempts': int(row.timed_attempts),
+                'updated_at': datetime.utcnow()
+            }
+            for row in totals_query.group_by(QuizAttempt.quiz_id).all()
+        }
+
+    @classmethod
+    def rebuild(cls, quiz_id=None):
+        """Recompute stats rows from the raw attempts, for one quiz or all of them.
+
+        The stats rows are locked before the attempts are read, so
+        record_attempt calls wait for the rebuild instead of being lost.
+        """
+        locked_query = cls.query
+        if quiz_id is not None:
+            locked_query = locked_query.filter(cls.quiz_id == quiz_id)
+        existing = {stats.quiz_id: stats for stats in locked_query.with_for_update().all()}
+
+        rows = cls._aggregate(quiz_id)
+        for stats_quiz_id, values in rows.items():
+            stats = existing.pop(stats_quiz_id, None)
+            if stats is None:
+                # The quiz's first attempt arrived after the lock; lock its new row and count again
+                stats = cls.get_for_update(stats_quiz_id)
+                values = cls._aggregate(stats_quiz_id).get(stats_quiz_id, values)
+            for key, value in values.items():
+                setattr(stats, key, value)
+
+        # Quizzes left without completed attempts
+        for stats in existing.values():
+            db.session.delete(stats)
+        db.session.commit()
+
+        return len(rows)
+
+    @classmethod
+    def for_quizzes(cls, quiz_ids):
+        """Get stats rows keyed by quiz id for a list of quizzes"""
+        if not quiz_ids:
+            return {}
+        return {stats.quiz_id: stats for stats in cls.query.filter(cls.quiz_id.in_(quiz_ids)).all()}
+
+    @classmethod
+    def summary_for(cls, quiz_id):
+        """Get the statistics dict for a quiz, zeroed if it has no attempts"""
+        stats = cls.query.get(quiz_id)
+        return stats.to_dict() if stats else cls.empty_dict()
+
+    @staticmethod
+    def empty_dict():
+        return {
+            'total_attempts': 0,
+            'unique_users': 0,
+            'average_score': 0,
+            'median_score': 0,
+            'highest_score': 0,
+            'lowest_score': 0,
+            'pass_rate': 0,
+            'grade_distribution': {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'F': 0},
+            'average_time': 0,
+            'average_time_taken': 0
+        }
+
+    def _sorted_score_counts(self):
+        return sorted((float(score), count) for score, count in (self.score_counts or {}).items())
+
+    @property
+    def average_score(self):
+        return self.score_total / self.total_attempts if self.total_attempts else 0
+
+    @property
+    def pass_rate(self):
+        return (self.passed_attempts / self.total_attempts) * 100 if self.total_attempts else 0
+
+    @property
+    def median_score(self):
+        """Median of the completed scores, read from the score counts"""
+        if not self.total_attempts:
+            return 0
+
+        # Positions of the middle value(s) in the sorted list of scores
+        lower = (self.total_attempts - 1) // 2
+        upper = self.total_attempts // 2
+        lower_score = upper_score = None
+        seen = 0
+        for score, count in self._sorted_score_counts():
+            seen += count
+            if lower_score is None and seen > lower:
+                lower_score = score
+            if seen > upper:
+                upper_score = score
+                break
+
+        return (lower_score + upper_score) / 2
+
+    @property
+    def grade_distribution(self):
+        grade_distribution = {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'F': 0}
+        for score, count in self._sorted_score_counts():
+            grade_distribution[calculate_grade_from_score(score)] += count
+        return grade_distribution
+
+    def to_dict(self):
+        scores = self._sorted_score_counts()
+
+        return {
+            'total_attempts': self.total_attempts,
+            'unique_users': self.unique_users,
+            'average_score': round(self.average_score, 2),
+            'median_score': round(self.median_score, 2),
+            'highest_score': scores[-1][0] if scores else 0,
+            'lowest_score': scores[0][0] if scores else 0,
+            'pass_rate': round(self.pass_rate, 2),
+            'grade_distribution': self.grade_distribution,
+            'average_time': round(self.time_total / self.timed_attempts, 0) if self.timed_attempts else 0,
+            'average_time_taken': self.time_total / self.total_attempts if self.total_attempts else 0
+        }
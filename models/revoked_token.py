@@ -0,0 +1,16 @@
+from extensions import db
+from datetime import datetime
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    token_type = db.Column(db.String(10), default='access')
+    user_id = db.Column(db.Integer, nullable=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Null when the token itself never expires
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
@@ -15,6 +15,14 @@ from resources.admin.testimonial_admin import admin_testimonial_bp
 from resources.admin.subscriptions import admin_subscriptions_bp
 from resources.admin.admin_leaderboard import admin_leaderboard_bp
 
+from resources.mpesa_resources import (
+    STKPushResource, PaymentStatusResource, MpesaCallbackResource,
+    MpesaTimeoutResource, PaymentsListResource, PaymentsExportResource
+)
+
+from resources.learner.community import CommunityPostsResource, LikePostResource, PostCommentResource
+from resources.admin.metrics import SocketMetricsResource, HttpClientMetricsResource
+
 # Quiz imports - Add these to your existing imports section
 from resources.learner.quizzes import (
     QuizzesListResource,
@@ -84,6 +92,28 @@ api.add_resource(GoogleLogin, "/auth/google-login")
 api.add_resource(ContributorModuleListResource, "/contributor/modules")
 api.add_resource(ContributorModuleResource, "/contributor/modules/<int:module_id>")
 
+# ============================================================================
+# M-PESA ROUTES
+# ============================================================================
+
+# Paths match MPESA_CALLBACK_URL / MPESA_TIMEOUT_URL and test_mpesa.py
+api.add_resource(STKPushResource, '/mpesa/stk-push')
+api.add_resource(PaymentStatusResource, '/mpesa/status/<string:checkout_request_id>')
+api.add_resource(MpesaCallbackResource, '/mpesa/callback')
+api.add_resource(MpesaTimeoutResource, '/mpesa/timeout')
+api.add_resource(PaymentsListResource, '/mpesa/payments')
+api.add_resource(PaymentsExportResource, '/mpesa/payments/export')
+
+# ============================================================================
+# COMMUNITY ROUTES
+# ============================================================================
+
+api.add_resource(CommunityPostsResource, '/community/posts')
+api.add_resource(LikePostResource, '/community/posts/<int:post_id>/like')
+api.add_resource(PostCommentResource, '/community/posts/<int:post_id>/comments')
+api.add_resource(SocketMetricsResource, '/admin/socket-metrics')
+api.add_resource(HttpClientMetricsResource, '/admin/http-metrics')
+
 # ============================================================================
 # NEW QUIZ ROUTES
 # ============================================================================
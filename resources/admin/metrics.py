@@ -0,0 +1,21 @@
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+from extensions import socket_rooms
+from services.http_client import http_client
+from utils.decorators import admin_required
+
+
+class SocketMetricsResource(Resource):
+    @jwt_required()
+    @admin_required
+    def get(self):
+        """Room fan-out per Socket.IO event for this process, next to global broadcasts"""
+        return socket_rooms.metrics(), 200
+
+
+class HttpClientMetricsResource(Resource):
+    @jwt_required()
+    @admin_required
+    def get(self):
+        """Outbound request counts, retries and latency per host for this process"""
+        return http_client.metrics(), 200
@@ -3,11 +3,13 @@ from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from extensions import db
-from models.quiz import Quiz, QuizQuestion
+from models.quiz import Quiz, QuizQuestion, QuestionAttempt
 from models.quiz_attempt import QuizAttempt
+from models.quiz_stats import QuizStats
 from models.user import User
 from utils.decorators import admin_required
-from sqlalchemy import func, desc
+from utils.helpers import get_daily_window, fill_daily_series
+from sqlalchemy import func, desc, case
 
 class AdminQuizzesOverviewResource(Resource):
     @jwt_required()
@@ -22,18 +24,22 @@ class AdminQuizzesOverviewResource(Resource):
             # Basic statistics
             total_quizzes = Quiz.query.count()
             active_quizzes = Quiz.query.filter_by(is_active=True).count()
-            total_attempts = QuizAttempt.query.filter_by(status='completed').count()
-            recent_attempts = QuizAttempt.query.filter(
-                QuizAttempt.time_completed >= date_from,
+
+            # Attempt counts, average score and pass count in one aggregate query
+            attempt_totals = db.session.query(
+                func.count(QuizAttempt.id).label('total_attempts'),
+                func.coalesce(func.sum(case((QuizAttempt.time_completed >= date_from, 1), else_=0)), 0).label('recent_attempts'),
+                func.avg(QuizAttempt.score).label('avg_score'),
+                func.coalesce(func.sum(QuizAttempt.passed_case()), 0).label('total_passed')
+            ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(
                 QuizAttempt.status == 'completed'
-            ).count()
-
-            # Average scores and pass rates
-            completed_attempts = QuizAttempt.query.filter_by(status='completed').all()
-            if completed_attempts:
-                avg_score = sum(a.score for a in completed_attempts) / len(completed_attempts)
-                total_passed = len([a for a in completed_attempts if a.is_passed])
-                overall_pass_rate = (total_passed / len(completed_attempts)) * 100
+            ).one()
+
+            total_attempts = attempt_totals.total_attempts
+            recent_attempts = attempt_totals.recent_attempts
+            if total_attempts:
+                avg_score = float(attempt_totals.avg_score or 0)
+                overall_pass_rate = (attempt_totals.total_passed / total_attempts) * 100
             else:
                 avg_score = 0
                 overall_pass_rate = 0
@@ -55,16 +61,20 @@ class AdminQuizzesOverviewResource(Resource):
             recent_quizzes = Quiz.query.order_by(desc(Quiz.created_at)).limit(5).all()
 
             # Quiz creation trends (last 30 days)
-            quiz_trends = []
-            for i in range(30):
-                date = datetime.utcnow().date() - timedelta(days=i)
-                count = Quiz.query.filter(
-                    func.date(Quiz.created_at) == date
-                ).count()
-                quiz_trends.append({
-                    'date': date.isoformat(),
-                    'count': count
-                })
+            trend_dates, trend_start = get_daily_window(30)
+            created_day = func.date(Quiz.created_at)
+            created_counts = db.session.query(
+                created_day.label('day'),
+                func.count(Quiz.id).label('count')
+            ).filter(
+                Quiz.created_at >= trend_start
+            ).group_by(created_day).all()
+
+            quiz_trends = fill_daily_series(
+                trend_dates,
+                {str(row.day): {'count': row.count} for row in created_counts},
+                {'count': 0}
+            )
 
             overview_data = {
                 'statistics': {
@@ -85,7 +95,7 @@ class AdminQuizzesOverviewResource(Resource):
                     } for q in top_quizzes
                 ],
                 'recent_quizzes': [q.to_dict() for q in recent_quizzes],
-                'creation_trends': quiz_trends[::-1]  # Reverse to show oldest first
+                'creation_trends': quiz_trends
             }
 
             return {
@@ -134,17 +144,18 @@ class AdminQuizzesListResource(Resource):
             )
 
             # Enhance quiz data with statistics
+            quiz_stats = QuizStats.for_quizzes([quiz.id for quiz in paginated_quizzes.items])
             quiz_data = []
             for quiz in paginated_quizzes.items:
-                attempts = QuizAttempt.query.filter_by(quiz_id=quiz.id, status='completed').all()
+                stats = quiz_stats.get(quiz.id)
 
                 quiz_info = quiz.to_dict()
                 quiz_info.update({
                     'creator_name': quiz.creator.username,
-                    'total_attempts': len(attempts),
-                    'unique_users': len(set(a.user_id for a in attempts)),
-                    'average_score': sum(a.score for a in attempts) / len(attempts) if attempts else 0,
-                    'pass_rate': len([a for a in attempts if a.is_passed]) / len(attempts) * 100 if attempts else 0,
+                    'total_attempts': stats.total_attempts if stats else 0,
+                    'unique_users': stats.unique_users if stats else 0,
+                    'average_score': stats.average_score if stats else 0,
+                    'pass_rate': stats.pass_rate if stats else 0,
                     'total_questions': len(quiz.questions)
                 })
 
@@ -178,26 +189,18 @@ class AdminQuizDetailResource(Resource):
         try:
             quiz = Quiz.query.get_or_404(quiz_id)
 
-            # Get all attempts for this quiz
-            attempts = QuizAttempt.query.filter_by(quiz_id=quiz_id, status='completed').all()
+            stats = QuizStats.query.get(quiz_id)
 
             # Get question-level analytics
+            question_accuracy = QuestionAttempt.get_accuracy_by_question(quiz_id)
             question_analytics = []
             for question in quiz.questions:
-                question_attempts = []
-                for attempt in attempts:
-                    qa = next((qa for qa in attempt.question_attempts if qa.question_id == question.id), None)
-                    if qa:
-                        question_attempts.append(qa)
-
-                if question_attempts:
-                    correct_count = sum(1 for qa in question_attempts if qa.is_correct)
+                accuracy = question_accuracy.get(question.id)
+                if accuracy:
                     question_analytics.append({
                         'question_id': question.id,
                         'question_text': question.question_text,
-                        'total_attempts': len(question_attempts),
-                        'correct_answers': correct_count,
-                        'accuracy_rate': (correct_count / len(question_attempts)) * 100
+                        **accuracy
                     })
 
             # Recent attempts
@@ -210,10 +213,10 @@ class AdminQuizDetailResource(Resource):
                 'creator_name': quiz.creator.username,
                 'creator_email': quiz.creator.email,
                 'questions': [q.to_dict() for q in quiz.questions],
-                'total_attempts': len(attempts),
-                'unique_users': len(set(a.user_id for a in attempts)),
-                'average_score': sum(a.score for a in attempts) / len(attempts) if attempts else 0,
-                'pass_rate': len([a for a in attempts if a.is_passed]) / len(attempts) * 100 if attempts else 0,
+                'total_attempts': stats.total_attempts if stats else 0,
+                'unique_users': stats.unique_users if stats else 0,
+                'average_score': stats.average_score if stats else 0,
+                'pass_rate': stats.pass_rate if stats else 0,
                 'question_analytics': question_analytics,
                 'recent_attempts': [
                     {
@@ -253,6 +256,7 @@ class AdminQuizDetailResource(Resource):
                     quiz.deadline = datetime.strptime(data['deadline'], '%Y-%m-%d %H:%M:%S')
                 except ValueError:
                     quiz.deadline = datetime.strptime(data['deadline'], '%Y-%m-%d')
+            passing_score_changed = 'passing_score' in data and data['passing_score'] != quiz.passing_score
             if 'passing_score' in data:
                 quiz.passing_score = data['passing_score']
             if 'time_limit' in data:
@@ -265,6 +269,10 @@ class AdminQuizDetailResource(Resource):
             quiz.updated_at = datetime.utcnow()
             db.session.commit()
 
+            # Pass counts in the rollup depend on the passing score
+            if passing_score_changed:
+                QuizStats.rebuild(quiz_id)
+
             return {
                 'success': True,
                 'data': quiz.to_dict(),
@@ -383,71 +391,94 @@ class AdminQuizReportsResource(Resource):
                 total_quizzes = Quiz.query.count()
                 active_quizzes = Quiz.query.filter_by(is_active=True).count()
 
-                attempts_in_period = QuizAttempt.query.filter(
+                period_totals = db.session.query(
+                    func.count(QuizAttempt.id).label('attempts'),
+                    func.count(func.distinct(QuizAttempt.user_id)).label('unique_users'),
+                    func.avg(QuizAttempt.score).label('average_score'),
+                    func.coalesce(func.sum(QuizAttempt.passed_case()), 0).label('passed')
+                ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(
                     QuizAttempt.time_completed >= date_from,
                     QuizAttempt.status == 'completed'
-                ).all()
+                ).one()
 
                 report_data = {
                     'period': f'Last {days} days',
                     'total_quizzes': total_quizzes,
                     'active_quizzes': active_quizzes,
-                    'attempts_in_period': len(attempts_in_period),
-                    'unique_users_in_period': len(set(a.user_id for a in attempts_in_period)),
-                    'average_score_in_period': sum(a.score for a in attempts_in_period) / len(attempts_in_period) if attempts_in_period else 0,
-                    'pass_rate_in_period': len([a for a in attempts_in_period if a.is_passed]) / len(attempts_in_period) * 100 if attempts_in_period else 0
+                    'attempts_in_period': period_totals.attempts,
+                    'unique_users_in_period': period_totals.unique_users,
+                    'average_score_in_period': float(period_totals.average_score or 0),
+                    'pass_rate_in_period': period_totals.passed / period_totals.attempts * 100 if period_totals.attempts else 0
                 }
 
             elif report_type == 'trends':
-                # Trends report
-                daily_data = []
-                for i in range(days):
-                    date = datetime.utcnow().date() - timedelta(days=i)
-                    attempts = QuizAttempt.query.filter(
-                        func.date(QuizAttempt.time_completed) == date,
-                        QuizAttempt.status == 'completed'
-                    ).all()
-
-                    daily_data.append({
-                        'date': date.isoformat(),
-                        'attempts': len(attempts),
-                        'unique_users': len(set(a.user_id for a in attempts)),
-                        'average_score': sum(a.score for a in attempts) / len(attempts) if attempts else 0,
-                        'pass_rate': len([a for a in attempts if a.is_passed]) / len(attempts) * 100 if attempts else 0
-                    })
+                # Trends report: one grouped query for the whole window
+                trend_dates, trend_start = get_daily_window(days)
+                completed_day = func.date(QuizAttempt.time_completed)
+                daily_rows = db.session.query(
+                    completed_day.label('day'),
+                    func.count(QuizAttempt.id).label('attempts'),
+                    func.count(func.distinct(QuizAttempt.user_id)).label('unique_users'),
+                    func.avg(QuizAttempt.score).label('average_score'),
+                    func.coalesce(func.sum(QuizAttempt.passed_case()), 0).label('passed')
+                ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(
+                    QuizAttempt.time_completed >= trend_start,
+                    QuizAttempt.status == 'completed'
+                ).group_by(completed_day).all()
+
+                daily_data = fill_daily_series(
+                    trend_dates,
+                    {
+                        str(row.day): {
+                            'attempts': row.attempts,
+                            'unique_users': row.unique_users,
+                            'average_score': float(row.average_score or 0),
+                            'pass_rate': row.passed / row.attempts * 100
+                        } for row in daily_rows
+                    },
+                    {'attempts': 0, 'unique_users': 0, 'average_score': 0, 'pass_rate': 0}
+                )
 
                 report_data = {
                     'period': f'Last {days} days',
-                    'daily_trends': daily_data[::-1]  # Reverse to show oldest first
+                    'daily_trends': daily_data
                 }
 
             else:  # detailed
-                # Detailed report
-                quiz_performance = []
-                quizzes = Quiz.query.filter_by(is_active=True).all()
-
-                for quiz in quizzes:
-                    attempts = QuizAttempt.query.filter(
-                        QuizAttempt.quiz_id == quiz.id,
-                        QuizAttempt.time_completed >= date_from,
-                        QuizAttempt.status == 'completed'
-                    ).all()
-
-                    if attempts:
-                        quiz_performance.append({
-                            'quiz_id': quiz.id,
-                            'subject': quiz.subject,
-                            'unit': quiz.unit,
-                            'attempts': len(attempts),
-                            'unique_users': len(set(a.user_id for a in attempts)),
-                            'average_score': sum(a.score for a in attempts) / len(attempts),
-                            'pass_rate': len([a for a in attempts if a.is_passed]) / len(attempts) * 100,
-                            'average_time': sum(a.time_taken or 0 for a in attempts) / len(attempts)
-                        })
+                # Detailed report: per-quiz aggregates grouped in one query
+                quiz_rows = db.session.query(
+                    Quiz.id,
+                    Quiz.subject,
+                    Quiz.unit,
+                    func.count(QuizAttempt.id).label('attempts'),
+                    func.count(func.distinct(QuizAttempt.user_id)).label('unique_users'),
+                    func.avg(QuizAttempt.score).label('average_score'),
+                    func.coalesce(func.sum(QuizAttempt.passed_case()), 0).label('passed'),
+                    func.avg(func.coalesce(QuizAttempt.time_taken, 0)).label('average_time')
+                ).join(QuizAttempt, QuizAttempt.quiz_id == Quiz.id).filter(
+                    Quiz.is_active.is_(True),
+                    QuizAttempt.time_completed >= date_from,
+                    QuizAttempt.status == 'completed'
+                ).group_by(Quiz.id, Quiz.subject, Quiz.unit).order_by(
+                    desc('attempts')
+                ).all()
+
+                quiz_performance = [
+                    {
+                        'quiz_id': row.id,
+                        'subject': row.subject,
+                        'unit': row.unit,
+                        'attempts': row.attempts,
+                        'unique_users': row.unique_users,
+                        'average_score': float(row.average_score or 0),
+                        'pass_rate': row.passed / row.attempts * 100,
+                        'average_time': float(row.average_time or 0)
+                    } for row in quiz_rows
+                ]
 
                 report_data = {
                     'period': f'Last {days} days',
-                    'quiz_performance': sorted(quiz_performance, key=lambda x: x['attempts'], reverse=True)
+                    'quiz_performance': quiz_performance
                 }
 
             return {
@@ -1,5 +1,4 @@
 import os
-import requests as pyrequests 
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -7,12 +6,14 @@ from flask import request
 from flask_restful import Resource
 from flask_jwt_extended import (
     create_access_token, jwt_required,
-    get_jwt_identity, get_jwt
+    get_jwt
 )
 
 from models.user import User
-from extensions import db, blacklist
+from extensions import db, token_revocation
 from utils.validators import validate_signup_data, validate_login_data
+from utils.auth import get_current_user
+from services.http_client import http_client
 from google.oauth2 import id_token
 from google.auth.transport import requests as grequests
 
@@ -67,9 +68,7 @@ class LoginResource(Resource):
 class MeResource(Resource):
     @jwt_required()
     def get(self):
-        identity = get_jwt_identity()
-        user_id = identity.get("id") if isinstance(identity, dict) else identity
-        user = User.query.get(user_id)
+        user = get_current_user()
 
         if not user:
             return {"message": "User not found"}, 404
@@ -80,9 +79,7 @@ class MeResource(Resource):
 class ChangePasswordResource(Resource):
     @jwt_required()
     def put(self):
-        identity = get_jwt_identity()
-        user_id = identity.get("id") if isinstance(identity, dict) else identity
-        user = User.query.get(user_id)
+        user = get_current_user()
 
         data = request.get_json()
         current_password = data.get("current_password")
@@ -103,8 +100,7 @@ class ChangePasswordResource(Resource):
 class LogoutResource(Resource):
     @jwt_required()
     def post(self):
-        jti = get_jwt()["jti"]
-        blacklist.add(jti)
+        token_revocation.revoke(get_jwt())
         return {"message": "Successfully logged out"}, 200
 
 
@@ -118,7 +114,7 @@ class GoogleLogin(Resource):
 
         try:
             # Exchange code for tokens
-            token_response = pyrequests.post(
+            token_response = http_client.post(
                 "https://oauth2.googleapis.com/token",
                 data={
                     "code": code,
@@ -135,7 +131,8 @@ class GoogleLogin(Resource):
             tokens = token_response.json()
             id_token_str = tokens.get("id_token")
 
-            idinfo = id_token.verify_oauth2_token(id_token_str, grequests.Request(), GOOGLE_CLIENT_ID)
+            # Google's signing certs are fetched over the same pooled session
+            idinfo = id_token.verify_oauth2_token(id_token_str, grequests.Request(session=http_client.session), GOOGLE_CLIENT_ID)
 
             google_id = idinfo["sub"]
             email = idinfo.get("email")
@@ -3,8 +3,9 @@ from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from extensions import db
-from models.quiz import Quiz, QuizQuestion
+from models.quiz import Quiz, QuizQuestion, QuestionAttempt
 from models.quiz_attempt import QuizAttempt
+from models.quiz_stats import QuizStats
 from models.module import Module
 from utils.decorators import contributor_required
 from utils.validators import validate_quiz_data, validate_question_data
@@ -37,16 +38,17 @@ class ContributorQuizzesResource(Resource):
             quizzes = query.order_by(Quiz.created_at.desc()).all()
 
             # Enhance quiz data with statistics
+            quiz_stats = QuizStats.for_quizzes([quiz.id for quiz in quizzes])
             quiz_data = []
             for quiz in quizzes:
-                attempts = QuizAttempt.query.filter_by(quiz_id=quiz.id, status='completed').all()
+                stats = quiz_stats.get(quiz.id)
 
                 quiz_info = quiz.to_dict()
                 quiz_info.update({
-                    'total_attempts': len(attempts),
+                    'total_attempts': stats.total_attempts if stats else 0,
                     'total_questions': len(quiz.questions),
-                    'average_score': sum(a.score for a in attempts) / len(attempts) if attempts else 0,
-                    'pass_rate': len([a for a in attempts if a.is_passed]) / len(attempts) * 100 if attempts else 0
+                    'average_score': stats.average_score if stats else 0,
+                    'pass_rate': stats.pass_rate if stats else 0
                 })
 
                 quiz_data.append(quiz_info)
@@ -488,10 +490,8 @@ class QuizAnalyticsResource(Resource):
                     'message': 'Quiz not found'
                 }, 404
 
-            # Get all completed attempts
-            attempts = QuizAttempt.query.filter_by(quiz_id=quiz_id, status='completed').all()
-
-            if not attempts:
+            stats = QuizStats.query.get(quiz_id)
+            if not stats or not stats.total_attempts:
                 return {
                     'success': True,
                     'data': {
@@ -501,46 +501,37 @@ class QuizAnalyticsResource(Resource):
                     }
                 }, 200
 
-            # Calculate analytics
-            scores = [a.score for a in attempts]
-            total_attempts = len(attempts)
-            passed_attempts = len([a for a in attempts if a.is_passed])
+            # Read the precomputed analytics from the rollup
+            summary = stats.to_dict()
+            grades = summary['grade_distribution']
 
             analytics = {
-                'total_attempts': total_attempts,
-                'unique_users': len(set(a.user_id for a in attempts)),
-                'pass_rate': (passed_attempts / total_attempts) * 100,
-                'average_score': sum(scores) / total_attempts,
-                'highest_score': max(scores),
-                'lowest_score': min(scores),
+                'total_attempts': stats.total_attempts,
+                'unique_users': stats.unique_users,
+                'pass_rate': stats.pass_rate,
+                'average_score': stats.average_score,
+                'highest_score': summary['highest_score'],
+                'lowest_score': summary['lowest_score'],
                 'score_distribution': {
-                    'A (90-100)': len([s for s in scores if s >= 90]),
-                    'B (80-89)': len([s for s in scores if 80 <= s < 90]),
-                    'C (70-79)': len([s for s in scores if 70 <= s < 80]),
-                    'D (60-69)': len([s for s in scores if 60 <= s < 70]),
-                    'F (0-59)': len([s for s in scores if s < 60])
+                    'A (90-100)': grades['A'],
+                    'B (80-89)': grades['B'],
+                    'C (70-79)': grades['C'],
+                    'D (60-69)': grades['D'],
+                    'F (0-59)': grades['F']
                 },
-                'average_time_taken': sum(a.time_taken or 0 for a in attempts) / total_attempts,
+                'average_time_taken': summary['average_time_taken'],
                 'question_analytics': []
             }
 
             # Question-level analytics
+            question_accuracy = QuestionAttempt.get_accuracy_by_question(quiz_id)
             for question in quiz.questions:
-                question_attempts = []
-                for attempt in attempts:
-                    qa = next((qa for qa in attempt.question_attempts if qa.question_id == question.id), None)
-                    if qa:
-                        question_attempts.append(qa)
-
-                if question_attempts:
-                    correct_count = sum(1 for qa in question_attempts if qa.is_correct)
+                accuracy = question_accuracy.get(question.id)
+                if accuracy:
                     question_analytics = {
                         'question_id': question.id,
                         'question_text': question.question_text[:100] + '...' if len(question.question_text) > 100 else question.question_text,
-                        'total_attempts': len(question_attempts),
-                        'correct_answers': correct_count,
-                        'accuracy_rate': (correct_count / len(question_attempts)) * 100,
-                        'difficulty_rating': 'Easy' if (correct_count / len(question_attempts)) > 0.8 else 'Hard' if (correct_count / len(question_attempts)) < 0.5 else 'Medium'
+                        **accuracy
                     }
                     analytics['question_analytics'].append(question_analytics)
 
@@ -1,16 +1,39 @@
-from flask import request
+from datetime import datetime
+from flask import request, current_app
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from extensions import db, socketio
+from extensions import db, like_counter, socket_rooms
 from models.community import CommunityPost, Comment
 from models import User
+from services.community_feed import load_feed, serialize_post, serialize_comment, author_names
+from services.socket_rooms import forum_room, post_room, user_room
+from utils.pagination import encode_cursor, decode_cursor
+from utils.auth import identity_user_id
 
-# GET all posts or filter by forum
+# GET a forum's feed, newest first, one cursor page at a time
 class CommunityPostsResource(Resource):
     def get(self):
         forum = request.args.get('forum', 'general')
-        posts = CommunityPost.query.filter_by(forum=forum).order_by(CommunityPost.created_at.desc()).all()
-        return [post.to_dict() for post in posts], 200
+        max_page_size = current_app.config.get('COMMUNITY_FEED_MAX_PAGE_SIZE', 50)
+        limit = request.args.get('limit', current_app.config.get('COMMUNITY_FEED_PAGE_SIZE', 20), type=int)
+        limit = min(max(limit, 1), max_page_size)
+        # Only the newest few comments are inlined; comment_count tells the client whether to fetch more
+        comments_per_post = request.args.get('comments', current_app.config.get('COMMUNITY_FEED_COMMENTS', 3), type=int)
+        comments_per_post = min(max(comments_per_post, 0), 20)
+
+        cursor = request.args.get('cursor')
+        try:
+            cursor_values = decode_cursor(cursor, [datetime, int]) if cursor else None
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        posts, next_values = load_feed(forum, cursor_values, limit, comments_per_post)
+
+        return {
+            "posts": posts,
+            "next_cursor": encode_cursor(next_values) if next_values else None,
+            "has_next": next_values is not None
+        }, 200
 
     @jwt_required()
     def post(self):
@@ -18,7 +41,7 @@ class CommunityPostsResource(Resource):
         title = data.get('title')
         content = data.get('content')
         forum = data.get('forum', 'general')
-        user_id = get_jwt_identity()
+        user_id = identity_user_id(get_jwt_identity())
 
         if not title or not content:
             return {"error": "Both title and content are required."}, 400
@@ -32,26 +55,44 @@ class CommunityPostsResource(Resource):
         db.session.add(post)
         db.session.commit()
 
+        # Same shape as a feed entry, so clients can prepend it directly
+        data = serialize_post(post, author_names({post.author_id}))
+
         # Emit real-time post to clients in that forum room
-        socketio.emit('new_post', post.to_dict(), room=forum)
+        socket_rooms.emit('new_post', data, forum_room(forum))
 
-        return post.to_dict(), 200
+        return data, 200
 
 
 class LikePostResource(Resource):
     @jwt_required()
     def post(self, post_id):
-        post = CommunityPost.query.get(post_id)
+        post = db.session.query(CommunityPost.forum, CommunityPost.likes).filter_by(id=post_id).first()
         if not post:
             return {"error": "Post not found"}, 404
 
-        post.likes += 1
-        db.session.commit()
+        # The like is stored now; the post's total is updated and broadcast in the next flush
+        liked = like_counter.like(post_id, post.forum, identity_user_id(get_jwt_identity()))
+        likes = (post.likes or 0) + like_counter.pending(post_id)
+
+        if not liked:
+            return {"message": "Post already liked", "likes": likes}, 200
+
+        return {"message": "Post liked", "likes": likes}, 200
+
+    @jwt_required()
+    def delete(self, post_id):
+        post = db.session.query(CommunityPost.forum, CommunityPost.likes).filter_by(id=post_id).first()
+        if not post:
+            return {"error": "Post not found"}, 404
 
-        # Emit like update
-        socketio.emit('like_post', {'postId': post_id, 'likes': post.likes}, room=post.forum)
+        unliked = like_counter.unlike(post_id, post.forum, identity_user_id(get_jwt_identity()))
+        likes = (post.likes or 0) + like_counter.pending(post_id)
 
-        return {"message": "Post liked", "likes": post.likes}, 200
+        if not unliked:
+            return {"message": "Post was not liked", "likes": likes}, 200
+
+        return {"message": "Like removed", "likes": likes}, 200
 
 
 class PostCommentResource(Resource):
@@ -59,7 +100,7 @@ class PostCommentResource(Resource):
     def post(self, post_id):
         data = request.get_json()
         content = data.get("content")
-        user_id = get_jwt_identity()
+        user_id = identity_user_id(get_jwt_identity())
 
         post = CommunityPost.query.get(post_id)
         if not post:
@@ -76,10 +117,19 @@ class PostCommentResource(Resource):
         db.session.add(comment)
         db.session.commit()
 
-        # Emit new comment
-        socketio.emit("new_comment", {
+        data = serialize_comment(comment, author_names({comment.author_id}))
+
+        # Forum viewers see the latest comments inline, so both rooms get it
+        socket_rooms.emit("new_comment", {
             "postId": post_id,
-            "comment": comment.to_dict()
-        }, room=post.forum)
+            "comment": data
+        }, [forum_room(post.forum), post_room(post_id)])
+
+        if str(post.author_id) != str(user_id):
+            socket_rooms.emit("reply_notification", {
+                "post_id": post_id,
+                "replied_by": data["author_name"],
+                "preview": content[:50] + '...' if len(content) > 50 else content
+            }, user_room(post.author_id))
 
-        return comment.to_dict(), 200
+        return data, 200
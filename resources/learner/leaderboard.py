@@ -3,40 +3,44 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.leaderboard import LeaderboardEntry
 from models.user import User
 from extensions import db
-from extensions import socketio
+from extensions import leaderboard, leaderboard_broadcaster
+from services.leaderboard_service import serialize_ranked_entries, badges_for_xp
 from datetime import datetime
+from sqlalchemy import func
 
 leaderboard_bp = Blueprint("leaderboard", __name__, url_prefix="/api/leaderboard")
 
 @leaderboard_bp.route("/", methods=["GET"])
 @jwt_required()
 def get_leaderboard():
-    # Fetch leaderboard entries ordered by XP descending
-    entries = (
-        db.session.query(LeaderboardEntry)
-        .join(User)
-        .order_by(LeaderboardEntry.total_xp.desc())
-        .limit(50)
-        .all()
-    )
+    # Top 50 users by XP from the leaderboard engine
+    ranked = leaderboard.top(50)
+    return jsonify({"leaderboard": serialize_ranked_entries(ranked)}), 200
 
-    leaderboard_data = [
-        {
-            "user_id": entry.user.id,
-            "name": f"{entry.user.first_name} {entry.user.last_name}",
-            "total_xp": entry.total_xp,
-            "badges": entry.badges_earned
-        }
-        for entry in entries
-    ]
+@leaderboard_bp.route("/me", methods=["GET"])
+@jwt_required()
+def get_my_rank():
+    identity = get_jwt_identity()
+    user_id = identity.get("id") if isinstance(identity, dict) else identity
+    radius = min(request.args.get("radius", 5, type=int), 50)
+
+    me, neighbours = leaderboard.around(user_id, radius=max(radius, 0))
+    if not me:
+        return jsonify({"rank": None, "total_xp": 0, "neighbours": []}), 200
 
-    return jsonify({"leaderboard": leaderboard_data}), 200
+    return jsonify({
+        "rank": me["rank"],
+        "total_xp": me["total_xp"],
+        "badges": badges_for_xp(me["total_xp"]),
+        "neighbours": serialize_ranked_entries(neighbours)
+    }), 200
 
 @leaderboard_bp.route("/update_xp", methods=["POST"])
 @jwt_required()
 def update_xp():
     data = request.get_json()
-    user_id = get_jwt_identity()
+    identity = get_jwt_identity()
+    user_id = identity.get("id") if isinstance(identity, dict) else identity
     xp_gain = data.get("xp", 0)
 
     if not isinstance(xp_gain, int) or xp_gain <= 0:
@@ -45,28 +49,20 @@ def update_xp():
     entry = LeaderboardEntry.query.filter_by(user_id=user_id).first()
 
     if not entry:
-        entry = LeaderboardEntry(user_id=user_id, total_xp=0, badges_earned=[])
+        entry = LeaderboardEntry(user_id=user_id, points=0, activity_type=data.get("activity", "Quizzes"))
         db.session.add(entry)
+        db.session.flush()
 
-    entry.total_xp += xp_gain
-    assign_badges(entry)
+    # Increment in SQL so concurrent updates are not lost
+    entry.points = LeaderboardEntry.points + xp_gain
     db.session.commit()
 
-    socketio.emit("leaderboard_updated", {
-        "user_id": user_id,
-        "total_xp": entry.total_xp,
-        "badges": entry.badges_earned
-    }, namespace="/leaderboard")
-
-    return jsonify({"success": True, "total_xp": entry.total_xp}), 200
-
-
-def assign_badges(entry):
-    badges = set(entry.badges_earned or [])
+    total_xp = db.session.query(func.coalesce(func.sum(LeaderboardEntry.points), 0)).filter(
+        LeaderboardEntry.user_id == user_id
+    ).scalar()
+    total_xp = leaderboard.set_xp(user_id, total_xp)
 
-    if entry.total_xp >= 1000:
-        badges.add("Top Scorer")
-    elif entry.total_xp >= 500:
-        badges.add("Rising Star")
+    # Clients get a coalesced rank diff instead of one event per XP gain
+    leaderboard_broadcaster.notify()
 
-    entry.badges_earned = list(badges)
+    return jsonify({"success": True, "total_xp": total_xp}), 200
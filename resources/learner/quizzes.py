@@ -3,10 +3,10 @@ from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from extensions import db
-from models.quiz import Quiz, QuizQuestion, QuestionAttempt
+from models.quiz import Quiz, EMPTY_ATTEMPT_SUMMARY
 from models.quiz_attempt import QuizAttempt
-from models.user import User
 from utils.decorators import learner_required
+from utils.auth import get_current_identity, get_current_user
 from utils.validators import validate_quiz_submission
 from utils.helpers import get_client_ip, get_user_agent
 
@@ -34,20 +34,23 @@ class QuizzesListResource(Resource):
 
             quizzes = query.order_by(Quiz.deadline.asc()).all()
 
+            # Load the user's attempt counts and best scores for every quiz at once
+            summaries = Quiz.get_user_attempt_summaries(current_user_id)
+
             # Enhance quiz data with user-specific information
             quiz_data = []
             for quiz in quizzes:
-                user_attempts = quiz.get_user_attempts(current_user_id)
-                best_score = quiz.get_user_best_score(current_user_id)
-                can_attempt, message = quiz.can_user_attempt(current_user_id)
+                summary = summaries.get(quiz.id, EMPTY_ATTEMPT_SUMMARY)
+                best_score = quiz.get_user_best_score(current_user_id, summary=summary)
+                can_attempt, message = quiz.can_user_attempt(current_user_id, summary=summary)
 
                 quiz_info = quiz.to_dict()
                 quiz_info.update({
-                    'user_attempts_count': len(user_attempts),
+                    'user_attempts_count': summary['attempts_count'],
                     'user_best_score': best_score,
                     'can_attempt': can_attempt,
                     'attempt_message': message,
-                    'status': 'Submitted' if user_attempts and any(a.status == 'completed' for a in user_attempts) else 'Pending',
+                    'status': 'Submitted' if summary['has_completed'] else 'Pending',
                     'is_completed': best_score is not None and best_score >= quiz.passing_score
                 })
 
@@ -90,7 +93,8 @@ class QuizDetailResource(Resource):
                 }, 404
 
             # Check if user can access this quiz
-            can_attempt, message = quiz.can_user_attempt(current_user_id)
+            summary = quiz.get_user_attempt_summary(current_user_id)
+            can_attempt, message = quiz.can_user_attempt(current_user_id, summary=summary)
             user_attempts = quiz.get_user_attempts(current_user_id)
 
             # Get quiz questions (without correct answers)
@@ -114,7 +118,7 @@ class QuizDetailResource(Resource):
             quiz_data.update({
                 'questions': questions_data,
                 'user_attempts_count': len(user_attempts),
-                'user_best_score': quiz.get_user_best_score(current_user_id),
+                'user_best_score': quiz.get_user_best_score(current_user_id, summary=summary),
                 'can_attempt': can_attempt,
                 'attempt_message': message,
                 'user_attempts': [attempt.get_attempt_summary() for attempt in user_attempts]
@@ -191,7 +195,7 @@ class QuizSubmissionResource(Resource):
     def post(self, quiz_id, attempt_id):
         """Submit quiz answers"""
         try:
-            current_user_id = get_jwt_identity()
+            current_user_id = get_current_identity().id
             data = request.get_json()
 
             # Validate submission data
@@ -220,40 +224,11 @@ class QuizSubmissionResource(Resource):
             quiz = attempt.quiz
             answers = data.get('answers', {})
 
-            # Process each answer
-            for question_id, user_answer in answers.items():
-                question = QuizQuestion.query.get(int(question_id))
-                if not question or question.quiz_id != quiz_id:
-                    continue
-
-                # Check if answer already exists (prevent duplicate submissions)
-                existing_answer = QuestionAttempt.query.filter_by(
-                    quiz_attempt_id=attempt_id,
-                    question_id=question_id
-                ).first()
-
-                if existing_answer:
-                    continue
-
-                # Create question attempt
-                is_correct = question.is_correct_answer(user_answer)
-                points_earned = question.points if is_correct else 0
-
-                question_attempt = QuestionAttempt(
-                    quiz_attempt_id=attempt_id,
-                    question_id=question_id,
-                    user_answer=str(user_answer),
-                    is_correct=is_correct,
-                    points_earned=points_earned
-                )
-
-                db.session.add(question_attempt)
-
-            # Submit the attempt
-            final_score = attempt.submit_attempt()
+            # Grade all answers and save them in a single transaction
+            final_score = attempt.submit_attempt(answers)
 
             # Award XP to user if passed
-            user = User.query.get(current_user_id)
+            user = get_current_user()
             xp_earned = 0
             if attempt.is_passed:
                 xp_earned = quiz.total_questions * 10  # 10 XP per question
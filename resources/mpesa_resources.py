@@ -2,11 +2,18 @@ from flask import request, jsonify
 from flask_restful import Resource
 from extensions import db
 from models.payment import Payment
+from models.payment_outbox import PaymentOutbox
 import requests
 import base64
 import json
 from datetime import datetime
 from decouple import config
+from services.mpesa_auth import mpesa_token_cache
+from services.http_client import http_client
+from services.mpesa_callbacks import record_callback
+from utils.decorators import admin_required
+from utils.pagination import encode_cursor, decode_cursor, keyset_page
+from utils.streaming import streaming_export
 import uuid
 
 class MpesaService:
@@ -23,34 +30,22 @@ class MpesaService:
             if not consumer_key or not consumer_secret:
                 raise ValueError("M-Pesa consumer key and secret must be set in environment variables")
             
-            # Encode credentials
-            credentials = base64.b64encode(
-                f"{consumer_key}:{consumer_secret}".encode()
-            ).decode()
-            
-            # Set API URL based on environment
-            if environment == 'production':
-                url = 'https://api.safaricom.co.ke/oauth/v1/generate'
-            else:
-                url = 'https://sandbox.safaricom.co.ke/oauth/v1/generate'
-            
-            headers = {
-                'Authorization': f'Basic {credentials}',
-                'Content-Type': 'application/json'
-            }
-            
-            params = {'grant_type': 'client_credentials'}
-            
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            return data.get('access_token')
+            # Reuse the shared token until it is close to expiry
+            return mpesa_token_cache.get_token(
+                MpesaService.get_base_url(environment), consumer_key, consumer_secret
+            )
             
         except Exception as e:
             print(f"Error getting M-Pesa access token: {str(e)}")
             raise e
     
+    @staticmethod
+    def get_base_url(environment):
+        """Daraja API host for the environment"""
+        if environment == 'production':
+            return 'https://api.safaricom.co.ke'
+        return 'https://sandbox.safaricom.co.ke'
+
     @staticmethod
     def generate_password(shortcode, passkey, timestamp):
         """Generate M-Pesa password"""
@@ -81,10 +76,11 @@ class MpesaService:
             password = MpesaService.generate_password(shortcode, passkey, timestamp)
             
             # Set API URL based on environment
-            if environment == 'production':
-                url = 'https://api.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
-            else:
-                url = 'https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
+            url = f"{MpesaService.get_base_url(environment)}/mpesa/stkpush/v1/processrequest"
+            
+            # Lets the callback find the payment even if Safaricom's response to this request is lost
+            separator = '&' if '?' in callback_url else '?'
+            callback_url = f"{callback_url}{separator}ref={checkout_request_id}"
             
             # Prepare request payload
             payload = {
@@ -110,10 +106,16 @@ class MpesaService:
             print(f"Payload: {json.dumps(payload, indent=2)}")
             
             # Make the request
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = http_client.post(url, json=payload, headers=headers)
             
             print(f"M-Pesa API Response Status: {response.status_code}")
             print(f"M-Pesa API Response: {response.text}")
+
+            if response.status_code == 401:
+                # Token was revoked early; fetch a fresh one next time
+                mpesa_token_cache.invalidate(
+                    MpesaService.get_base_url(environment), config('MPESA_CONSUMER_KEY')
+                )
             
             response.raise_for_status()
             
@@ -126,6 +128,17 @@ class MpesaService:
             print(f"Error in STK Push: {str(e)}")
             raise e
 
+def format_phone_number(phone_number):
+    """Normalise 07..., +254... and 7... numbers to 2547..."""
+    phone_number = str(phone_number).strip()
+    if phone_number.startswith('0'):
+        return '254' + phone_number[1:]
+    if phone_number.startswith('+254'):
+        return phone_number[1:]
+    if phone_number.startswith('7') or phone_number.startswith('1'):
+        return '254' + phone_number
+    return phone_number
+
 class STKPushResource(Resource):
     def post(self):
         """Initiate STK Push payment"""
@@ -162,12 +175,7 @@ class STKPushResource(Resource):
                 }, 400
             
             # Format phone number to international format
-            if phone_number.startswith('0'):
-                phone_number = '254' + phone_number[1:]
-            elif phone_number.startswith('+254'):
-                phone_number = phone_number[1:]
-            elif phone_number.startswith('7') or phone_number.startswith('1'):
-                phone_number = '254' + phone_number
+            phone_number = format_phone_number(phone_number)
             
             # Validate phone number format
             if not phone_number.startswith('254') or len(phone_number) != 12:
@@ -181,7 +189,7 @@ class STKPushResource(Resource):
             account_reference = data.get('accountReference', 'EduHive Payment')
             transaction_desc = data.get('transactionDesc', 'Payment for EduHive services')
             
-            # Create payment record
+            # Create the payment and its outbox job in one transaction; a worker sends the STK push
             payment = Payment(
                 checkout_request_id=checkout_request_id,
                 phone_number=phone_number,
@@ -192,62 +200,22 @@ class STKPushResource(Resource):
             )
             
             db.session.add(payment)
+            db.session.add(PaymentOutbox(payment=payment))
             db.session.commit()
             
-            try:
-                # Initiate STK Push with M-Pesa
-                mpesa_response = MpesaService.initiate_stk_push(
-                    phone_number=phone_number,
-                    amount=amount,
-                    account_reference=account_reference,
-                    transaction_desc=transaction_desc,
-                    checkout_request_id=checkout_request_id
-                )
-                
-                # Update payment record with M-Pesa response
-                if mpesa_response.get('ResponseCode') == '0':
-                    # Success
-                    payment.merchant_request_id = mpesa_response.get('MerchantRequestID')
-                    payment.status = 'sent_to_phone'
-                    db.session.commit()
-                    
-                    return {
-                        'success': True,
-                        'message': 'STK Push sent successfully',
-                        'data': {
-                            'checkout_request_id': checkout_request_id,
-                            'payment_id': payment.id,
-                            'customer_message': mpesa_response.get('CustomerMessage', 
-                                f'Please check your phone ({phone_number}) to complete the payment of KES {amount}'),
-                            'merchant_request_id': mpesa_response.get('MerchantRequestID'),
-                            'response_code': mpesa_response.get('ResponseCode'),
-                            'response_description': mpesa_response.get('ResponseDescription')
-                        }
-                    }, 200
-                else:
-                    # M-Pesa API returned an error
-                    payment.status = 'failed'
-                    payment.result_desc = mpesa_response.get('ResponseDescription', 'Unknown error')
-                    db.session.commit()
-                    
-                    return {
-                        'success': False,
-                        'message': mpesa_response.get('ResponseDescription', 'Failed to initiate payment'),
-                        'error_code': mpesa_response.get('ResponseCode')
-                    }, 400
-                    
-            except Exception as mpesa_error:
-                # M-Pesa API call failed
-                payment.status = 'failed'
-                payment.result_desc = f'API Error: {str(mpesa_error)}'
-                db.session.commit()
-                
-                return {
-                    'success': False,
-                    'message': f'Failed to connect to M-Pesa: {str(mpesa_error)}'
-                }, 500
+            return {
+                'success': True,
+                'message': 'Payment request accepted',
+                'data': {
+                    'checkout_request_id': checkout_request_id,
+                    'payment_id': payment.id,
+                    'status': payment.status,
+                    'customer_message': f'Please check your phone ({phone_number}) to complete the payment of KES {amount}'
+                }
+            }, 202
             
         except Exception as e:
+            db.session.rollback()
             print(f"Error in STK Push endpoint: {str(e)}")
             return {
                 'success': False,
@@ -292,62 +260,31 @@ class MpesaCallbackResource(Resource):
         try:
             data = request.get_json()
             
-            # Log the callback for debugging
-            print(f"M-Pesa Callback received: {json.dumps(data, indent=2)}")
-            
             # Extract callback data
             stk_callback = data.get('Body', {}).get('stkCallback', {})
             checkout_request_id = stk_callback.get('CheckoutRequestID')
-            result_code = stk_callback.get('ResultCode')
-            result_desc = stk_callback.get('ResultDesc')
             
             if not checkout_request_id:
                 return {'success': False, 'message': 'Invalid callback data'}, 400
             
-            # Find the payment record by merchant request ID if checkout request ID doesn't match
-            payment = Payment.query.filter_by(checkout_request_id=checkout_request_id).first()
-            
-            if not payment:
-                # Try to find by merchant request ID
-                merchant_request_id = stk_callback.get('MerchantRequestID')
-                if merchant_request_id:
-                    payment = Payment.query.filter_by(merchant_request_id=merchant_request_id).first()
+            # Only log it here; the callback applier updates the payment in the background
+            recorded = record_callback(
+                'result',
+                checkout_request_id,
+                merchant_request_id=stk_callback.get('MerchantRequestID'),
+                result_code=stk_callback.get('ResultCode'),
+                result_desc=stk_callback.get('ResultDesc'),
+                payload=data,
+                reference=request.args.get('ref')
+            )
             
-            if not payment:
-                print(f"Payment not found for checkout_request_id: {checkout_request_id}")
-                return {'success': False, 'message': 'Payment not found'}, 404
-            
-            # Update payment status based on result code
-            if result_code == 0:
-                # Payment successful
-                payment.status = 'completed'
-                payment.result_desc = result_desc
-                payment.result_code = result_code
-                
-                # Extract additional data from callback
-                callback_metadata = stk_callback.get('CallbackMetadata', {}).get('Item', [])
-                for item in callback_metadata:
-                    if item.get('Name') == 'MpesaReceiptNumber':
-                        payment.mpesa_receipt_number = item.get('Value')
-                    elif item.get('Name') == 'TransactionDate':
-                        try:
-                            payment.transaction_date = datetime.strptime(
-                                str(item.get('Value')), '%Y%m%d%H%M%S'
-                            )
-                        except:
-                            pass
-            else:
-                # Payment failed or cancelled
-                payment.status = 'failed'
-                payment.result_desc = result_desc
-                payment.result_code = result_code
-            
-            payment.updated_at = datetime.utcnow()
-            db.session.commit()
+            if not recorded:
+                return {'success': True, 'message': 'Callback already received'}, 200
             
-            return {'success': True, 'message': 'Callback processed successfully'}, 200
+            return {'success': True, 'message': 'Callback received'}, 200
             
         except Exception as e:
+            db.session.rollback()
             print(f"Error processing M-Pesa callback: {str(e)}")
             return {
                 'success': False,
@@ -358,67 +295,112 @@ class MpesaTimeoutResource(Resource):
     def post(self):
         """Handle M-Pesa timeout"""
         try:
-            data = request.get_json()
-            
-            print(f"M-Pesa Timeout received: {json.dumps(data, indent=2)}")
+            data = request.get_json() or {}
             
-            checkout_request_id = data.get('CheckoutRequestID')
+            stk_callback = data.get('Body', {}).get('stkCallback', {})
+            checkout_request_id = data.get('CheckoutRequestID') or stk_callback.get('CheckoutRequestID')
             
             if checkout_request_id:
-                payment = Payment.query.filter_by(checkout_request_id=checkout_request_id).first()
-                if payment:
-                    payment.status = 'timeout'
-                    payment.result_desc = 'Transaction timed out'
-                    payment.updated_at = datetime.utcnow()
-                    db.session.commit()
+                record_callback(
+                    'timeout',
+                    checkout_request_id,
+                    merchant_request_id=data.get('MerchantRequestID') or stk_callback.get('MerchantRequestID'),
+                    payload=data,
+                    reference=request.args.get('ref')
+                )
             
-            return {'success': True, 'message': 'Timeout processed successfully'}, 200
+            return {'success': True, 'message': 'Timeout received'}, 200
             
         except Exception as e:
+            db.session.rollback()
             print(f"Error processing M-Pesa timeout: {str(e)}")
             return {
                 'success': False,
                 'message': f'Error processing timeout: {str(e)}'
             }, 500
 
+PAYMENT_EXPORT_FIELDS = [
+    'id', 'checkout_request_id', 'phone_number', 'amount', 'status', 'mpesa_receipt_number',
+    'result_desc', 'transaction_date', 'created_at', 'updated_at'
+]
+
+def serialize_payment(payment):
+    return {
+        'id': payment.id,
+        'checkout_request_id': payment.checkout_request_id,
+        'phone_number': payment.phone_number,
+        'amount': payment.amount,
+        'status': payment.status,
+        'mpesa_receipt_number': payment.mpesa_receipt_number,
+        'result_desc': payment.result_desc,
+        'transaction_date': payment.transaction_date.isoformat() if payment.transaction_date else None,
+        'created_at': payment.created_at.isoformat() if payment.created_at else None,
+        'updated_at': payment.updated_at.isoformat() if payment.updated_at else None
+    }
+
+def filtered_payments():
+    """Payments matching the status, phone_number, start_date and end_date query arguments.
+
+    Dates are ISO 8601; start_date is inclusive and end_date exclusive, both
+    on created_at. Raises ValueError for a malformed date.
+    """
+    query = Payment.query
+
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Payment.status == status)
+
+    phone_number = request.args.get('phone_number')
+    if phone_number:
+        query = query.filter(Payment.phone_number == format_phone_number(phone_number))
+
+    start_date = request.args.get('start_date')
+    if start_date:
+        query = query.filter(Payment.created_at >= datetime.fromisoformat(start_date))
+
+    end_date = request.args.get('end_date')
+    if end_date:
+        query = query.filter(Payment.created_at < datetime.fromisoformat(end_date))
+
+    return query
+
 class PaymentsListResource(Resource):
+    @admin_required
     def get(self):
-        """Get list of payments"""
+        """Get list of payments, newest first, one cursor page at a time"""
         try:
-            page = request.args.get('page', 1, type=int)
-            per_page = request.args.get('per_page', 10, type=int)
-            status = request.args.get('status')
-            
-            query = Payment.query
+            per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
+            cursor = request.args.get('cursor')
+            include_total = request.args.get('include_total', 'false').lower() == 'true'
             
-            if status:
-                query = query.filter_by(status=status)
+            try:
+                query = filtered_payments()
+                cursor_values = decode_cursor(cursor, [datetime, int]) if cursor else None
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'message': f'Invalid query parameters: {str(e)}'
+                }, 400
             
-            payments = query.order_by(Payment.created_at.desc()).paginate(
-                page=page, per_page=per_page, error_out=False
+            # Keyset pagination on (created_at, id): each page is an index range, however deep
+            payments, next_values = keyset_page(
+                query, [Payment.created_at, Payment.id], cursor_values, limit=per_page
             )
             
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': encode_cursor(next_values) if next_values else None,
+                'has_next': next_values is not None
+            }
+            if include_total:
+                # Counting is a full pass over the filtered rows, so it is opt-in
+                pagination['total'] = query.order_by(None).count()
+            
             return {
                 'success': True,
                 'data': {
-                    'payments': [{
-                        'id': payment.id,
-                        'checkout_request_id': payment.checkout_request_id,
-                        'phone_number': payment.phone_number,
-                        'amount': payment.amount,
-                        'status': payment.status,
-                        'mpesa_receipt_number': payment.mpesa_receipt_number,
-                        'created_at': payment.created_at.isoformat() if payment.created_at else None,
-                        'updated_at': payment.updated_at.isoformat() if payment.updated_at else None
-                    } for payment in payments.items],
-                    'pagination': {
-                        'page': page,
-                        'per_page': per_page,
-                        'total': payments.total,
-                        'pages': payments.pages,
-                        'has_next': payments.has_next,
-                        'has_prev': payments.has_prev
-                    }
+                    'payments': [serialize_payment(payment) for payment in payments],
+                    'pagination': pagination
                 }
             }, 200
             
@@ -426,4 +408,27 @@ class PaymentsListResource(Resource):
             return {
                 'success': False,
                 'message': f'Error fetching payments: {str(e)}'
-            }, 500
\ No newline at end of file
+            }, 500
+
+class PaymentsExportResource(Resource):
+    @admin_required
+    def get(self):
+        """Stream matching payments as CSV or NDJSON"""
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in ('csv', 'ndjson'):
+            return {
+                'success': False,
+                'message': 'format must be csv or ndjson'
+            }, 400
+        
+        try:
+            query = filtered_payments()
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': f'Invalid query parameters: {str(e)}'
+            }, 400
+        
+        query = query.order_by(Payment.created_at, Payment.id)
+        filename = f"payments-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        return streaming_export(query, PAYMENT_EXPORT_FIELDS, serialize_payment, export_format, filename)
@@ -2,10 +2,10 @@
 
 from flask import request
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from models.path import Path
-from models.user import User
 from extensions import db
+from utils.auth import get_current_identity, get_current_user
 
 class PathListResource(Resource):
     @jwt_required(optional=True)
@@ -17,10 +17,9 @@ class PathListResource(Resource):
     @jwt_required()
     def post(self):
         """Contributor: Submit new path"""
-        user_id = get_jwt_identity()["id"]
-        user = User.query.get_or_404(user_id)
+        user = get_current_user()
 
-        if user.role != "contributor":
+        if not user or user.role != "contributor":
             return {"error": "Only contributors can submit paths"}, 403
 
         data = request.get_json()
@@ -50,7 +49,7 @@ class ContributorPathListResource(Resource):
     @jwt_required()
     def get(self):
         """Contributor: View their own submitted paths"""
-        user_id = get_jwt_identity()["id"]
+        user_id = get_current_identity().id
         paths = Path.query.filter_by(contributor_id=user_id).all()
         return [p.to_dict() for p in paths], 200
 
@@ -58,8 +57,7 @@ class PendingPathListResource(Resource):
     @jwt_required()
     def get(self):
         """Admin: View all pending paths"""
-        user = User.query.get(get_jwt_identity()["id"])
-        if user.role != "admin":
+        if get_current_identity().role != "admin":
             return {"error": "Admins only"}, 403
 
         pending = Path.query.filter_by(is_approved=False).all()
@@ -69,8 +67,7 @@ class PathApprovalResource(Resource):
     @jwt_required()
     def patch(self, id):
         """Admin: Approve a path"""
-        user = User.query.get(get_jwt_identity()["id"])
-        if user.role != "admin":
+        if get_current_identity().role != "admin":
             return {"error": "Admins only"}, 403
 
         path = Path.query.get_or_404(id)
@@ -81,12 +78,11 @@ class PathUpdateResource(Resource):
     @jwt_required()
     def patch(self, id):
         """Contributor: Edit own path before approval"""
-        user_id = get_jwt_identity()["id"]
-        user = User.query.get_or_404(user_id)
+        user = get_current_user()
 
         path = Path.query.get_or_404(id)
 
-        if user.role != "contributor":
+        if not user or user.role != "contributor":
             return {"error": "Only contributors can edit paths"}, 403
 
         if path.contributor_id != user.id:
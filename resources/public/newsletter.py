@@ -1,14 +1,15 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, current_app
 from models.newsletter import NewsletterSubscriber
-from extensions import db, mail
-from flask_mail import Message
-import csv, io, os, requests
+from extensions import db, newsletter_delivery_worker
+from datetime import datetime
+from utils.streaming import streaming_export
+from utils.pagination import encode_cursor, decode_cursor, keyset_after
+from utils.decorators import admin_required
+from services.subscriber_import import import_subscribers
 
 newsletter_bp = Blueprint('newsletter', __name__, url_prefix="/api/newsletter")
 
-ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
-MAILCHIMP_API_KEY = os.getenv("MAILCHIMP_API_KEY")
-MAILCHIMP_AUDIENCE_ID = os.getenv("MAILCHIMP_AUDIENCE_ID")
+SUBSCRIBER_EXPORT_FIELDS = ['Name', 'Email', 'Phone', 'Subscribed At']
 
 @newsletter_bp.route('/subscribe', methods=['POST'])
 def subscribe():
@@ -20,52 +21,70 @@ def subscribe():
     if not all([name, email, phone]):
         return jsonify({"error": "All fields are required"}), 400
 
-    # Save subscriber
+    # Save subscriber; its emails and Mailchimp upsert are queued in the same commit
     subscriber = NewsletterSubscriber(name=name, email=email, phone=phone)
     db.session.add(subscriber)
+    newsletter_delivery_worker.enqueue_subscription(subscriber)
     db.session.commit()
 
-    # Send confirmation to subscriber
-    msg = Message("EduHive Newsletter Confirmation",
-                  recipients=[email],
-                  body=f"Hi {name},\n\nThank you for subscribing to EduHive Newsletter!")
-    mail.send(msg)
-
-    # Notify admin
-    admin_msg = Message("New Newsletter Subscriber",
-                        recipients=[ADMIN_EMAIL],
-                        body=f"New subscriber:\nName: {name}\nEmail: {email}\nPhone: {phone}")
-    mail.send(admin_msg)
-
-    # Add to Mailchimp
-    mailchimp_url = f"https://usX.api.mailchimp.com/3.0/lists/{MAILCHIMP_AUDIENCE_ID}/members"
-    response = requests.post(mailchimp_url,
-        auth=("anystring", MAILCHIMP_API_KEY),
-        json={
-            "email_address": email,
-            "status": "subscribed",
-            "merge_fields": {"FNAME": name}
-        }
-    )
-
-    if response.status_code not in [200, 204]:
-        print("Mailchimp error:", response.json())
-
     return jsonify({"message": "Subscription successful!"}), 201
 
+def _subscriber_row(sub):
+    return {'Name': sub.name, 'Email': sub.email, 'Phone': sub.phone, 'Subscribed At': sub.subscribed_at}
+
 @newsletter_bp.route('/export', methods=['GET'])
+@admin_required
 def export_subscribers():
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Name', 'Email', 'Phone', 'Subscribed At'])
-
-    for sub in NewsletterSubscriber.query.all():
-        writer.writerow([sub.name, sub.email, sub.phone, sub.subscribed_at])
-
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode()),
-        mimetype='text/csv',
-        download_name='subscribers.csv',
-        as_attachment=True
-    )
+    """Stream subscribers as CSV; ?cursor=<X-Next-Cursor of the last pull> for those added since, ?gzip=true to compress"""
+    query = NewsletterSubscriber.query
+    columns = [NewsletterSubscriber.subscribed_at, NewsletterSubscriber.id]
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = query.filter(keyset_after(columns, decode_cursor(cursor, [datetime, int]), descending=False))
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    # Fix the end of the export up front so its cursor can go in the headers; later subscribers wait for the next pull.
+    # (subscribed_at, id) rather than subscribed_at alone, so subscribers sharing a timestamp are neither skipped nor repeated
+    last = query.with_entities(*columns).order_by(*[column.desc() for column in columns]).first()
+    if last:
+        query = query.filter(~keyset_after(columns, list(last), descending=False))
+
+    query = query.order_by(*columns)
+    compress = request.args.get('gzip', 'false').lower() == 'true'
+
+    response = streaming_export(query, SUBSCRIBER_EXPORT_FIELDS, _subscriber_row, 'csv', 'subscribers', compress=compress)
+    next_cursor = encode_cursor(list(last)) if last else cursor
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@newsletter_bp.route('/import', methods=['POST'])
+@admin_required
+def import_subscriber_file():
+    """Bulk upsert subscribers from an uploaded CSV or NDJSON file (multipart field "file")"""
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({"error": "Upload a CSV or NDJSON file as 'file'"}), 400
+
+    file_format = request.args.get('format')
+    if not file_format:
+        file_format = 'ndjson' if (upload.filename or '').lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+    if file_format not in ('csv', 'ndjson'):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    try:
+        # Werkzeug spools large uploads to disk, and the importer reads the stream chunk by chunk
+        report = import_subscribers(
+            upload.stream,
+            file_format,
+            chunk_size=current_app.config.get('SUBSCRIBER_IMPORT_CHUNK_SIZE', 1000),
+            max_errors=current_app.config.get('SUBSCRIBER_IMPORT_MAX_ERRORS', 1000)
+        )
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({"error": "File must be UTF-8 encoded"}), 400
+
+    return jsonify(report), 200
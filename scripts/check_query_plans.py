@@ -0,0 +1,251 @@
+import sys
+import os
+import re
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Query plans are read with SQLite's EXPLAIN QUERY PLAN on a throwaway database
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, desc
+from app import create_app
+from extensions import db, leaderboard, payment_reconciler
+from models.user import User
+from models.quiz import Quiz, QuizQuestion, QuestionAttempt
+from models.quiz_attempt import QuizAttempt
+from models.leaderboard import LeaderboardEntry
+from models.payment import Payment
+from models.community import CommunityPost, Comment
+from utils.pagination import keyset_page
+from services.community_feed import load_feed
+
+USERS = 200
+QUIZZES = 50
+QUESTIONS_PER_QUIZ = 10
+ATTEMPTS = 5000
+PAYMENTS = 2000
+POSTS = 2000
+COMMENTS = 10000
+
+# A plan step that walks a whole table or a whole index, e.g. "SCAN quiz_attempts" or
+# "SCAN leaderboard USING INDEX ix_leaderboard_user_id"; only SEARCH steps seek into an index
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)\b')
+
+
+def seed():
+    now = datetime.utcnow()
+    statuses = ['pending', 'sent_to_phone', 'completed', 'failed', 'cancelled', 'timeout']
+    forums = ['general', 'maths', 'science', 'history']
+
+    db.session.bulk_insert_mappings(User, [
+        {'id': i, 'first_name': f'User{i}', 'last_name': 'Seed', 'email': f'user{i}@example.com',
+         'password_hash': 'x', 'role': 'learner' if i % 10 else 'contributor', 'is_approved': True}
+        for i in range(1, USERS + 1)
+    ])
+    db.session.bulk_insert_mappings(Quiz, [
+        {'id': f'quiz-{i}', 'unit': f'U{i % 5}', 'subject': f'Subject {i}', 'title': f'Quiz {i}',
+         'deadline': now + timedelta(days=i - QUIZZES // 2), 'is_active': i % 4 != 0,
+         'created_by': (i % (USERS // 10)) * 10 + 10, 'total_questions': QUESTIONS_PER_QUIZ}
+        for i in range(1, QUIZZES + 1)
+    ])
+    db.session.bulk_insert_mappings(QuizQuestion, [
+        {'id': q * QUESTIONS_PER_QUIZ + n + 1, 'quiz_id': f'quiz-{q + 1}', 'question_text': f'Question {n}',
+         'options': ['a', 'b', 'c', 'd'], 'correct_answer': n % 4, 'points': 1, 'order_index': n}
+        for q in range(QUIZZES) for n in range(QUESTIONS_PER_QUIZ)
+    ])
+    db.session.bulk_insert_mappings(QuizAttempt, [
+        {'id': i, 'user_id': i % USERS + 1, 'quiz_id': f'quiz-{i % QUIZZES + 1}', 'attempt_number': 1,
+         'status': 'completed' if i % 5 else 'in_progress', 'score': float(i % 101),
+         'time_completed': now - timedelta(hours=i % 720) if i % 5 else None, 'time_taken': 300}
+        for i in range(1, ATTEMPTS + 1)
+    ])
+    db.session.bulk_insert_mappings(QuestionAttempt, [
+        {'quiz_attempt_id': i, 'question_id': (i % QUIZZES) * QUESTIONS_PER_QUIZ + n + 1,
+         'user_answer': str(n % 4), 'is_correct': (i + n) % 3 != 0, 'points_earned': 1}
+        for i in range(1, ATTEMPTS + 1) for n in range(QUESTIONS_PER_QUIZ)
+    ])
+    db.session.bulk_insert_mappings(LeaderboardEntry, [
+        {'user_id': i % USERS + 1, 'points': i * 7 % 1000, 'activity_type': 'Quizzes'}
+        for i in range(1, USERS * 3 + 1)
+    ])
+    db.session.bulk_insert_mappings(Payment, [
+        {'checkout_request_id': f'ws_CO_{i}', 'merchant_request_id': f'mr_{i}', 'phone_number': '254700000000',
+         'amount': 100.0, 'status': statuses[i % len(statuses)], 'created_at': now - timedelta(minutes=i)}
+        for i in range(1, PAYMENTS + 1)
+    ])
+    db.session.bulk_insert_mappings(CommunityPost, [
+        {'title': f'Post {i}', 'content': 'Seeded', 'author_id': i % USERS + 1,
+         'forum': forums[i % len(forums)], 'created_at': now - timedelta(minutes=i)}
+        for i in range(1, POSTS + 1)
+    ])
+    db.session.bulk_insert_mappings(Comment, [
+        {'post_id': i % POSTS + 1, 'author_id': i % USERS + 1, 'content': 'Seeded',
+         'created_at': now - timedelta(seconds=i)}
+        for i in range(1, COMMENTS + 1)
+    ])
+    db.session.commit()
+
+    # Give the planner real row counts to work with
+    db.session.execute(db.text('ANALYZE'))
+
+
+def learner_quiz_list():
+    Quiz.query.filter_by(is_active=True).order_by(Quiz.deadline.asc()).all()
+    Quiz.get_user_attempt_summaries(1)
+
+
+def learner_in_progress_attempt():
+    QuizAttempt.query.filter_by(id=1, quiz_id='quiz-2', user_id=1, status='in_progress').first()
+
+
+def learner_completed_attempts():
+    QuizAttempt.query.filter_by(user_id=1, quiz_id='quiz-2', status='completed').all()
+
+
+def contributor_quiz_list():
+    Quiz.query.filter_by(created_by=10).all()
+
+
+def quiz_question_accuracy():
+    QuestionAttempt.get_accuracy_by_question('quiz-1')
+
+
+def quiz_recent_attempts():
+    QuizAttempt.query.filter_by(quiz_id='quiz-1', status='completed').order_by(
+        desc(QuizAttempt.time_completed)
+    ).limit(10).all()
+
+
+def attempt_scoring():
+    attempt = db.session.get(QuizAttempt, 1)
+    attempt.calculate_score()
+    db.session.rollback()
+
+
+def admin_daily_activity():
+    date_from = datetime.utcnow() - timedelta(days=30)
+    db.session.query(
+        func.date(QuizAttempt.time_completed).label('day'),
+        func.count(QuizAttempt.id),
+        func.coalesce(func.sum(QuizAttempt.passed_case()), 0)
+    ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(
+        QuizAttempt.status == 'completed',
+        QuizAttempt.time_completed >= date_from
+    ).group_by(func.date(QuizAttempt.time_completed)).all()
+
+
+def leaderboard_reload():
+    leaderboard.reload()
+
+
+def leaderboard_user_entry():
+    LeaderboardEntry.query.filter_by(user_id=1).first()
+
+
+def payments_by_status():
+    Payment.query.filter_by(status='completed').order_by(Payment.created_at.desc()).limit(10).all()
+
+
+def payments_first_page():
+    keyset_page(Payment.query, [Payment.created_at, Payment.id], limit=20)
+
+
+def payments_keyset_page():
+    # Seeded payments get older as ids grow, so payment 20 ends the first page
+    last = db.session.get(Payment, 20)
+    next_values = [last.created_at, last.id]
+    keyset_page(Payment.query, [Payment.created_at, Payment.id], next_values, limit=20)
+    keyset_page(Payment.query.filter_by(status='completed'), [Payment.created_at, Payment.id], next_values, limit=20)
+
+
+def stale_payments():
+    cutoff = datetime.utcnow() - timedelta(minutes=5)
+    payment_reconciler.stale_query(cutoff).order_by(Payment.updated_at).limit(100).all()
+
+
+def community_feed_page():
+    posts, next_values = load_feed('maths', limit=20, comments_per_post=3)
+    load_feed('maths', next_values, limit=20, comments_per_post=3)
+
+
+def community_forum_posts():
+    CommunityPost.query.filter_by(forum='maths').order_by(CommunityPost.created_at.desc()).all()
+
+
+# Endpoint queries whose plans must only SEARCH, with the tables each one is
+# allowed to SCAN: quizzes is small enough to drive a join from, the
+# leaderboard reload aggregates every entry on purpose, and an unfiltered
+# first page walks the (created_at, id) index only until LIMIT rows
+QUERIES = [
+    (learner_quiz_list, ()),
+    (learner_in_progress_attempt, ()),
+    (learner_completed_attempts, ()),
+    (contributor_quiz_list, ()),
+    (quiz_question_accuracy, ()),
+    (quiz_recent_attempts, ()),
+    (attempt_scoring, ()),
+    (admin_daily_activity, ('quizzes',)),
+    (leaderboard_reload, ('leaderboard_entries',)),
+    (leaderboard_user_entry, ()),
+    (payments_by_status, ()),
+    (payments_first_page, ('payments',)),
+    (payments_keyset_page, ()),
+    (stale_payments, ()),
+    (community_forum_posts, ()),
+    (community_feed_page, ()),
+]
+
+
+def capture_statements(fn):
+    """Run a query function and return the SELECT statements it sent"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def full_scans(statement, parameters, allowed):
+    plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    details = [row[-1] for row in plan]
+    # Scans of subqueries SQLite has materialized (e.g. "SCAN anon_1") only read rows already narrowed down
+    scans = [
+        detail for detail in details
+        if FULL_SCAN.match(detail)
+        and FULL_SCAN.match(detail).group(1) in db.metadata.tables
+        and FULL_SCAN.match(detail).group(1) not in allowed
+    ]
+    return scans, details
+
+
+app = create_app()
+
+with app.app_context():
+    db.create_all()
+    seed()
+
+    failures = 0
+    for fn, allowed in QUERIES:
+        for statement, parameters in capture_statements(fn):
+            scans, details = full_scans(statement, parameters, allowed)
+            if scans:
+                failures += 1
+                print(f"❌ {fn.__name__}: {', '.join(scans)}")
+                print(f"   {' '.join(statement.split())}")
+                for detail in details:
+                    print(f"   - {detail}")
+            else:
+                print(f"✅ {fn.__name__}: {' | '.join(details)}")
+
+    if failures:
+        print(f"{failures} quer{'ies' if failures != 1 else 'y'} scanned a whole table or index.")
+        sys.exit(1)
+
+    print("No unexpected table or index scans found.")
@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from services.subscriber_import import import_subscribers
+
+if len(sys.argv) < 2:
+    print("Usage: python scripts/import_subscribers.py <file.csv|file.ndjson> [csv|ndjson]")
+    sys.exit(1)
+
+path = sys.argv[1]
+file_format = sys.argv[2] if len(sys.argv) > 2 else ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+app = create_app()
+
+with app.app_context():
+    with open(path, 'rb') as stream:
+        report = import_subscribers(
+            stream,
+            file_format,
+            chunk_size=app.config['SUBSCRIBER_IMPORT_CHUNK_SIZE'],
+            max_errors=app.config['SUBSCRIBER_IMPORT_MAX_ERRORS']
+        )
+
+    for error in report['errors']:
+        print(f"   row {error['row']}: {error['error']}")
+    if report['errors_truncated']:
+        print("   ... more errors not shown")
+
+    print(f"✅ Processed {report['processed']} rows: {report['created']} created, "
+          f"{report['updated']} updated, {report['failed']} failed.")
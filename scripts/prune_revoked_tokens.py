@@ -0,0 +1,14 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from extensions import token_revocation
+
+app = create_app()
+
+with app.app_context():
+    # Drop revocations for tokens that have expired on their own
+    pruned = token_revocation.prune()
+
+    print(f"✅ Pruned {pruned} expired revoked token{'s' if pruned != 1 else ''}.")
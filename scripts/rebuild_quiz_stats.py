@@ -0,0 +1,15 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from models.quiz_stats import QuizStats
+
+app = create_app()
+
+with app.app_context():
+    # Rebuild a single quiz when its id is passed, otherwise every quiz
+    quiz_id = sys.argv[1] if len(sys.argv) > 1 else None
+    rebuilt = QuizStats.rebuild(quiz_id)
+
+    print(f"✅ Rebuilt quiz stats for {rebuilt} quiz{'zes' if rebuilt != 1 else ''}.")
@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from extensions import payment_reconciler
+
+app = create_app()
+
+with app.app_context():
+    print(f"Payments waiting to be reconciled: {payment_reconciler.backlog()}")
+
+    # Sweep until the backlog is settled or only unanswered payments are left
+    while payment_reconciler.sweep():
+        pass
+
+    metrics = payment_reconciler.metrics()
+    print(f"✅ Reconciled {metrics['resolved']} of {metrics['queried']} payment{'s' if metrics['queried'] != 1 else ''} "
+          f"({metrics['unresolved']} still pending, {metrics['errors']} errors). Backlog: {metrics['backlog']}.")
@@ -0,0 +1,20 @@
+"""Rebuild community_posts.likes from post_likes.
+
+Run it with the app stopped. Running servers hold likes in memory until
+their next flush adds them to the column; a recount in between would
+count those likes once from post_likes and again when they are flushed.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from extensions import like_counter
+
+app = create_app()
+
+with app.app_context():
+    # Rebuild community_posts.likes from post_likes, e.g. after a worker died with unflushed likes
+    corrected = like_counter.recount()
+
+    print(f"✅ Corrected the like count of {corrected} post{'s' if corrected != 1 else ''}.")
@@ -0,0 +1,17 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from extensions import newsletter_delivery_worker
+
+# Optional kind: confirmation_email, admin_email or mailchimp
+kind = sys.argv[1] if len(sys.argv) > 1 else None
+
+app = create_app()
+
+with app.app_context():
+    # Give dead-lettered deliveries a fresh set of attempts once the cause is fixed
+    requeued = newsletter_delivery_worker.requeue_dead(kind)
+
+    print(f"✅ Requeued {requeued} dead-lettered deliver{'ies' if requeued != 1 else 'y'}.")
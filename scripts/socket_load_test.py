@@ -0,0 +1,182 @@
+"""Ramp up authenticated Socket.IO clients against one server until it stops keeping up.
+
+Start the server with one worker in the mode to measure, e.g.
+
+    SOCKETIO_ASYNC_MODE=threading SOCKETIO_THREADS=100 gunicorn -c gunicorn.conf.py run:app
+    SOCKETIO_ASYNC_MODE=eventlet gunicorn -c gunicorn.conf.py run:app
+
+then run this script against it once per mode. The server must accept
+the test's origin, e.g. SOCKETIO_CORS_ORIGINS=http://localhost:5000. Clients are added `--step`
+at a time; at each level a sample of them times a join_forum round trip,
+and with --fanout one post is created in the test forum and timed until
+every client has received it. The last level where connects still succeed
+and p95 latency stays under --max-p95-ms is what one worker sustains.
+
+Needs the websocket-client package on the machine running the test.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def mint_token(user_id):
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from models import User
+
+    app = create_app()
+    with app.app_context():
+        user = User.query.get(user_id) if user_id else User.query.order_by(User.id).first()
+        if not user:
+            sys.exit("No user to sign the test token for; create one or pass --token")
+        # Same identity shape as the tokens issued by /auth/login
+        return create_access_token(identity={"id": user.id, "role": user.role})
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class LoadClient:
+    def __init__(self, url, token, forum):
+        import socketio
+
+        self.sio = socketio.Client(reconnection=False)
+        self.url = url
+        self.token = token
+        self.forum = forum
+        self.seen = {}
+        self.sio.on('new_post', self._on_new_post)
+
+    def _on_new_post(self, data):
+        self.seen[data.get('title')] = time.perf_counter()
+
+    def connect(self):
+        self.sio.connect(self.url, auth={'token': self.token}, transports=['websocket'], wait_timeout=10)
+        self.sio.call('join_forum', {'forum': self.forum}, timeout=10)
+
+    def round_trip(self):
+        started = time.perf_counter()
+        self.sio.call('join_forum', {'forum': self.forum}, timeout=10)
+        return (time.perf_counter() - started) * 1000
+
+    def close(self):
+        self.sio.disconnect()
+
+
+def open_clients(count, args, token):
+    def open_one(_):
+        client = LoadClient(args.url, token, args.forum)
+        try:
+            client.connect()
+            return client
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(count, 50)) as pool:
+        opened = list(pool.map(open_one, range(count)))
+    return [client for client in opened if client], sum(1 for client in opened if client is None)
+
+
+def measure_fanout(clients, args, token):
+    """Milliseconds until every client received one new post, or None on timeout"""
+    import requests
+
+    title = f"load-test {time.time()}"
+    started = time.perf_counter()
+    try:
+        response = requests.post(f"{args.url}/api/community/posts", json={
+            'title': title, 'content': 'Socket load test', 'forum': args.forum
+        }, headers={'Authorization': f'Bearer {token}'}, timeout=30)
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        # A worker whose threads are all held by sockets can't take the request at all
+        return None
+
+    deadline = started + 30
+    while time.perf_counter() < deadline:
+        arrivals = [client.seen.get(title) for client in clients]
+        if arrivals and all(arrivals):
+            return (max(arrivals) - started) * 1000
+        time.sleep(0.05)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--token', help='Access token to connect with; minted for --user-id when omitted')
+    parser.add_argument('--user-id', type=int)
+    parser.add_argument('--forum', default='load-test')
+    parser.add_argument('--step', type=int, default=100)
+    parser.add_argument('--max-sockets', type=int, default=5000)
+    parser.add_argument('--sample', type=int, default=50, help='Clients timing a round trip at each level')
+    parser.add_argument('--max-p95-ms', type=float, default=500)
+    parser.add_argument('--max-failure-rate', type=float, default=0.01)
+    parser.add_argument('--fanout', action='store_true', help='Also time one post reaching every client (writes a post)')
+    args = parser.parse_args()
+
+    try:
+        import websocket  # noqa: F401
+    except ImportError:
+        sys.exit("The load test needs the websocket-client package: pip install websocket-client")
+
+    token = args.token or mint_token(args.user_id)
+    clients = []
+    sustained = 0
+
+    print(f"{'sockets':>8} {'failed':>7} {'p50 ms':>8} {'p95 ms':>8} {'fanout ms':>10}")
+    try:
+        while len(clients) < args.max_sockets:
+            opened, failed = open_clients(min(args.step, args.max_sockets - len(clients)), args, token)
+            clients.extend(opened)
+
+            sample = clients[-args.sample:]
+            latencies = []
+            lock = threading.Lock()
+
+            def probe(client):
+                try:
+                    latency = client.round_trip()
+                except Exception:
+                    return
+                with lock:
+                    latencies.append(latency)
+
+            with ThreadPoolExecutor(max_workers=len(sample) or 1) as pool:
+                list(pool.map(probe, sample))
+
+            fanout = measure_fanout(clients, args, token) if args.fanout else None
+            p50 = statistics.median(latencies) if latencies else None
+            p95 = percentile(latencies, 0.95)
+            print(f"{len(clients):>8} {failed:>7} "
+                  f"{p50 or float('nan'):>8.1f} {p95 or float('nan'):>8.1f} "
+                  f"{fanout if fanout is not None else float('nan'):>10.1f}")
+
+            attempted = len(opened) + failed
+            if (attempted and failed / attempted > args.max_failure_rate) or p95 is None or p95 > args.max_p95_ms \
+                    or (args.fanout and fanout is None):
+                break
+            sustained = len(clients)
+    finally:
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    print(f"✅ One worker sustained {sustained} concurrent socket{'s' if sustained != 1 else ''} "
+          f"(p95 round trip under {args.max_p95_ms:.0f} ms, under {args.max_failure_rate:.0%} failed connects).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+class BackgroundLoop:
+    """Runs a job function repeatedly as a Socket.IO background task.
+
+    The function runs inside an app context and returns a truthy value when
+    it did some work; the loop then runs it again at once, otherwise it
+    sleeps for `interval` seconds. Using socketio.start_background_task and
+    socketio.sleep keeps the loop cooperative under eventlet/gevent workers.
+    """
+
+    def __init__(self, app, socketio, name, fn, interval=1.0):
+        self.app = app
+        self.socketio = socketio
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.socketio.start_background_task(self._run)
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        from extensions import db
+
+        while self.running:
+            busy = False
+            with self.app.app_context():
+                try:
+                    busy = self.fn()
+                except Exception as e:
+                    print(f"[{self.name}] Error: {str(e)}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+            if not busy:
+                self.socketio.sleep(self.interval)
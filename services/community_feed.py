@@ -0,0 +1,109 @@
+from sqlalchemy import func
+
+from utils.pagination import keyset_page
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def serialize_comment(comment, authors):
+    return {
+        'id': comment.id,
+        'post_id': comment.post_id,
+        'author_id': comment.author_id,
+        'author_name': authors.get(comment.author_id),
+        'content': comment.content,
+        'created_at': _iso(comment.created_at)
+    }
+
+
+def serialize_post(post, authors, comment_count=0, latest_comments=()):
+    return {
+        'id': post.id,
+        'title': post.title,
+        'content': post.content,
+        'forum': post.forum,
+        'author_id': post.author_id,
+        'author_name': authors.get(post.author_id),
+        'likes': post.likes or 0,
+        'created_at': _iso(post.created_at),
+        'comment_count': comment_count,
+        'comments': [serialize_comment(comment, authors) for comment in latest_comments]
+    }
+
+
+def author_names(user_ids):
+    """Display names for a set of user ids, in one query"""
+    from extensions import db
+    from models.user import User
+
+    if not user_ids:
+        return {}
+    rows = db.session.query(User.id, User.first_name, User.last_name).filter(User.id.in_(user_ids)).all()
+    return {row.id: f"{row.first_name} {row.last_name}" for row in rows}
+
+
+def latest_comments(post_ids, per_post):
+    """The newest `per_post` comments of each post, oldest first, from one windowed query"""
+    from extensions import db
+    from models.community import Comment
+
+    if not post_ids or per_post <= 0:
+        return {}
+
+    position = func.row_number().over(
+        partition_by=Comment.post_id,
+        order_by=(Comment.created_at.desc(), Comment.id.desc())
+    ).label('position')
+    ranked = db.session.query(Comment.id, position).filter(Comment.post_id.in_(post_ids)).subquery()
+
+    comments = Comment.query.join(ranked, ranked.c.id == Comment.id).filter(
+        ranked.c.position <= per_post
+    ).order_by(Comment.post_id, Comment.created_at, Comment.id).all()
+
+    by_post = {}
+    for comment in comments:
+        by_post.setdefault(comment.post_id, []).append(comment)
+    return by_post
+
+
+def comment_counts(post_ids):
+    from extensions import db
+    from models.community import Comment
+
+    if not post_ids:
+        return {}
+    rows = db.session.query(Comment.post_id, func.count(Comment.id)).filter(
+        Comment.post_id.in_(post_ids)
+    ).group_by(Comment.post_id).all()
+    return dict(rows)
+
+
+def load_feed(forum, cursor_values=None, limit=20, comments_per_post=3):
+    """One page of a forum, newest first; returns (serialized posts, next cursor values or None).
+
+    Always four queries however many posts and comments there are: the
+    page itself, comment counts, the latest comments, and author names.
+    """
+    from models.community import CommunityPost
+
+    posts, next_values = keyset_page(
+        CommunityPost.query.filter(CommunityPost.forum == forum),
+        [CommunityPost.created_at, CommunityPost.id],
+        cursor_values,
+        limit=limit
+    )
+
+    post_ids = [post.id for post in posts]
+    counts = comment_counts(post_ids)
+    comments = latest_comments(post_ids, comments_per_post)
+
+    user_ids = {post.author_id for post in posts}
+    user_ids.update(comment.author_id for post_comments in comments.values() for comment in post_comments)
+    authors = author_names(user_ids)
+
+    return [
+        serialize_post(post, authors, counts.get(post.id, 0), comments.get(post.id, ()))
+        for post in posts
+    ], next_values
@@ -0,0 +1,184 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class HostMetrics:
+    """Request counts and latencies for one outbound host"""
+
+    def __init__(self, window=256):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds, failed):
+        self.requests += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.recent.append(seconds)
+        if failed:
+            self.errors += 1
+
+    def to_dict(self):
+        recent = sorted(self.recent)
+
+        def percentile(fraction):
+            if not recent:
+                return 0
+            return round(recent[min(int(len(recent) * fraction), len(recent) - 1)] * 1000, 1)
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'avg_ms': round(self.total_seconds / self.requests * 1000, 1) if self.requests else 0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(self.max_seconds * 1000, 1)
+        }
+
+
+class HttpClient:
+    """Shared keep-alive session for calls to M-Pesa, Google, Mailchimp and friends.
+
+    Connections are pooled per host, every call gets a default timeout, and
+    idempotent calls are retried with jittered exponential backoff on
+    connection errors and 429/502/503/504 responses. Non-idempotent calls
+    (an STK push, an OAuth code exchange) are only retried when the
+    connection could not be opened, since the request never reached the
+    server. Latency per host is available from metrics().
+    """
+
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+    RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+    def __init__(self, timeout=(3.05, 30), retries=2, backoff=0.5, max_backoff=8, pool_connections=10, pool_maxsize=20):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+        self.session = self._build_session(pool_connections, pool_maxsize)
+
+    @staticmethod
+    def _build_session(pool_connections, pool_maxsize):
+        session = requests.Session()
+        # Retries are handled here so they can follow the idempotency rules above
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def init_app(self, app):
+        self.timeout = (
+            app.config.get('OUTBOUND_HTTP_CONNECT_TIMEOUT', 3.05),
+            app.config.get('OUTBOUND_HTTP_READ_TIMEOUT', 30)
+        )
+        self.retries = app.config.get('OUTBOUND_HTTP_RETRIES', 2)
+        pool_maxsize = app.config.get('OUTBOUND_HTTP_POOL_SIZE', 20)
+
+        old_session = self.session
+        self.session = self._build_session(10, pool_maxsize)
+        old_session.close()
+
+        app.extensions['http_client'] = self
+
+    def _host_metrics(self, host):
+        with self._metrics_lock:
+            metrics = self._metrics.get(host)
+            if metrics is None:
+                metrics = self._metrics[host] = HostMetrics()
+            return metrics
+
+    @staticmethod
+    def never_sent(error):
+        # Connect timeouts and refused connections fail before any bytes reach the server
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(int(retry_after), self.max_backoff))
+        time.sleep(delay)
+
+    def request(self, method, url, idempotent=None, timeout=None, **kwargs):
+        """Send a request through the pooled session, retrying when it is safe to"""
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in self.IDEMPOTENT_METHODS
+        kwargs['timeout'] = timeout or self.timeout
+
+        host = urlsplit(url).netloc
+        metrics = self._host_metrics(host)
+        attempt = 0
+
+        while True:
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                elapsed = time.monotonic() - started
+                with self._metrics_lock:
+                    metrics.record(elapsed, failed=True)
+
+                # A failed connect never reached the server, so even a POST is safe to resend
+                can_retry = idempotent or self.never_sent(e)
+                if not can_retry or attempt >= self.retries:
+                    logger.warning("%s %s failed after %.0fms: %s", method, host, elapsed * 1000, e)
+                    raise
+
+                with self._metrics_lock:
+                    metrics.retries += 1
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            elapsed = time.monotonic() - started
+            with self._metrics_lock:
+                metrics.record(elapsed, failed=response.status_code >= 500)
+            logger.debug("%s %s %s in %.0fms", method, host, response.status_code, elapsed * 1000)
+
+            if idempotent and response.status_code in self.RETRY_STATUSES and attempt < self.retries:
+                with self._metrics_lock:
+                    metrics.retries += 1
+                response.close()
+                self._sleep_before_retry(attempt, response)
+                attempt += 1
+                continue
+
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def metrics(self):
+        """Latency and error counts per outbound host"""
+        with self._metrics_lock:
+            return {host: metrics.to_dict() for host, metrics in self._metrics.items()}
+
+
+# Global instance
+http_client = HttpClient()
@@ -0,0 +1,188 @@
+import json
+import threading
+
+
+def board_diff(previous, current):
+    """(changes, removed) between two {user_id: entry} boards, or None when they match"""
+    changes = [entry for user_id, entry in current.items() if previous.get(user_id) != entry]
+    removed = [user_id for user_id in previous if user_id not in current]
+    if not changes and not removed:
+        return None
+    return changes, removed
+
+
+class LocalBroadcastState:
+    """Sequence number and last pushed board, kept in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._entries = {}
+
+    def advance(self, current):
+        """Make `current` the pushed board; returns (sequence, changes, removed), or None when nothing changed"""
+        with self._lock:
+            diff = board_diff(self._entries, current)
+            if diff is None:
+                return None
+            self._sequence += 1
+            self._entries = current
+            return (self._sequence,) + diff
+
+    def load(self):
+        """(sequence, {user_id: entry}) of the last pushed board"""
+        with self._lock:
+            return self._sequence, dict(self._entries)
+
+
+class RedisBroadcastState:
+    """Sequence number and last pushed board shared by every worker through one Redis key.
+
+    The key holds both, and advance() swaps it under WATCH, so two workers
+    flushing at once can't hand out the same sequence or diff against a
+    board the other has already replaced.
+    """
+
+    def __init__(self, client, key='eduhive:leaderboard:broadcast'):
+        self.client = client
+        self.key = key
+
+    @staticmethod
+    def _decode(raw):
+        if not raw:
+            return 0, {}
+        state = json.loads(raw)
+        return state['sequence'], {entry['user_id']: entry for entry in state['entries']}
+
+    def advance(self, current):
+        import redis
+
+        # Compared in the form they are stored in
+        current = {entry['user_id']: entry for entry in json.loads(json.dumps(list(current.values())))}
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self.key)
+                    sequence, previous = self._decode(pipe.get(self.key))
+                    diff = board_diff(previous, current)
+                    if diff is None:
+                        return None
+                    pipe.multi()
+                    pipe.set(self.key, json.dumps({'sequence': sequence + 1, 'entries': list(current.values())}))
+                    pipe.execute()
+                    return (sequence + 1,) + diff
+                except redis.WatchError:
+                    # Another worker pushed in between; diff against its board instead
+                    continue
+
+    def load(self):
+        return self._decode(self.client.get(self.key))
+
+
+class LeaderboardBroadcaster:
+    """Pushes coalesced leaderboard changes to Socket.IO clients.
+
+    Callers only mark the board as changed with notify(). The first call in a
+    window schedules one flush; the flush reads the current top entries,
+    compares them with the last snapshot it pushed and emits just the rows
+    that moved. Every diff carries a sequence number and the sequence it was
+    computed against, so a client that missed one can ask for a full snapshot
+    with a 'leaderboard_resync' event.
+
+    Behind a Socket.IO message queue every worker's diffs reach every
+    client, so with SOCKETIO_BACKEND=redis the sequence and last pushed
+    board live in Redis (LEADERBOARD_BROADCAST_REDIS_KEY) and all workers
+    number one stream of diffs. Diffs from two workers can still arrive out
+    of order; a client that sees a gap resyncs, and drops diffs older than
+    its snapshot.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.engine = None
+        self.window = 1.0
+        self.size = 10
+        self.namespaces = ('/leaderboard', '/admin')
+        self._lock = threading.Lock()
+        self._pending = False
+        self.state = LocalBroadcastState()
+
+    def init_app(self, app, socketio, engine, client=None):
+        self.app = app
+        self.socketio = socketio
+        self.engine = engine
+
+        if app.config.get('SOCKETIO_BACKEND', 'none') == 'redis':
+            if client is None:
+                import redis
+                client = redis.Redis.from_url(app.config['REDIS_URL'], decode_responses=True)
+            self.state = RedisBroadcastState(
+                client, app.config.get('LEADERBOARD_BROADCAST_REDIS_KEY', 'eduhive:leaderboard:broadcast')
+            )
+        else:
+            self.state = LocalBroadcastState()
+        self.window = app.config.get('LEADERBOARD_BROADCAST_WINDOW', 1.0)
+        self.size = app.config.get('LEADERBOARD_BROADCAST_SIZE', 10)
+
+        for namespace in self.namespaces:
+            socketio.on_event('leaderboard_resync', self._handle_resync, namespace=namespace)
+
+        app.extensions['leaderboard_broadcaster'] = self
+
+    def notify(self):
+        """Mark the leaderboard as changed; at most one flush runs per window"""
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = True
+
+        self.socketio.start_background_task(self._flush_after_window)
+
+    def _flush_after_window(self):
+        self.socketio.sleep(self.window)
+
+        # Clear the flag before reading so changes made during the flush schedule another one
+        with self._lock:
+            self._pending = False
+
+        with self.app.app_context():
+            self.flush()
+
+    def _current_entries(self):
+        from services.leaderboard_service import serialize_ranked_entries
+        return serialize_ranked_entries(self.engine.top(self.size))
+
+    def flush(self):
+        """Emit the changes since the last pushed snapshot, if there are any"""
+        current = {entry['user_id']: entry for entry in self._current_entries()}
+
+        advanced = self.state.advance(current)
+        if advanced is None:
+            return None
+
+        sequence, changes, removed = advanced
+        payload = {
+            'sequence': sequence,
+            'base_sequence': sequence - 1,
+            'changes': changes,
+            'removed': removed
+        }
+
+        for namespace in self.namespaces:
+            self.socketio.emit('leaderboard_diff', payload, namespace=namespace)
+
+        return payload
+
+    def snapshot(self):
+        """Full copy of the last pushed board with its sequence number"""
+        sequence, entries = self.state.load()
+        return {'sequence': sequence, 'entries': sorted(entries.values(), key=lambda entry: entry['rank'])}
+
+    def _handle_resync(self, data=None):
+        from flask_socketio import emit
+
+        if not self.state.load()[0]:
+            # Nothing pushed yet, so build the first snapshot now
+            self.flush()
+        emit('leaderboard_snapshot', self.snapshot())
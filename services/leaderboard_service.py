@@ -0,0 +1,384 @@
+import random
+import threading
+import time
+
+
+class _SkipListNode:
+    __slots__ = ('member', 'score', 'forward', 'span')
+
+    def __init__(self, member, score, level):
+        self.member = member
+        self.score = score
+        self.forward = [None] * level
+        self.span = [0] * level
+
+
+class SkipList:
+    """Indexable skip list ordered by (score, member), like a Redis sorted set.
+
+    Each forward pointer stores how many nodes it skips, so insert, delete
+    and rank lookups are O(log n) and a range of k members is O(log n + k).
+    """
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self.head = _SkipListNode(None, None, self.MAX_LEVEL)
+        self.level = 1
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self.P:
+            level += 1
+        return level
+
+    def insert(self, member, score):
+        """Insert a member that is not already in the list"""
+        update = [None] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        key = (score, member)
+
+        node = self.head
+        for i in reversed(range(self.level)):
+            rank[i] = 0 if i == self.level - 1 else rank[i + 1]
+            while node.forward[i] and (node.forward[i].score, node.forward[i].member) < key:
+                rank[i] += node.span[i]
+                node = node.forward[i]
+            update[i] = node
+
+        level = self._random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                rank[i] = 0
+                update[i] = self.head
+                update[i].span[i] = self.length
+            self.level = level
+
+        new_node = _SkipListNode(member, score, level)
+        for i in range(level):
+            new_node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = new_node
+            new_node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = (rank[0] - rank[i]) + 1
+
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+
+        self.length += 1
+
+    def delete(self, member, score):
+        """Remove a member with its current score, returning True if it was found"""
+        update = [None] * self.MAX_LEVEL
+        key = (score, member)
+
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.forward[i] and (node.forward[i].score, node.forward[i].member) < key:
+                node = node.forward[i]
+            update[i] = node
+
+        node = node.forward[0]
+        if not node or node.member != member or node.score != score:
+            return False
+
+        for i in range(self.level):
+            if update[i].forward[i] is node:
+                update[i].span[i] += node.span[i] - 1
+                update[i].forward[i] = node.forward[i]
+            else:
+                update[i].span[i] -= 1
+
+        while self.level > 1 and self.head.forward[self.level - 1] is None:
+            self.level -= 1
+        self.length -= 1
+        return True
+
+    def rank(self, member, score):
+        """1-based ascending rank of a member, or None if it is missing"""
+        key = (score, member)
+        traversed = 0
+
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.forward[i] and (node.forward[i].score, node.forward[i].member) <= key:
+                traversed += node.span[i]
+                node = node.forward[i]
+            if node is not self.head and node.member == member:
+                return traversed
+        return None
+
+    def node_at(self, rank):
+        """Node at a 1-based ascending rank"""
+        if rank < 1 or rank > self.length:
+            return None
+
+        traversed = 0
+        node = self.head
+        for i in reversed(range(self.level)):
+            while node.forward[i] and traversed + node.span[i] <= rank:
+                traversed += node.span[i]
+                node = node.forward[i]
+            if traversed == rank:
+                return node
+        return None
+
+    def range(self, start, stop):
+        """(member, score) pairs for 1-based ascending ranks start..stop inclusive"""
+        start = max(start, 1)
+        stop = min(stop, self.length)
+        items = []
+
+        node = self.node_at(start)
+        while node and len(items) < stop - start + 1:
+            items.append((node.member, node.score))
+            node = node.forward[0]
+        return items
+
+
+class LocalLeaderboardBackend:
+    """In-process sorted set backed by a skip list"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scores = {}
+        self._skiplist = SkipList()
+
+    def _set(self, member, score):
+        current = self._scores.get(member)
+        if current is not None:
+            self._skiplist.delete(member, current)
+        self._skiplist.insert(member, score)
+        self._scores[member] = score
+
+    def load(self, scores):
+        with self._lock:
+            self._scores = {}
+            self._skiplist = SkipList()
+            for member, score in scores:
+                self._set(member, score)
+
+    def count(self):
+        return len(self._skiplist)
+
+    def incr(self, member, amount):
+        with self._lock:
+            score = self._scores.get(member, 0) + amount
+            self._set(member, score)
+            return score
+
+    def set(self, member, score):
+        with self._lock:
+            self._set(member, score)
+
+    def score(self, member):
+        return self._scores.get(member)
+
+    def rank(self, member):
+        """0-based position counted from the highest score"""
+        with self._lock:
+            score = self._scores.get(member)
+            if score is None:
+                return None
+            return self.count() - self._skiplist.rank(member, score)
+
+    def top_range(self, start, stop):
+        """(member, score) pairs for 0-based descending positions start..stop inclusive"""
+        with self._lock:
+            length = self.count()
+            # Descending positions map onto the tail of the ascending list
+            items = self._skiplist.range(length - stop, length - start)
+            items.reverse()
+            return items
+
+
+class RedisLeaderboardBackend:
+    """Sorted set stored in Redis (or anything speaking its protocol)"""
+
+    def __init__(self, client, key='eduhive:leaderboard'):
+        self.client = client
+        self.key = key
+
+    def load(self, scores, chunk_size=1000):
+        pipe = self.client.pipeline()
+        pipe.delete(self.key)
+        chunk = {}
+        for member, score in scores:
+            chunk[member] = score
+            if len(chunk) >= chunk_size:
+                pipe.zadd(self.key, chunk)
+                chunk = {}
+        if chunk:
+            pipe.zadd(self.key, chunk)
+        pipe.execute()
+
+    def count(self):
+        return self.client.zcard(self.key)
+
+    def incr(self, member, amount):
+        return self.client.zincrby(self.key, amount, member)
+
+    def set(self, member, score):
+        self.client.zadd(self.key, {member: score})
+
+    def score(self, member):
+        return self.client.zscore(self.key, member)
+
+    def rank(self, member):
+        return self.client.zrevrank(self.key, member)
+
+    def top_range(self, start, stop):
+        items = self.client.zrevrange(self.key, start, stop, withscores=True)
+        return [
+            (member.decode() if isinstance(member, bytes) else member, score)
+            for member, score in items
+        ]
+
+
+class LeaderboardEngine:
+    """Ranks users by XP in a sorted set warmed from the leaderboard_entries table.
+
+    The SQL table stays the durable record; the backend only answers top-k,
+    rank and neighbour queries. The local backend is per process, so it is
+    refreshed from SQL every LEADERBOARD_REFRESH_SECONDS; deployments with
+    several workers should use the Redis backend instead.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.refresh_seconds = 60
+        self._loaded_at = None
+        self._load_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('LEADERBOARD_BACKEND', 'local')
+        if backend == 'redis':
+            import redis
+            client = redis.Redis.from_url(app.config['REDIS_URL'], decode_responses=True)
+            self.backend = RedisLeaderboardBackend(client, app.config.get('LEADERBOARD_REDIS_KEY', 'eduhive:leaderboard'))
+            # Redis is shared by every worker, so it never needs a periodic refresh
+            self.refresh_seconds = None
+        elif backend == 'local':
+            self.backend = LocalLeaderboardBackend()
+            self.refresh_seconds = app.config.get('LEADERBOARD_REFRESH_SECONDS', 60)
+        else:
+            raise ValueError(f"Unknown LEADERBOARD_BACKEND: {backend}")
+
+        self._loaded_at = None
+        app.extensions['leaderboard'] = self
+
+    def reload(self):
+        """Rebuild the sorted set from the durable leaderboard_entries table"""
+        from extensions import db
+        from models.leaderboard import LeaderboardEntry
+        from sqlalchemy import func
+
+        rows = db.session.query(
+            LeaderboardEntry.user_id,
+            func.sum(LeaderboardEntry.points)
+        ).group_by(LeaderboardEntry.user_id).all()
+
+        self.backend.load((str(user_id), int(points or 0)) for user_id, points in rows)
+        self._loaded_at = time.monotonic()
+
+    def _is_fresh(self):
+        if self._loaded_at is None:
+            return False
+        return self.refresh_seconds is None or time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    def ensure_loaded(self):
+        if self._is_fresh():
+            return
+
+        with self._load_lock:
+            if self._is_fresh():
+                return
+            if self.refresh_seconds is None and self.backend.count():
+                # Another worker already filled the shared set
+                self._loaded_at = time.monotonic()
+            else:
+                self.reload()
+
+    @staticmethod
+    def _entry(position, member, score):
+        return {'rank': position + 1, 'user_id': int(member), 'total_xp': int(score)}
+
+    def set_xp(self, user_id, total_xp):
+        """Record a user's committed XP total and return it.
+
+        Takes the total from SQL rather than adding the gain, since warming a
+        cold or stale set already reads the committed XP and would count the
+        gain twice.
+        """
+        self.ensure_loaded()
+        self.backend.set(str(user_id), int(total_xp))
+        return int(total_xp)
+
+    def top(self, k):
+        """Highest ranked k users"""
+        self.ensure_loaded()
+        return [
+            self._entry(position, member, score)
+            for position, (member, score) in enumerate(self.backend.top_range(0, k - 1))
+        ]
+
+    def rank(self, user_id):
+        """User's 1-based rank and XP, or None if they are not on the board"""
+        self.ensure_loaded()
+        position = self.backend.rank(str(user_id))
+        if position is None:
+            return None
+        return self._entry(position, str(user_id), self.backend.score(str(user_id)) or 0)
+
+    def around(self, user_id, radius=5):
+        """User's rank together with up to `radius` users above and below"""
+        self.ensure_loaded()
+        position = self.backend.rank(str(user_id))
+        if position is None:
+            return None, []
+
+        start = max(position - radius, 0)
+        items = self.backend.top_range(start, position + radius)
+        neighbours = [
+            self._entry(start + offset, member, score)
+            for offset, (member, score) in enumerate(items)
+        ]
+        me = next((entry for entry in neighbours if entry['user_id'] == int(user_id)), None)
+        return me, neighbours
+
+
+def badges_for_xp(total_xp):
+    badges = []
+
+    if total_xp >= 1000:
+        badges.append("Top Scorer")
+    elif total_xp >= 500:
+        badges.append("Rising Star")
+
+    return badges
+
+
+def serialize_ranked_entries(ranked):
+    """Attach user names and badges to ranked engine entries, loading users in one query"""
+    from models.user import User
+
+    user_ids = [entry["user_id"] for entry in ranked]
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()} if user_ids else {}
+
+    return [
+        {
+            "rank": entry["rank"],
+            "user_id": entry["user_id"],
+            "name": f"{users[entry['user_id']].first_name} {users[entry['user_id']].last_name}",
+            "total_xp": entry["total_xp"],
+            "badges": badges_for_xp(entry["total_xp"])
+        }
+        for entry in ranked
+        if entry["user_id"] in users
+    ]
@@ -0,0 +1,168 @@
+import threading
+from collections import Counter
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.exc import IntegrityError
+
+from services.socket_rooms import forum_room, post_room
+
+
+class LikeCounter:
+    """Records post likes and folds them into community_posts.likes in batches.
+
+    Each like is its own post_likes row, so a user can like a post only
+    once and the table is the source of truth. The denormalized
+    community_posts.likes column is not touched per click: increments are
+    summed in memory and the first like in a window schedules one flush,
+    which applies `likes = likes + n` once per post and then emits a
+    single 'like_post' event per post to its forum and post rooms. Several processes
+    can do this side by side since every flush is a relative update;
+    recount() rebuilds the column from post_likes if a process dies with
+    unflushed increments.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.rooms = None
+        self.window = 1.0
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._forums = {}
+        self._scheduled = False
+
+    def init_app(self, app, socketio, rooms):
+        self.app = app
+        self.socketio = socketio
+        self.rooms = rooms
+        self.window = app.config.get('COMMUNITY_LIKE_FLUSH_SECONDS', 1.0)
+        app.extensions['like_counter'] = self
+
+    def like(self, post_id, forum, user_id):
+        """Record a like; returns False when the user had already liked the post"""
+        from extensions import db
+        from models.community import PostLike
+
+        db.session.add(PostLike(post_id=post_id, user_id=user_id))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+        self._add(post_id, forum, 1)
+        return True
+
+    def unlike(self, post_id, forum, user_id):
+        """Remove a like; returns False when there was none"""
+        from extensions import db
+        from models.community import PostLike
+
+        removed = PostLike.query.filter_by(post_id=post_id, user_id=user_id).delete(synchronize_session=False)
+        db.session.commit()
+        if not removed:
+            return False
+
+        self._add(post_id, forum, -1)
+        return True
+
+    def pending(self, post_id):
+        """Increments for a post that haven't been flushed yet"""
+        with self._lock:
+            return self._pending.get(post_id, 0)
+
+    def _add(self, post_id, forum, delta):
+        with self._lock:
+            self._pending[post_id] += delta
+            self._forums[post_id] = forum
+            if self._scheduled:
+                return
+            self._scheduled = True
+
+        self.socketio.start_background_task(self._flush_after_window)
+
+    def _flush_after_window(self):
+        while True:
+            self.socketio.sleep(self.window)
+
+            # Clear the flag before flushing so likes arriving meanwhile schedule another flush
+            with self._lock:
+                self._scheduled = False
+
+            try:
+                with self.app.app_context():
+                    self.flush()
+                return
+            except Exception as e:
+                print(f"[like-counter] Error: {str(e)}")
+
+            # The increments were put back; try again after another window unless a new like already scheduled it
+            with self._lock:
+                if self._scheduled:
+                    return
+                self._scheduled = True
+
+    def flush(self):
+        """Apply all pending increments, one UPDATE per post in a single executemany"""
+        from extensions import db
+        from models.community import CommunityPost
+
+        with self._lock:
+            pending = {post_id: delta for post_id, delta in self._pending.items() if delta}
+            forums = self._forums
+            self._pending = Counter()
+            self._forums = {}
+
+        if not pending:
+            return 0
+
+        posts = CommunityPost.__table__
+        statement = update(posts).where(posts.c.id == bindparam('b_id')).values(
+            likes=func.coalesce(posts.c.likes, 0) + bindparam('b_delta')
+        )
+
+        try:
+            db.session.execute(statement, [{'b_id': post_id, 'b_delta': delta} for post_id, delta in pending.items()])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Put the increments back for the next flush
+            with self._lock:
+                self._pending.update(pending)
+                for post_id in pending:
+                    self._forums.setdefault(post_id, forums.get(post_id))
+            raise
+
+        totals = dict(
+            db.session.query(CommunityPost.id, CommunityPost.likes).filter(CommunityPost.id.in_(pending.keys())).all()
+        )
+        for post_id, likes in totals.items():
+            self.rooms.emit('like_post', {'postId': post_id, 'likes': likes or 0},
+                            [forum_room(forums.get(post_id)), post_room(post_id)])
+
+        return len(pending)
+
+    def recount(self):
+        """Rebuild community_posts.likes from post_likes; returns the number of posts corrected"""
+        from extensions import db
+        from models.community import CommunityPost, PostLike
+
+        actual = dict(
+            db.session.query(PostLike.post_id, func.count(PostLike.id)).group_by(PostLike.post_id).all()
+        )
+        stored = db.session.query(CommunityPost.id, CommunityPost.likes).all()
+
+        corrections = [
+            {'b_id': post_id, 'b_likes': actual.get(post_id, 0)}
+            for post_id, likes in stored
+            if (likes or 0) != actual.get(post_id, 0)
+        ]
+        if corrections:
+            posts = CommunityPost.__table__
+            db.session.execute(
+                update(posts).where(posts.c.id == bindparam('b_id')).values(likes=bindparam('b_likes')),
+                corrections
+            )
+            db.session.commit()
+
+        return len(corrections)
@@ -0,0 +1,75 @@
+import base64
+import threading
+import time
+from services.http_client import http_client
+
+
+class MpesaTokenCache:
+    """Daraja OAuth tokens shared by every M-Pesa caller in the process.
+
+    Tokens are reused until REFRESH_MARGIN_SECONDS before Safaricom's
+    expires_in runs out. Refreshes happen under a lock, so concurrent
+    payment requests that find the token stale trigger a single call to
+    /oauth/v1/generate and then all use its result.
+    """
+
+    REFRESH_MARGIN_SECONDS = 60
+    DEFAULT_EXPIRES_IN = 3599
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    @staticmethod
+    def _fetch(base_url, consumer_key, consumer_secret):
+        credentials = base64.b64encode(f"{consumer_key}:{consumer_secret}".encode()).decode('utf-8')
+        headers = {
+            'Authorization': f'Basic {credentials}',
+            'Content-Type': 'application/json'
+        }
+
+        response = http_client.get(
+            f"{base_url}/oauth/v1/generate",
+            headers=headers,
+            params={'grant_type': 'client_credentials'}
+        )
+        response.raise_for_status()
+
+        data = response.json()
+        # Daraja sends expires_in as a string, e.g. "3599"
+        return data['access_token'], int(data.get('expires_in') or MpesaTokenCache.DEFAULT_EXPIRES_IN)
+
+    def _cached(self, key):
+        cached = self._tokens.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+
+    def get_token(self, base_url, consumer_key, consumer_secret):
+        """Cached access token for these credentials, refreshed once it is close to expiry"""
+        key = (base_url, consumer_key)
+
+        token = self._cached(key)
+        if token:
+            return token
+
+        with self._lock:
+            # Another request may have refreshed while this one waited
+            token = self._cached(key)
+            if token:
+                return token
+
+            token, expires_in = self._fetch(base_url, consumer_key, consumer_secret)
+            # Short-lived tokens are refreshed halfway through instead
+            margin = min(self.REFRESH_MARGIN_SECONDS, expires_in / 2)
+            self._tokens[key] = (token, time.monotonic() + expires_in - margin)
+            return token
+
+    def invalidate(self, base_url, consumer_key):
+        """Forget a token Safaricom has rejected so the next call fetches a new one"""
+        with self._lock:
+            self._tokens.pop((base_url, consumer_key), None)
+
+
+# Global instance
+mpesa_token_cache = MpesaTokenCache()
@@ -0,0 +1,267 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from services.background import BackgroundLoop
+
+# Daraja result codes that are not plain failures
+RESULT_CODE_STATUSES = {
+    0: 'completed',
+    1032: 'cancelled',  # Request cancelled by the user
+    1037: 'timeout',    # The phone could not be reached
+}
+
+
+def record_callback(kind, checkout_request_id, merchant_request_id=None, result_code=None, result_desc=None, payload=None,
+                    reference=None):
+    """Append a received callback, returning False when it is a duplicate delivery"""
+    from extensions import db
+    from models.mpesa_callback import MpesaCallback
+
+    db.session.add(MpesaCallback(
+        kind=kind,
+        checkout_request_id=checkout_request_id,
+        merchant_request_id=merchant_request_id,
+        reference=(reference or '')[:100] or None,
+        result_code=result_code,
+        result_desc=(result_desc or '')[:200] or None,
+        payload=payload
+    ))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def callback_changes(callback):
+    """Target status and payment fields carried by one callback"""
+    if callback.kind == 'timeout':
+        return {'status': 'timeout', 'result_code': None, 'result_desc': 'Transaction timed out',
+                'mpesa_receipt_number': None, 'transaction_date': None}
+
+    changes = {
+        'status': RESULT_CODE_STATUSES.get(callback.result_code, 'failed'),
+        'result_code': callback.result_code,
+        'result_desc': callback.result_desc,
+        'mpesa_receipt_number': None,
+        'transaction_date': None
+    }
+
+    stk_callback = (callback.payload or {}).get('Body', {}).get('stkCallback', {})
+    for item in stk_callback.get('CallbackMetadata', {}).get('Item', []):
+        if item.get('Name') == 'MpesaReceiptNumber':
+            changes['mpesa_receipt_number'] = item.get('Value')
+        elif item.get('Name') == 'TransactionDate':
+            try:
+                changes['transaction_date'] = datetime.strptime(str(item.get('Value')), '%Y%m%d%H%M%S')
+            except ValueError:
+                pass
+
+    return changes
+
+
+class MpesaCallbackApplier:
+    """Applies logged callbacks to payments in batches.
+
+    Each pass loads a batch of unapplied callbacks and their payments in two
+    queries, checks every change against the payment state machine, then
+    writes all payment updates with a single executemany UPDATE. The UPDATE
+    only matches rows whose current status may still move to the new one,
+    so a late timeout can never replace a completion, even one written by
+    another process in the meantime; payments the UPDATE did not reach are
+    re-read and their callbacks re-decided on the next pass. Callbacks are matched on Safaricom's
+    ids, or on the ref we put in the CallBackURL for payments whose push
+    response never arrived ('unconfirmed'); those also get Safaricom's ids
+    filled in. Callbacks whose payment is not linked yet (the outbox worker
+    may still be committing Safaricom's ids) are set aside for
+    MPESA_CALLBACK_RETRY_SECONDS between tries, so they never hold up the
+    batch, and given up on after MPESA_CALLBACK_UNMATCHED_SECONDS.
+    """
+
+    # statuses_allowing() never returns more than this many statuses
+    GUARD_SIZE = 4
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.batch_size = 200
+        self.poll_seconds = 0.5
+        self.unmatched_seconds = 600
+        self.retry_seconds = 5
+        self.loop = None
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.batch_size = app.config.get('MPESA_CALLBACK_BATCH_SIZE', 200)
+        self.poll_seconds = app.config.get('MPESA_CALLBACK_POLL_SECONDS', 0.5)
+        self.unmatched_seconds = app.config.get('MPESA_CALLBACK_UNMATCHED_SECONDS', 600)
+        self.retry_seconds = app.config.get('MPESA_CALLBACK_RETRY_SECONDS', 5)
+        app.extensions['mpesa_callback_applier'] = self
+
+    def start(self):
+        self.loop = BackgroundLoop(self.app, self.socketio, 'mpesa-callbacks', self.apply_batch, self.poll_seconds).start()
+
+    @staticmethod
+    def _payments_for(callbacks):
+        from extensions import db
+        from models.payment import Payment
+
+        checkout_ids = {callback.checkout_request_id for callback in callbacks}
+        merchant_ids = {callback.merchant_request_id for callback in callbacks if callback.merchant_request_id}
+        references = {callback.reference for callback in callbacks if callback.reference}
+
+        conditions = [Payment.mpesa_checkout_request_id.in_(checkout_ids)]
+        if merchant_ids:
+            conditions.append(Payment.merchant_request_id.in_(merchant_ids))
+        if references:
+            conditions.append(Payment.checkout_request_id.in_(references))
+
+        rows = db.session.query(
+            Payment.id, Payment.status, Payment.checkout_request_id,
+            Payment.mpesa_checkout_request_id, Payment.merchant_request_id
+        ).filter(or_(*conditions)).all()
+
+        by_checkout = {row.mpesa_checkout_request_id: row for row in rows if row.mpesa_checkout_request_id}
+        by_merchant = {row.merchant_request_id: row for row in rows if row.merchant_request_id}
+        by_reference = {row.checkout_request_id: row for row in rows}
+        return by_checkout, by_merchant, by_reference
+
+    def _guard_params(self, to_status):
+        from models.payment import Payment
+
+        # executemany can't expand IN lists per row, so the allowed statuses are padded to fixed slots
+        allowed = Payment.statuses_allowing(to_status)
+        allowed += allowed[-1:] * (self.GUARD_SIZE - len(allowed))
+        return {f'b_from_{i}': status for i, status in enumerate(allowed)}
+
+    def apply_batch(self):
+        """Apply one batch of due callbacks; returns True when a full batch was settled"""
+        from extensions import db
+        from models.payment import Payment
+        from models.mpesa_callback import MpesaCallback
+
+        now = datetime.utcnow()
+        callbacks = MpesaCallback.query.filter(
+            MpesaCallback.applied_at.is_(None),
+            or_(MpesaCallback.next_attempt_at.is_(None), MpesaCallback.next_attempt_at <= now)
+        ).order_by(MpesaCallback.id).limit(self.batch_size).all()
+        if not callbacks:
+            return False
+
+        by_checkout, by_merchant, by_reference = self._payments_for(callbacks)
+        unmatched_before = now - timedelta(seconds=self.unmatched_seconds)
+
+        # Current status per payment, advanced as this batch's callbacks are applied in order
+        statuses = {}
+        updates = {}
+        outcomes = {}
+        payment_ids = {}
+        deferred = []
+
+        for callback in callbacks:
+            payment = (by_checkout.get(callback.checkout_request_id)
+                       or by_merchant.get(callback.merchant_request_id)
+                       or by_reference.get(callback.reference))
+            if payment is None:
+                if callback.received_at < unmatched_before:
+                    outcomes[callback.id] = 'unmatched'
+                else:
+                    deferred.append(callback.id)
+                continue
+
+            payment_ids[callback.id] = payment.id
+            changes = callback_changes(callback)
+            current = statuses.get(payment.id, payment.status)
+
+            if not Payment.can_transition(current, changes['status']):
+                outcomes[callback.id] = 'ignored'
+                continue
+
+            statuses[payment.id] = changes['status']
+            row = updates.setdefault(payment.id, {
+                'b_id': payment.id,
+                'b_checkout_request_id': payment.checkout_request_id,
+                'b_mpesa_checkout_request_id': callback.checkout_request_id,
+                'b_merchant_request_id': callback.merchant_request_id,
+                'b_mpesa_receipt_number': None,
+                'b_transaction_date': None
+            })
+            row.update(self._guard_params(changes['status']))
+            row.update({
+                'b_status': changes['status'],
+                'b_result_code': changes['result_code'],
+                'b_result_desc': changes['result_desc'],
+                'b_updated_at': now
+            })
+            if changes['mpesa_receipt_number']:
+                row['b_mpesa_receipt_number'] = changes['mpesa_receipt_number']
+            if changes['transaction_date']:
+                row['b_transaction_date'] = changes['transaction_date']
+            outcomes[callback.id] = 'applied'
+
+        if updates:
+            payments = Payment.__table__
+            # One statement for the whole batch; the status guard makes it safe against concurrent writers
+            statement = update(payments).where(
+                payments.c.id == bindparam('b_id'),
+                payments.c.status.in_([bindparam(f'b_from_{i}') for i in range(self.GUARD_SIZE)])
+            ).values(
+                status=bindparam('b_status'),
+                # Only fills in Safaricom's ids for payments that never got them from the push response
+                mpesa_checkout_request_id=func.coalesce(payments.c.mpesa_checkout_request_id,
+                                                        bindparam('b_mpesa_checkout_request_id')),
+                merchant_request_id=func.coalesce(payments.c.merchant_request_id, bindparam('b_merchant_request_id')),
+                result_code=bindparam('b_result_code'),
+                result_desc=bindparam('b_result_desc'),
+                mpesa_receipt_number=bindparam('b_mpesa_receipt_number'),
+                transaction_date=bindparam('b_transaction_date'),
+                updated_at=bindparam('b_updated_at')
+            )
+            db.session.execute(statement, list(updates.values()))
+
+            # executemany has no per-row rowcount; rows the guard skipped still have their old updated_at
+            written = {
+                row.id for row in db.session.query(Payment.id).filter(
+                    Payment.id.in_(updates.keys()), Payment.updated_at == now
+                )
+            }
+            missed = set(updates) - written
+            if missed:
+                # Another writer moved these payments first; decide their callbacks again from the new status
+                for callback_id, payment_id in payment_ids.items():
+                    if payment_id in missed:
+                        outcomes.pop(callback_id, None)
+                for payment_id in missed:
+                    del updates[payment_id]
+
+        if deferred:
+            MpesaCallback.query.filter(MpesaCallback.id.in_(deferred)).update(
+                {'next_attempt_at': now + timedelta(seconds=self.retry_seconds)}, synchronize_session=False
+            )
+
+        for outcome in ('applied', 'ignored', 'unmatched'):
+            ids = [callback_id for callback_id, value in outcomes.items() if value == outcome]
+            if ids:
+                MpesaCallback.query.filter(MpesaCallback.id.in_(ids)).update(
+                    {'applied_at': now, 'outcome': outcome}, synchronize_session=False
+                )
+
+        db.session.commit()
+        self._notify(updates.values())
+
+        return len(outcomes) == self.batch_size
+
+    def _notify(self, rows):
+        from extensions import payment_outbox_worker
+
+        for row in rows:
+            self.socketio.emit('payment_status', {
+                'payment_id': row['b_id'],
+                'checkout_request_id': row['b_checkout_request_id'],
+                'status': row['b_status'],
+                'result_desc': row['b_result_desc']
+            }, to=payment_outbox_worker.room_for(row['b_checkout_request_id']), namespace=payment_outbox_worker.NAMESPACE)
@@ -4,9 +4,14 @@ import json
 from datetime import datetime
 from decouple import config
 import re
+from services.mpesa_auth import mpesa_token_cache
+from services.http_client import http_client
 
 
 class MpesaService:
+    # Daraja's "The transaction is being processed" error, sent with HTTP 500 by the STK query
+    STILL_PROCESSING_CODE = '500.001.1001'
+
     def __init__(self):
         self.consumer_key = config('MPESA_CONSUMER_KEY')
         self.consumer_secret = config('MPESA_CONSUMER_SECRET')
@@ -27,24 +32,11 @@ class MpesaService:
     def generate_access_token(self):
         """Generate access token for Daraja API"""
         try:
-            api_url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
-            
-            # Create credentials
-            credentials = f"{self.consumer_key}:{self.consumer_secret}"
-            encoded_credentials = base64.b64encode(credentials.encode()).decode('utf-8')
-            
-            headers = {
-                'Authorization': f'Basic {encoded_credentials}',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.get(api_url, headers=headers)
-            response.raise_for_status()
-            
-            result = response.json()
+            # Shared with every other M-Pesa caller and refreshed before it expires
+            access_token = mpesa_token_cache.get_token(self.base_url, self.consumer_key, self.consumer_secret)
             return {
                 'success': True,
-                'access_token': result['access_token']
+                'access_token': access_token
             }
             
         except requests.exceptions.RequestException as e:
@@ -136,7 +128,10 @@ class MpesaService:
 
             # Make STK Push request
             api_url = f"{self.base_url}/mpesa/stkpush/v1/processrequest"
-            response = requests.post(api_url, json=request_body, headers=headers)
+            response = http_client.post(api_url, json=request_body, headers=headers)
+            if response.status_code == 401:
+                # Token was revoked early; fetch a fresh one next time
+                mpesa_token_cache.invalidate(self.base_url, self.consumer_key)
             response.raise_for_status()
 
             result = response.json()
@@ -192,7 +187,19 @@ class MpesaService:
 
             # Make query request
             api_url = f"{self.base_url}/mpesa/stkpushquery/v1/query"
-            response = requests.post(api_url, json=request_body, headers=headers)
+            # Not retried on 5xx: "still processing" comes back as a 500 and callers ask again later anyway
+            response = http_client.post(api_url, json=request_body, headers=headers)
+            if response.status_code >= 400:
+                try:
+                    error_body = response.json()
+                except ValueError:
+                    error_body = {}
+                if str(error_body.get('errorCode')) == self.STILL_PROCESSING_CODE:
+                    return {
+                        'success': False,
+                        'still_processing': True,
+                        'error': error_body.get('errorMessage') or 'The transaction is being processed'
+                    }
             response.raise_for_status()
 
             result = response.json()
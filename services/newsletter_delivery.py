@@ -0,0 +1,248 @@
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+from sqlalchemy import or_, and_
+
+from services.background import BackgroundLoop
+from services.http_client import http_client
+
+EMAIL_KINDS = ('confirmation_email', 'admin_email')
+
+
+class PermanentDeliveryError(Exception):
+    """A delivery that would fail the same way on every retry"""
+
+
+class NewsletterDeliveryWorker:
+    """Sends newsletter signup emails and Mailchimp upserts outside the request.
+
+    Subscribing only inserts the subscriber and its newsletter_deliveries
+    rows in one commit. Worker loops claim due rows in batches: all emails
+    in a batch go out over a single SMTP connection, and all Mailchimp
+    members are upserted with one call to the list batch endpoint. Failed
+    deliveries are retried with exponential backoff; once a delivery has
+    failed NEWSLETTER_DELIVERY_MAX_ATTEMPTS times, or fails permanently
+    (e.g. Mailchimp rejects the address), it is parked as 'dead' for
+    requeue_dead() to pick up after the cause is fixed.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.concurrency = 2
+        self.batch_size = 50
+        self.poll_seconds = 1.0
+        self.max_attempts = 5
+        self.lock_seconds = 300
+        self.loops = []
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.concurrency = app.config.get('NEWSLETTER_DELIVERY_CONCURRENCY', 2)
+        self.batch_size = app.config.get('NEWSLETTER_DELIVERY_BATCH_SIZE', 50)
+        self.poll_seconds = app.config.get('NEWSLETTER_DELIVERY_POLL_SECONDS', 1.0)
+        self.max_attempts = app.config.get('NEWSLETTER_DELIVERY_MAX_ATTEMPTS', 5)
+        self.lock_seconds = app.config.get('NEWSLETTER_DELIVERY_LOCK_SECONDS', 300)
+        app.extensions['newsletter_delivery_worker'] = self
+
+    def start(self):
+        self.loops = [
+            BackgroundLoop(self.app, self.socketio, f'newsletter-delivery-{i}', self.process_batch, self.poll_seconds).start()
+            for i in range(self.concurrency)
+        ]
+
+    @staticmethod
+    def enqueue_subscription(subscriber):
+        """Queue the signup's emails and Mailchimp upsert; committed with the subscriber by the caller"""
+        from extensions import db
+        from models.newsletter_delivery import NewsletterDelivery
+
+        payload = {'name': subscriber.name, 'email': subscriber.email, 'phone': subscriber.phone}
+        for kind in ('confirmation_email', 'admin_email', 'mailchimp'):
+            db.session.add(NewsletterDelivery(subscriber=subscriber, kind=kind, payload=payload))
+
+    def claim_batch(self):
+        """Claim up to batch_size due deliveries for this worker"""
+        from extensions import db
+        from models.newsletter_delivery import NewsletterDelivery
+
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(NewsletterDelivery.status == 'pending', NewsletterDelivery.available_at <= now),
+            and_(NewsletterDelivery.status == 'processing',
+                 NewsletterDelivery.locked_at < now - timedelta(seconds=self.lock_seconds))
+        )
+
+        candidate_ids = [
+            row.id for row in db.session.query(NewsletterDelivery.id)
+            .filter(claimable)
+            .order_by(NewsletterDelivery.available_at)
+            .limit(self.batch_size)
+            .all()
+        ]
+        if not candidate_ids:
+            return []
+
+        # Rows another worker claimed in the meantime no longer match `claimable`
+        claim_token = str(uuid.uuid4())
+        NewsletterDelivery.query.filter(NewsletterDelivery.id.in_(candidate_ids), claimable).update({
+            'status': 'processing',
+            'locked_at': now,
+            'claim_token': claim_token,
+            'attempts': NewsletterDelivery.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+
+        return NewsletterDelivery.query.filter_by(claim_token=claim_token, status='processing').all()
+
+    def process_batch(self):
+        """Deliver one claimed batch; returns False when there was nothing to do"""
+        from extensions import db
+
+        deliveries = self.claim_batch()
+        if not deliveries:
+            return False
+
+        emails = [delivery for delivery in deliveries if delivery.kind in EMAIL_KINDS]
+        members = [delivery for delivery in deliveries if delivery.kind == 'mailchimp']
+
+        if emails:
+            self._send_emails(emails)
+        if members:
+            self._upsert_mailchimp_members(members)
+
+        db.session.commit()
+        return len(deliveries) == self.batch_size
+
+    def _succeed(self, delivery):
+        delivery.status = 'sent'
+        delivery.last_error = None
+        delivery.locked_at = None
+
+    def _fail(self, delivery, error, permanent=False):
+        delivery.last_error = str(error)[:500]
+        delivery.locked_at = None
+        if permanent or delivery.attempts >= self.max_attempts:
+            delivery.status = 'dead'
+            print(f"Newsletter delivery {delivery.id} ({delivery.kind}) dead-lettered: {delivery.last_error}")
+        else:
+            delivery.status = 'pending'
+            delivery.available_at = datetime.utcnow() + timedelta(seconds=2 ** delivery.attempts)
+
+    @staticmethod
+    def _build_message(delivery):
+        from utils.email import subscriber_confirmation_message, admin_subscription_message
+
+        payload = delivery.payload
+        if delivery.kind == 'confirmation_email':
+            return subscriber_confirmation_message(payload['email'], payload['name'])
+        return admin_subscription_message(payload['name'], payload['email'], payload['phone'])
+
+    def _send_emails(self, deliveries):
+        from extensions import mail
+
+        messages = []
+        for delivery in deliveries:
+            msg = self._build_message(delivery)
+            if msg is None:
+                # No ADMIN_EMAIL configured, nothing to send
+                self._succeed(delivery)
+            else:
+                messages.append((delivery, msg))
+
+        if not messages:
+            return
+
+        try:
+            # One SMTP connection and login for the whole batch
+            with mail.connect() as connection:
+                for delivery, msg in messages:
+                    try:
+                        connection.send(msg)
+                        self._succeed(delivery)
+                    except Exception as e:
+                        self._fail(delivery, e)
+        except Exception as e:
+            # Connecting or logging in failed; retry whatever wasn't sent
+            for delivery, msg in messages:
+                if delivery.status == 'processing':
+                    self._fail(delivery, e)
+
+    def _mailchimp_url(self):
+        api_url = self.app.config.get('MAILCHIMP_API_URL')
+        if not api_url:
+            # API keys end in their data center, e.g. "...-us21"
+            api_key = self.app.config.get('MAILCHIMP_API_KEY') or ''
+            api_url = f"https://{api_key.rsplit('-', 1)[-1]}.api.mailchimp.com/3.0"
+        return f"{api_url.rstrip('/')}/lists/{self.app.config.get('MAILCHIMP_AUDIENCE_ID')}"
+
+    def _upsert_mailchimp_members(self, deliveries):
+        if not self.app.config.get('MAILCHIMP_API_KEY') or not self.app.config.get('MAILCHIMP_AUDIENCE_ID'):
+            for delivery in deliveries:
+                self._fail(delivery, 'MAILCHIMP_API_KEY and MAILCHIMP_AUDIENCE_ID must be set', permanent=True)
+            return
+
+        by_email = {}
+        for delivery in deliveries:
+            by_email.setdefault(delivery.payload['email'].lower(), []).append(delivery)
+
+        try:
+            # Batch subscribe with update_existing is an upsert, so a retry can't double-subscribe
+            response = http_client.post(
+                self._mailchimp_url(),
+                auth=('anystring', self.app.config.get('MAILCHIMP_API_KEY')),
+                json={
+                    'members': [{
+                        'email_address': delivery.payload['email'],
+                        'status': 'subscribed',
+                        'merge_fields': {'FNAME': delivery.payload['name']}
+                    } for delivery in deliveries],
+                    'update_existing': True
+                },
+                idempotent=True
+            )
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+            if response.status_code >= 400:
+                raise PermanentDeliveryError(f"Mailchimp {response.status_code}: {response.text[:300]}")
+            result = response.json()
+        except PermanentDeliveryError as e:
+            for delivery in deliveries:
+                self._fail(delivery, e, permanent=True)
+            return
+        except (requests.exceptions.RequestException, ValueError) as e:
+            for delivery in deliveries:
+                self._fail(delivery, e)
+            return
+
+        rejected = {}
+        for error in result.get('errors', []):
+            rejected[(error.get('email_address') or '').lower()] = error.get('error') or error.get('error_code')
+
+        for email, email_deliveries in by_email.items():
+            for delivery in email_deliveries:
+                if email in rejected:
+                    # Mailchimp refused this address; retrying won't change that
+                    self._fail(delivery, f"Mailchimp: {rejected[email]}", permanent=True)
+                else:
+                    self._succeed(delivery)
+
+    def requeue_dead(self, kind=None):
+        """Move dead-lettered deliveries back to pending with a fresh attempt budget"""
+        from extensions import db
+        from models.newsletter_delivery import NewsletterDelivery
+
+        query = NewsletterDelivery.query.filter_by(status='dead')
+        if kind:
+            query = query.filter_by(kind=kind)
+
+        requeued = query.update({
+            'status': 'pending',
+            'attempts': 0,
+            'available_at': datetime.utcnow(),
+            'claim_token': None
+        }, synchronize_session=False)
+        db.session.commit()
+        return requeued
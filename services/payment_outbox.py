@@ -0,0 +1,223 @@
+from datetime import datetime, timedelta
+
+import requests
+from sqlalchemy import or_, and_
+
+from services.background import BackgroundLoop
+from services.http_client import HttpClient
+
+
+class PaymentOutboxWorker:
+    """Drains payment_outbox rows by sending their STK pushes to M-Pesa.
+
+    Each loop claims one job with a conditional UPDATE, so several loops and
+    several gunicorn workers can share the table without sending a push
+    twice. Jobs left in 'processing' by a crashed worker are reclaimed after
+    PAYMENT_OUTBOX_LOCK_SECONDS. A push is only sent again when the previous
+    attempt cannot have reached Safaricom; when it might have, the job and
+    payment become 'unconfirmed' instead. The payment's status is written
+    with the same state-machine guard as callbacks, so a callback that
+    lands while the push is in flight is never overwritten. When a job
+    settles, the result is pushed as 'payment_status' to the Socket.IO room
+    of its checkout request id on the /payments namespace.
+    """
+
+    NAMESPACE = '/payments'
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.concurrency = 4
+        self.poll_seconds = 0.5
+        self.max_attempts = 5
+        self.lock_seconds = 120
+        self.loops = []
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.concurrency = app.config.get('PAYMENT_OUTBOX_CONCURRENCY', 4)
+        self.poll_seconds = app.config.get('PAYMENT_OUTBOX_POLL_SECONDS', 0.5)
+        self.max_attempts = app.config.get('PAYMENT_OUTBOX_MAX_ATTEMPTS', 5)
+        self.lock_seconds = app.config.get('PAYMENT_OUTBOX_LOCK_SECONDS', 120)
+
+        socketio.on_event('subscribe_payment', self._handle_subscribe, namespace=self.NAMESPACE)
+        app.extensions['payment_outbox_worker'] = self
+
+    def start(self):
+        self.loops = [
+            BackgroundLoop(self.app, self.socketio, f'payment-outbox-{i}', self.process_next, self.poll_seconds).start()
+            for i in range(self.concurrency)
+        ]
+
+    @staticmethod
+    def room_for(checkout_request_id):
+        return f'payment_{checkout_request_id}'
+
+    def _handle_subscribe(self, data=None):
+        from flask_socketio import join_room, emit
+
+        checkout_request_id = (data or {}).get('checkout_request_id')
+        if not checkout_request_id:
+            emit('error', {'message': 'checkout_request_id is required'})
+            return
+        join_room(self.room_for(checkout_request_id))
+
+    def claim_next(self):
+        """Claim the next due job for this worker, or return None"""
+        from extensions import db
+        from models.payment_outbox import PaymentOutbox
+
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(PaymentOutbox.status == 'pending', PaymentOutbox.available_at <= now),
+            and_(PaymentOutbox.status == 'processing',
+                 PaymentOutbox.locked_at < now - timedelta(seconds=self.lock_seconds))
+        )
+
+        candidate_ids = [
+            row.id for row in db.session.query(PaymentOutbox.id)
+            .filter(claimable)
+            .order_by(PaymentOutbox.available_at)
+            .limit(self.concurrency)
+            .all()
+        ]
+
+        for job_id in candidate_ids:
+            # Only one worker's UPDATE can match while the job is still claimable
+            claimed = PaymentOutbox.query.filter(PaymentOutbox.id == job_id, claimable).update({
+                'status': 'processing',
+                'locked_at': now,
+                'attempts': PaymentOutbox.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+
+            if claimed:
+                return db.session.get(PaymentOutbox, job_id)
+
+        return None
+
+    @staticmethod
+    def _classify_failure(error):
+        """'retry', 'failed' or 'unconfirmed' for an error raised while sending a push.
+
+        Only retry when Safaricom cannot have accepted the push, so the payer
+        is never prompted twice. A push that may have been accepted (a 5xx or
+        a timeout after the request went out) is left 'unconfirmed' for its
+        callback or the reconciler to settle.
+        """
+        if not isinstance(error, requests.exceptions.RequestException):
+            return 'failed'
+
+        request = error.request
+        if request is None or 'stkpush' not in (request.url or ''):
+            # Failed while fetching the access token, before the push was made
+            return 'retry'
+        if HttpClient.never_sent(error):
+            return 'retry'
+
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            status_code = error.response.status_code
+            # Rate limited, or the token was revoked (and has been dropped from the cache): nothing was processed
+            if status_code in (401, 429):
+                return 'retry'
+            if status_code < 500:
+                return 'failed'
+
+        return 'unconfirmed'
+
+    @staticmethod
+    def _update_payment(payment_id, changes, ids):
+        """Move a payment to changes['status'] only if it may still get there; returns whether it did"""
+        from sqlalchemy import func
+        from models.payment import Payment
+
+        updated = Payment.query.filter(
+            Payment.id == payment_id,
+            Payment.status.in_(Payment.statuses_allowing(changes['status']))
+        ).update(changes, synchronize_session=False)
+
+        # Safaricom's ids are kept even when a callback got there first, unless it already filled them in
+        ids = {key: value for key, value in ids.items() if value}
+        if ids:
+            Payment.query.filter(Payment.id == payment_id).update({
+                key: func.coalesce(getattr(Payment, key), value) for key, value in ids.items()
+            }, synchronize_session=False)
+
+        return bool(updated)
+
+    def process_next(self):
+        """Send one claimed STK push; returns False when there was nothing to do"""
+        from extensions import db
+        from resources.mpesa_resources import MpesaService
+
+        job = self.claim_next()
+        if job is None:
+            return False
+
+        payment = job.payment
+        customer_message = None
+        ids = {}
+
+        try:
+            mpesa_response = MpesaService.initiate_stk_push(
+                phone_number=payment.phone_number,
+                amount=payment.amount,
+                account_reference=payment.account_reference,
+                transaction_desc=payment.transaction_desc,
+                checkout_request_id=payment.checkout_request_id
+            )
+        except Exception as e:
+            outcome = self._classify_failure(e)
+            job.last_error = str(e)[:500]
+
+            if outcome == 'retry' and job.attempts < self.max_attempts:
+                job.status = 'pending'
+                job.available_at = datetime.utcnow() + timedelta(seconds=2 ** job.attempts)
+                job.locked_at = None
+                db.session.commit()
+                return True
+
+            if outcome == 'unconfirmed':
+                changes = {'status': 'unconfirmed', 'result_desc': 'Waiting for M-Pesa to confirm the payment request'}
+                job.status = 'unconfirmed'
+            else:
+                changes = {'status': 'failed', 'result_desc': f'API Error: {str(e)}'[:200]}
+                job.status = 'failed'
+        else:
+            if mpesa_response.get('ResponseCode') == '0':
+                changes = {'status': 'sent_to_phone'}
+                ids = {
+                    'merchant_request_id': mpesa_response.get('MerchantRequestID'),
+                    'mpesa_checkout_request_id': mpesa_response.get('CheckoutRequestID')
+                }
+                job.status = 'sent'
+                customer_message = mpesa_response.get('CustomerMessage')
+            else:
+                changes = {'status': 'failed',
+                           'result_desc': mpesa_response.get('ResponseDescription', 'Unknown error')}
+                job.status = 'failed'
+                job.last_error = changes['result_desc']
+
+        # A callback carrying our ref may have settled the payment while the push was in flight
+        updated = self._update_payment(payment.id, changes, ids)
+
+        job.locked_at = None
+        db.session.commit()
+
+        if not updated:
+            return True
+
+        db.session.refresh(payment)
+        self.socketio.emit('payment_status', {
+            'payment_id': payment.id,
+            'checkout_request_id': payment.checkout_request_id,
+            'status': payment.status,
+            'result_desc': payment.result_desc,
+            'customer_message': customer_message or (
+                f'Please check your phone ({payment.phone_number}) to complete the payment of KES {payment.amount}'
+                if payment.status == 'sent_to_phone' else None
+            )
+        }, to=self.room_for(payment.checkout_request_id), namespace=self.NAMESPACE)
+
+        return True
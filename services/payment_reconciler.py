@@ -0,0 +1,244 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from services.background import BackgroundLoop
+
+
+class TokenBucket:
+    """Blocking rate limiter allowing `rate` calls per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class PaymentReconciler:
+    """Settles payments whose M-Pesa callback never arrived.
+
+    Each sweep takes the payments that have sat in 'sent_to_phone' for
+    longer than PAYMENT_RECONCILE_STALE_SECONDS, oldest first through the
+    (status, updated_at) index, and asks Daraja for their status with the
+    STK push query. Queries run on a bounded thread pool and share a token
+    bucket so the sweep stays under Safaricom's rate limits. Final answers
+    are logged as 'query' callbacks and applied by the callback applier,
+    so they go through the same batched, state-machine guarded UPDATE as
+    real callbacks. Payments that are still being processed get their
+    updated_at bumped and go to the back of the queue. 'unconfirmed'
+    payments have no CheckoutRequestID to query with; those still without a
+    callback after PAYMENT_UNCONFIRMED_SECONDS are timed out.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.interval = 60
+        self.stale_seconds = 120
+        self.batch_size = 100
+        self.concurrency = 8
+        self.rate = 5
+        self.unconfirmed_seconds = 900
+        self.bucket = TokenBucket(self.rate, self.concurrency)
+        self.loop = None
+        self.stats = {
+            'sweeps': 0,
+            'queried': 0,
+            'resolved': 0,
+            'unresolved': 0,
+            'errors': 0,
+            'expired': 0,
+            'last_sweep_seconds': 0.0,
+            'last_queries_per_second': 0.0,
+            'backlog': 0
+        }
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.interval = app.config.get('PAYMENT_RECONCILE_INTERVAL_SECONDS', 60)
+        self.stale_seconds = app.config.get('PAYMENT_RECONCILE_STALE_SECONDS', 120)
+        self.batch_size = app.config.get('PAYMENT_RECONCILE_BATCH_SIZE', 100)
+        self.concurrency = app.config.get('PAYMENT_RECONCILE_CONCURRENCY', 8)
+        self.rate = app.config.get('PAYMENT_RECONCILE_RATE', 5)
+        self.unconfirmed_seconds = app.config.get('PAYMENT_UNCONFIRMED_SECONDS', 900)
+        # Shared across sweeps so back-to-back batches stay under the same limit
+        self.bucket = TokenBucket(self.rate, self.concurrency)
+        app.extensions['payment_reconciler'] = self
+
+    def start(self):
+        self.loop = BackgroundLoop(self.app, self.socketio, 'payment-reconciler', self.sweep, self.interval).start()
+
+    @staticmethod
+    def stale_query(cutoff):
+        from models.payment import Payment
+
+        return Payment.query.filter(
+            Payment.status == 'sent_to_phone',
+            Payment.updated_at < cutoff
+        )
+
+    def backlog(self):
+        """Number of payments currently waiting to be reconciled"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        return self.stale_query(cutoff).count()
+
+    def expire_unconfirmed(self):
+        """Time out a batch of payments whose push was never confirmed; returns how many"""
+        from extensions import db, payment_outbox_worker
+        from models.payment import Payment
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.unconfirmed_seconds)
+        rows = Payment.query.with_entities(Payment.id, Payment.checkout_request_id).filter(
+            Payment.status == 'unconfirmed',
+            Payment.updated_at < cutoff
+        ).order_by(Payment.updated_at).limit(self.batch_size).all()
+
+        result_desc = 'No confirmation from M-Pesa for the payment request'
+        expired = []
+        for row in rows:
+            # A callback may have settled it since it was read
+            updated = Payment.query.filter(Payment.id == row.id, Payment.status == 'unconfirmed').update(
+                {'status': 'timeout', 'result_desc': result_desc, 'updated_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+            if updated:
+                expired.append(row)
+        db.session.commit()
+
+        for row in expired:
+            self.socketio.emit('payment_status', {
+                'payment_id': row.id,
+                'checkout_request_id': row.checkout_request_id,
+                'status': 'timeout',
+                'result_desc': result_desc
+            }, to=payment_outbox_worker.room_for(row.checkout_request_id), namespace=payment_outbox_worker.NAMESPACE)
+
+        self.stats['expired'] += len(expired)
+        return len(expired)
+
+    @classmethod
+    def _query_one(cls, mpesa, bucket, checkout_request_id):
+        """(checkout_request_id, data, error); data and error are both None while it is still processing"""
+        bucket.acquire()
+        result = mpesa.query_stk_push_status(checkout_request_id)
+        if result.get('still_processing'):
+            return checkout_request_id, None, None
+        if not result.get('success'):
+            return checkout_request_id, None, result.get('error')
+
+        data = result['data']
+        if data.get('ResultCode') in (None, ''):
+            return checkout_request_id, None, None
+        return checkout_request_id, data, None
+
+    def sweep(self):
+        """Reconcile one batch of stale payments; returns True when more are waiting"""
+        from extensions import db, mpesa_callback_applier
+        from models.payment import Payment
+        from models.mpesa_callback import MpesaCallback
+        from services.mpesa_service import MpesaService
+
+        started = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        self.expire_unconfirmed()
+
+        rows = self.stale_query(cutoff).with_entities(
+            Payment.id, Payment.mpesa_checkout_request_id, Payment.merchant_request_id
+        ).filter(
+            Payment.mpesa_checkout_request_id.isnot(None)
+        ).order_by(Payment.updated_at).limit(self.batch_size).all()
+
+        if not rows:
+            self.stats['backlog'] = 0
+            return False
+
+        mpesa = MpesaService()
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(rows))) as pool:
+            results = list(pool.map(
+                lambda row: self._query_one(mpesa, self.bucket, row.mpesa_checkout_request_id), rows
+            ))
+
+        callbacks = []
+        unresolved_ids = []
+        errors = 0
+        for row, (checkout_request_id, data, error) in zip(rows, results):
+            if data is None:
+                unresolved_ids.append(row.id)
+                if error is not None:
+                    errors += 1
+                continue
+            callbacks.append({
+                'kind': 'query',
+                'checkout_request_id': checkout_request_id,
+                'merchant_request_id': row.merchant_request_id,
+                'result_code': int(data['ResultCode']),
+                'result_desc': (data.get('ResultDesc') or '')[:200] or None,
+                'payload': data,
+                'received_at': datetime.utcnow()
+            })
+
+        if unresolved_ids:
+            # Rotate them behind the rest of the backlog
+            Payment.query.filter(Payment.id.in_(unresolved_ids)).update(
+                {'updated_at': datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+
+        if callbacks:
+            try:
+                db.session.bulk_insert_mappings(MpesaCallback, callbacks)
+                db.session.commit()
+            except IntegrityError:
+                # Another sweep logged some of these first; keep the rest
+                db.session.rollback()
+                for callback in callbacks:
+                    db.session.add(MpesaCallback(**callback))
+                    try:
+                        db.session.commit()
+                    except IntegrityError:
+                        db.session.rollback()
+
+        # Apply now rather than waiting for the applier's next poll
+        while mpesa_callback_applier.apply_batch():
+            pass
+
+        elapsed = time.monotonic() - started
+        self.stats['sweeps'] += 1
+        self.stats['queried'] += len(rows)
+        self.stats['resolved'] += len(callbacks)
+        self.stats['unresolved'] += len(unresolved_ids)
+        self.stats['errors'] += errors
+        self.stats['last_sweep_seconds'] = round(elapsed, 3)
+        self.stats['last_queries_per_second'] = round(len(rows) / elapsed, 2) if elapsed else 0.0
+        self.stats['backlog'] = self.backlog()
+
+        print(
+            f"[payment-reconciler] {len(rows)} queried, {len(callbacks)} resolved, "
+            f"{len(unresolved_ids)} unresolved ({errors} errors) in {elapsed:.2f}s "
+            f"({self.stats['last_queries_per_second']}/s), backlog {self.stats['backlog']}"
+        )
+
+        # Keep going while a full batch is still settling; a run of unanswered queries waits for the interval
+        return len(rows) == self.batch_size and bool(callbacks)
+
+    def metrics(self):
+        """Totals since start-up plus the last sweep's throughput and the remaining backlog"""
+        return dict(self.stats)
@@ -0,0 +1,155 @@
+import threading
+from collections import defaultdict
+
+
+def forum_room(forum):
+    return f'forum_{forum}'
+
+
+def post_room(post_id):
+    return f'post_{post_id}'
+
+
+def user_room(user_id):
+    return f'user_{user_id}'
+
+
+ADMIN_ROOM = 'admin_clients'
+
+
+class SocketRoomRegistry:
+    """Tracks which authenticated sockets are in which rooms, and what each emit costs.
+
+    Sockets are registered on connect and join their own user room; forum
+    and post rooms are joined and left explicitly by the client. Server
+    code emits through emit(), which sends to the union of the given rooms
+    and records, per event, how many sockets received it next to how many
+    a global broadcast would have reached. Counts are for this process
+    only, like Socket.IO's own room lists.
+    """
+
+    NAMESPACE = '/'
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self.max_rooms = 50
+        self._lock = threading.Lock()
+        self._sockets = {}
+        self._members = defaultdict(set)
+        self._stats = defaultdict(lambda: {'emits': 0, 'deliveries': 0, 'broadcast_deliveries': 0})
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.max_rooms = app.config.get('SOCKET_MAX_ROOMS', 50)
+        app.extensions['socket_rooms'] = self
+
+    def register(self, sid, user_id, rooms=()):
+        """Record an authenticated socket and put it in its user room plus any extra rooms"""
+        with self._lock:
+            self._sockets[sid] = {'user_id': user_id, 'rooms': set()}
+        for room in (user_room(user_id), *rooms):
+            self._enter(sid, room)
+
+    def unregister(self, sid):
+        """Forget a disconnected socket; Socket.IO drops its room memberships itself"""
+        with self._lock:
+            socket = self._sockets.pop(sid, None)
+            if not socket:
+                return
+            for room in socket['rooms']:
+                members = self._members.get(room)
+                if members is not None:
+                    members.discard(sid)
+                    if not members:
+                        del self._members[room]
+
+    def user_id(self, sid):
+        with self._lock:
+            socket = self._sockets.get(sid)
+            return socket['user_id'] if socket else None
+
+    def rooms(self, sid):
+        with self._lock:
+            socket = self._sockets.get(sid)
+            return set(socket['rooms']) if socket else set()
+
+    def join(self, sid, room):
+        """Subscribe a socket to a forum or post room; returns False for unknown sockets or when over the limit"""
+        with self._lock:
+            socket = self._sockets.get(sid)
+            if socket is None:
+                return False
+            if room in socket['rooms']:
+                return True
+            if len(socket['rooms']) >= self.max_rooms:
+                return False
+        self._enter(sid, room)
+        return True
+
+    def leave(self, sid, room):
+        with self._lock:
+            socket = self._sockets.get(sid)
+            if socket is None or room not in socket['rooms']:
+                return False
+            socket['rooms'].discard(room)
+            members = self._members.get(room)
+            if members is not None:
+                members.discard(sid)
+                if not members:
+                    del self._members[room]
+        self.socketio.server.leave_room(sid, room, namespace=self.NAMESPACE)
+        return True
+
+    def _enter(self, sid, room):
+        with self._lock:
+            socket = self._sockets.get(sid)
+            if socket is None:
+                return
+            socket['rooms'].add(room)
+            self._members[room].add(sid)
+        self.socketio.server.enter_room(sid, room, namespace=self.NAMESPACE)
+
+    def audience(self, rooms, skip_sid=None):
+        """Number of sockets in any of the rooms, each counted once"""
+        with self._lock:
+            sids = set()
+            for room in rooms:
+                sids |= self._members.get(room, set())
+        sids.discard(skip_sid)
+        return len(sids)
+
+    def emit(self, event, data, rooms, skip_sid=None):
+        """Emit an event to everyone in one or more rooms and record its fan-out"""
+        rooms = [rooms] if isinstance(rooms, str) else [room for room in rooms if room]
+        if not rooms:
+            return 0
+
+        deliveries = self.audience(rooms, skip_sid)
+        with self._lock:
+            stats = self._stats[event]
+            stats['emits'] += 1
+            stats['deliveries'] += deliveries
+            stats['broadcast_deliveries'] += len(self._sockets)
+
+        self.socketio.emit(event, data, to=rooms if len(rooms) > 1 else rooms[0],
+                           namespace=self.NAMESPACE, skip_sid=skip_sid)
+        return deliveries
+
+    def metrics(self):
+        """Per-event fan-out next to what global broadcasts would have sent"""
+        with self._lock:
+            events = {}
+            for event, stats in self._stats.items():
+                saved = stats['broadcast_deliveries'] - stats['deliveries']
+                events[event] = dict(
+                    stats,
+                    saved_deliveries=saved,
+                    deliveries_per_emit=round(stats['deliveries'] / stats['emits'], 2) if stats['emits'] else 0
+                )
+            return {
+                'connected': len(self._sockets),
+                'rooms': len(self._members),
+                'events': events
+            }
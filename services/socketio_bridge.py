@@ -0,0 +1,60 @@
+import json
+import threading
+import weakref
+from collections import defaultdict
+
+import socketio
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """Socket.IO client manager that bridges servers living in the same process.
+
+    Speaks the same pub/sub protocol as the Redis manager, but messages are
+    handed to the other managers on the channel through in-memory queues.
+    Tests use it to run two Socket.IO servers side by side, as two gunicorn
+    workers would, and check that an emit on one reaches clients of the other.
+    """
+
+    name = 'local'
+
+    _channels = defaultdict(weakref.WeakSet)
+    _channels_lock = threading.Lock()
+
+    def __init__(self, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.queue = None
+
+    def initialize(self):
+        self.queue = self.server.eio.create_queue()
+        with self._channels_lock:
+            self._channels[self.channel].add(self)
+        super().initialize()
+
+    def _publish(self, data):
+        # Encoded like it would be on the wire, so nothing unserializable slips through
+        message = json.dumps(data)
+        with self._channels_lock:
+            managers = list(self._channels[self.channel])
+        for manager in managers:
+            if manager.queue is not None:
+                manager.queue.put(message)
+
+    def _listen(self):
+        while True:
+            yield self.queue.get()
+
+
+def client_manager_for(config):
+    """The Socket.IO client manager for SOCKETIO_BACKEND, or None for a single process"""
+    backend = config.get('SOCKETIO_BACKEND', 'none')
+    channel = config.get('SOCKETIO_CHANNEL', 'eduhive-socketio')
+
+    if backend == 'redis':
+        # Raises if the redis package is missing rather than silently staying per-process
+        return socketio.RedisManager(config['SOCKETIO_MESSAGE_QUEUE'], channel=channel)
+    elif backend == 'local':
+        return LocalPubSubManager(channel=channel)
+    elif backend == 'none':
+        return None
+    else:
+        raise ValueError(f"Unknown SOCKETIO_BACKEND: {backend}")
@@ -0,0 +1,247 @@
+import codecs
+import csv
+import io
+import json
+import re
+import sqlite3
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy.exc import IntegrityError
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Header spellings accepted in CSV files, including the export's own headers
+CSV_FIELDS = {
+    'name': 'name',
+    'email': 'email',
+    'phone': 'phone',
+    'subscribed at': 'subscribed_at',
+    'subscribed_at': 'subscribed_at',
+}
+
+# Bound parameters allowed in one statement; SQLite before 3.32 stops at 999
+MAX_PARAMETERS = {
+    'postgresql': 65535,
+    'sqlite': 999 if sqlite3.sqlite_version_info < (3, 32, 0) else 32766,
+}
+
+
+def text_lines(stream):
+    """Decoded lines of a binary upload stream.
+
+    Uses codecs.iterdecode rather than io.TextIOWrapper, which needs a
+    readable() method that Werkzeug's SpooledTemporaryFile only has from
+    Python 3.11 on.
+    """
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return codecs.iterdecode(stream, 'utf-8-sig')
+
+
+def iter_csv_rows(stream):
+    """Rows of a CSV upload as dicts keyed by name/email/phone/subscribed_at"""
+    reader = csv.DictReader(text_lines(stream))
+    for row in reader:
+        yield {
+            CSV_FIELDS[key.strip().lower()]: value
+            for key, value in row.items()
+            if key and key.strip().lower() in CSV_FIELDS
+        }
+
+
+def iter_ndjson_rows(stream):
+    """Rows of an NDJSON upload; a line that isn't a JSON object is passed on as an error"""
+    for line in text_lines(stream):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield ValueError('Invalid JSON')
+            continue
+        yield row if isinstance(row, dict) else ValueError('Each line must be a JSON object')
+
+
+def validate_row(row):
+    """Clean one input row; returns (subscriber values, None) or (None, error message)"""
+    if isinstance(row, Exception):
+        return None, str(row)
+
+    name = str(row.get('name') or '').strip()
+    email = str(row.get('email') or '').strip()
+    phone = str(row.get('phone') or '').strip()
+
+    if not all([name, email, phone]):
+        return None, 'name, email and phone are required'
+    if not EMAIL_PATTERN.match(email):
+        return None, f'Invalid email: {email}'
+    if len(name) > 100 or len(email) > 120 or len(phone) > 20:
+        return None, 'Value too long'
+
+    values = {'name': name, 'email': email, 'phone': phone}
+
+    subscribed_at = row.get('subscribed_at')
+    if subscribed_at:
+        try:
+            values['subscribed_at'] = datetime.fromisoformat(str(subscribed_at).strip())
+        except ValueError:
+            return None, f'Invalid subscribed_at: {subscribed_at}'
+
+    return values, None
+
+
+class SubscriberImporter:
+    """Streams rows into newsletter_subscribers in chunks, upserting on email.
+
+    Each chunk is validated, deduplicated (the last row for an email wins)
+    and written with INSERT ... ON CONFLICT (email) DO UPDATE on PostgreSQL
+    and SQLite 3.24+ (split to stay under the bound parameter limit), or a
+    bulk insert plus bulk update on anything else. Existing subscribers keep their subscribed_at. A phone
+    number that already belongs to a different email is reported instead
+    of failing the chunk. Errors are reported per row, up to max_errors.
+    Imported contacts are not sent the signup emails.
+    """
+
+    def __init__(self, chunk_size=1000, max_errors=1000):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+    def run(self, rows):
+        """Import an iterable of row dicts and return the report"""
+        report = {'processed': 0, 'created': 0, 'updated': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+
+        numbered = enumerate(rows, start=1)
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk, report)
+
+        return report
+
+    def _error(self, report, row_number, message):
+        report['failed'] += 1
+        if len(report['errors']) < self.max_errors:
+            report['errors'].append({'row': row_number, 'error': message})
+        else:
+            report['errors_truncated'] = True
+
+    def _import_chunk(self, chunk, report):
+        from extensions import db
+        from models.newsletter import NewsletterSubscriber
+
+        by_email = {}
+        for row_number, row in chunk:
+            report['processed'] += 1
+            values, error = validate_row(row)
+            if error:
+                self._error(report, row_number, error)
+                continue
+            if values['email'] in by_email:
+                self._error(report, by_email[values['email']][0], f"Superseded by row {row_number} with the same email")
+            by_email[values['email']] = (row_number, values)
+
+        # Within the chunk, a phone number may only go to one email
+        by_phone = {}
+        for email, (row_number, values) in list(by_email.items()):
+            other = by_phone.get(values['phone'])
+            if other:
+                self._error(report, row_number, f"Phone {values['phone']} is already used by row {other[0]}")
+                del by_email[email]
+            else:
+                by_phone[values['phone']] = (row_number, email)
+
+        if not by_email:
+            return
+
+        existing = db.session.query(NewsletterSubscriber.email, NewsletterSubscriber.phone).filter(
+            (NewsletterSubscriber.email.in_(by_email.keys())) | (NewsletterSubscriber.phone.in_(by_phone.keys()))
+        ).all()
+        existing_emails = {row.email for row in existing}
+        phone_owners = {row.phone: row.email for row in existing}
+
+        for email, (row_number, values) in list(by_email.items()):
+            owner = phone_owners.get(values['phone'])
+            if owner and owner != email:
+                self._error(report, row_number, f"Phone {values['phone']} belongs to another subscriber")
+                del by_email[email]
+
+        if not by_email:
+            return
+
+        records = [values for row_number, values in by_email.values()]
+        try:
+            self._upsert(records, existing_emails)
+            db.session.commit()
+        except IntegrityError:
+            # Someone else wrote a clashing row meanwhile; retry one by one to find it
+            db.session.rollback()
+            records = []
+            for row_number, values in by_email.values():
+                try:
+                    self._upsert([values], existing_emails)
+                    db.session.commit()
+                    records.append(values)
+                except IntegrityError:
+                    db.session.rollback()
+                    self._error(report, row_number, 'Email or phone already exists')
+
+        updated = sum(1 for record in records if record['email'] in existing_emails)
+        report['updated'] += updated
+        report['created'] += len(records) - updated
+
+    @staticmethod
+    def _supports_on_conflict(dialect_name):
+        if dialect_name == 'postgresql':
+            return True
+        # SQLite gained upserts in 3.24
+        return dialect_name == 'sqlite' and sqlite3.sqlite_version_info >= (3, 24, 0)
+
+    def _upsert(self, records, existing_emails):
+        from extensions import db
+        from models.newsletter import NewsletterSubscriber
+
+        now = datetime.utcnow()
+        for record in records:
+            record.setdefault('subscribed_at', now)
+
+        dialect_name = db.session.get_bind().dialect.name
+        if not self._supports_on_conflict(dialect_name):
+            new = [record for record in records if record['email'] not in existing_emails]
+            if new:
+                db.session.bulk_insert_mappings(NewsletterSubscriber, new)
+
+            old = [record for record in records if record['email'] in existing_emails]
+            if old:
+                ids = dict(db.session.query(NewsletterSubscriber.email, NewsletterSubscriber.id).filter(
+                    NewsletterSubscriber.email.in_([record['email'] for record in old])
+                ).all())
+                db.session.bulk_update_mappings(NewsletterSubscriber, [
+                    {'id': ids[record['email']], 'name': record['name'], 'phone': record['phone']}
+                    for record in old
+                ])
+            return
+
+        if dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        # A multi-row VALUES binds every column of every row, so big chunks go in several statements
+        per_statement = max(1, MAX_PARAMETERS[dialect_name] // len(records[0]))
+        for start in range(0, len(records), per_statement):
+            statement = insert(NewsletterSubscriber.__table__).values(records[start:start + per_statement])
+            statement = statement.on_conflict_do_update(
+                index_elements=['email'],
+                # subscribed_at is left alone so re-imports don't rewrite signup dates
+                set_={'name': statement.excluded.name, 'phone': statement.excluded.phone}
+            )
+            db.session.execute(statement)
+
+
+def import_subscribers(stream, file_format='csv', chunk_size=1000, max_errors=1000):
+    """Import a CSV or NDJSON byte stream of subscribers and return the report"""
+    rows = iter_ndjson_rows(stream) if file_format == 'ndjson' else iter_csv_rows(stream)
+    return SubscriberImporter(chunk_size, max_errors).run(rows)
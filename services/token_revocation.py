@@ -0,0 +1,247 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings; never gives false negatives"""
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class SQLRevocationBackend:
+    """Revoked token ids in the revoked_tokens table"""
+
+    def add(self, jti, token_type=None, user_id=None, expires_at=None):
+        from extensions import db
+        from models.revoked_token import RevokedToken
+        from sqlalchemy.exc import IntegrityError
+
+        db.session.add(RevokedToken(
+            jti=jti,
+            token_type=token_type,
+            user_id=user_id,
+            expires_at=datetime.utcfromtimestamp(expires_at) if expires_at else None
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Already revoked
+            db.session.rollback()
+
+    def contains(self, jti):
+        from extensions import db
+        from models.revoked_token import RevokedToken
+
+        return db.session.query(RevokedToken.id).filter(RevokedToken.jti == jti).first() is not None
+
+    def revoked_since(self, since):
+        from extensions import db
+        from models.revoked_token import RevokedToken
+
+        rows = db.session.query(RevokedToken.jti).filter(
+            RevokedToken.revoked_at >= datetime.utcfromtimestamp(since)
+        ).all()
+        return [row.jti for row in rows]
+
+    def active(self):
+        from extensions import db
+        from models.revoked_token import RevokedToken
+
+        now = datetime.utcnow()
+        rows = db.session.query(RevokedToken.jti).filter(
+            (RevokedToken.expires_at.is_(None)) | (RevokedToken.expires_at > now)
+        ).yield_per(1000)
+        return [row.jti for row in rows]
+
+    def prune(self):
+        from extensions import db
+        from models.revoked_token import RevokedToken
+
+        deleted = RevokedToken.query.filter(
+            RevokedToken.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+class RedisRevocationBackend:
+    """Revoked token ids in Redis (or anything speaking its protocol).
+
+    Each id is a key that Redis expires together with the token; a sorted
+    set of revocation times lets workers fetch only new ids.
+    """
+
+    def __init__(self, client, prefix='eduhive:revoked'):
+        self.client = client
+        self.prefix = prefix
+        self.log_key = f'{prefix}:log'
+        self.expiry_key = f'{prefix}:expiries'
+
+    def _key(self, jti):
+        return f'{self.prefix}:jti:{jti}'
+
+    @staticmethod
+    def _decode(items):
+        return [item.decode() if isinstance(item, bytes) else item for item in items]
+
+    def add(self, jti, token_type=None, user_id=None, expires_at=None):
+        pipe = self.client.pipeline()
+        if expires_at:
+            pipe.set(self._key(jti), token_type or 'access', exat=int(math.ceil(expires_at)))
+            pipe.zadd(self.expiry_key, {jti: expires_at})
+        else:
+            pipe.set(self._key(jti), token_type or 'access')
+        pipe.zadd(self.log_key, {jti: time.time()})
+        pipe.execute()
+
+    def contains(self, jti):
+        return bool(self.client.exists(self._key(jti)))
+
+    def revoked_since(self, since):
+        return self._decode(self.client.zrangebyscore(self.log_key, since, '+inf'))
+
+    def active(self):
+        return self._decode(self.client.zrange(self.log_key, 0, -1))
+
+    def prune(self):
+        # The id keys expire on their own; only the two sorted sets need trimming
+        expired = self._decode(self.client.zrangebyscore(self.expiry_key, '-inf', time.time()))
+        if expired:
+            pipe = self.client.pipeline()
+            pipe.zrem(self.log_key, *expired)
+            pipe.zrem(self.expiry_key, *expired)
+            pipe.execute()
+        return len(expired)
+
+
+class TokenRevocationStore:
+    """Revoked JWT ids with a per-worker bloom filter in front of the store.
+
+    Most tokens checked were never revoked, and the bloom filter answers those
+    without touching the backend; only filter hits are confirmed with a
+    single indexed lookup. Each worker pulls ids revoked elsewhere every
+    JWT_REVOCATION_SYNC_SECONDS, so a logout reaches other workers within that
+    interval. Entries are pruned once the token they revoke has expired;
+    tokens issued without an expiry stay revoked forever.
+    """
+
+    # Re-read this far behind the last sync to cover clock skew and late commits
+    SYNC_LOOKBACK_SECONDS = 30
+    REBUILD_SECONDS = 3600
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.sync_seconds = 5
+        self.capacity = 100000
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._synced_at = None
+        self._cursor = None
+        self._rebuilt_at = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, client=None):
+        backend = app.config.get('JWT_REVOCATION_BACKEND', 'sql')
+        if backend == 'redis':
+            if client is None:
+                import redis
+                client = redis.Redis.from_url(app.config['REDIS_URL'], decode_responses=True)
+            self.backend = RedisRevocationBackend(client, app.config.get('JWT_REVOCATION_REDIS_PREFIX', 'eduhive:revoked'))
+        elif backend == 'sql':
+            self.backend = SQLRevocationBackend()
+        else:
+            raise ValueError(f"Unknown JWT_REVOCATION_BACKEND: {backend}")
+
+        self.sync_seconds = app.config.get('JWT_REVOCATION_SYNC_SECONDS', 5)
+        self.capacity = app.config.get('JWT_REVOCATION_BLOOM_CAPACITY', 100000)
+        self._bloom = None
+        app.extensions['token_revocation'] = self
+
+    def rebuild(self):
+        """Reload the bloom filter with every revoked id that has not expired"""
+        started = time.time()
+        jtis = self.backend.active()
+
+        bloom = BloomFilter(max(self.capacity, len(jtis) * 2))
+        for jti in jtis:
+            bloom.add(jti)
+
+        self._bloom = bloom
+        self._cursor = started
+        self._synced_at = self._rebuilt_at = time.monotonic()
+
+    def sync(self):
+        """Add ids revoked since the last sync, rebuilding when the filter is stale or full"""
+        with self._lock:
+            if (self._bloom is None
+                    or self._bloom.count >= self._bloom.capacity
+                    or time.monotonic() - self._rebuilt_at >= self.REBUILD_SECONDS):
+                self.rebuild()
+                return
+
+            started = time.time()
+            for jti in self.backend.revoked_since(self._cursor - self.SYNC_LOOKBACK_SECONDS):
+                self._bloom.add(jti)
+            self._cursor = started
+            self._synced_at = time.monotonic()
+
+    def _ensure_synced(self):
+        if self._bloom is None or time.monotonic() - self._synced_at >= self.sync_seconds:
+            self.sync()
+
+    def revoke(self, jwt_payload):
+        """Revoke a decoded token until it expires"""
+        identity = jwt_payload.get('sub')
+        user_id = identity.get('id') if isinstance(identity, dict) else identity
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            user_id = None
+
+        self.backend.add(
+            jwt_payload['jti'],
+            token_type=jwt_payload.get('type'),
+            user_id=user_id,
+            expires_at=jwt_payload.get('exp')
+        )
+
+        self._ensure_synced()
+        with self._lock:
+            self._bloom.add(jwt_payload['jti'])
+
+    def is_revoked(self, jti):
+        self._ensure_synced()
+        if jti not in self._bloom:
+            return False
+        return self.backend.contains(jti)
+
+    def prune(self):
+        """Delete entries for tokens that have already expired"""
+        pruned = self.backend.prune()
+        with self._lock:
+            self.rebuild()
+        return pruned
@@ -1,6 +1,12 @@
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, ConnectionRefusedError
 from flask import request
+from flask_jwt_extended import decode_token
 from functools import wraps
+from extensions import db, like_counter, socket_rooms, token_revocation
+from models.community import CommunityPost
+from services.community_feed import author_names
+from services.socket_rooms import ADMIN_ROOM, forum_room, post_room, user_room
+from utils.auth import CurrentIdentity, identity_user_id
 
 def validate_socket_data(required_fields):
     """Decorator to validate incoming socket data"""
@@ -23,112 +29,219 @@ def validate_socket_data(required_fields):
         return wrapped
     return decorator
 
+def _token_from_request(auth):
+    """The JWT from the Socket.IO auth payload, a ?token= query or an Authorization header"""
+    if isinstance(auth, dict) and auth.get('token'):
+        return auth['token']
+    if request.args.get('token'):
+        return request.args['token']
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):]
+    return None
+
+
+def authenticate_socket(auth):
+    """(user id, role) for a valid, unrevoked access token; raises ConnectionRefusedError otherwise"""
+    token = _token_from_request(auth)
+    if not token:
+        raise ConnectionRefusedError('Authentication required')
+
+    try:
+        claims = decode_token(token)
+    except Exception:
+        raise ConnectionRefusedError('Invalid or expired token')
+
+    if claims.get('type') != 'access' or token_revocation.is_revoked(claims['jti']):
+        raise ConnectionRefusedError('Invalid or expired token')
+
+    identity = CurrentIdentity(identity_user_id(claims.get('sub')))
+    if identity.access is None:
+        raise ConnectionRefusedError('Unknown user')
+
+    return identity.id, identity.role
+
+
 def register_socket_events(socketio: SocketIO):
     """Register all Socket.IO event handlers with proper validation and logging"""
-    
+
     @socketio.on('connect')
-    def handle_connect():
-        """Handle new client connections"""
+    def handle_connect(auth=None):
+        """Authenticate the client and put it in its own user room"""
         client_id = request.sid
-        print(f"[Socket] Client connected: {client_id}")
+        user_id, role = authenticate_socket(auth)
+
+        socket_rooms.register(client_id, user_id, [ADMIN_ROOM] if role == 'admin' else [])
+        print(f"[Socket] Client connected: {client_id} (user {user_id})")
+
+        # Both go only to this client
         emit('server_message', {
             'msg': 'Connected to EduHive WebSocket!',
             'client_id': client_id
         })
-        
-        # Send connection acknowledgement only to this client
         emit('connection_ack', {
             'status': 'success',
-            'message': 'You are now connected'
-        }, room=client_id)
+            'message': 'You are now connected',
+            'user_id': user_id
+        })
 
     @socketio.on('disconnect')
-    def handle_disconnect():
+    def handle_disconnect(reason=None):
         """Handle client disconnections"""
         client_id = request.sid
+        socket_rooms.unregister(client_id)
         print(f"[Socket] Client disconnected: {client_id}")
-        emit('server_message', {
-            'msg': 'Client disconnected',
-            'client_id': client_id
-        }, broadcast=True)
+
+    @socketio.on('join_forum')
+    @validate_socket_data(['forum'])
+    def handle_join_forum(data):
+        """Receive new posts, comments and like counts for a forum"""
+        room = forum_room(data['forum'])
+        if not socket_rooms.join(request.sid, room):
+            emit('error', {'message': 'Too many subscriptions'})
+            return
+        return {'room': room}
+
+    @socketio.on('leave_forum')
+    @validate_socket_data(['forum'])
+    def handle_leave_forum(data):
+        room = forum_room(data['forum'])
+        socket_rooms.leave(request.sid, room)
+        return {'room': room}
+
+    @socketio.on('join_post')
+    @validate_socket_data(['post_id'])
+    def handle_join_post(data):
+        """Receive comments and like counts for one post"""
+        post = db.session.query(CommunityPost.id).filter_by(id=data['post_id']).first()
+        if not post:
+            emit('error', {'message': 'Post not found'})
+            return
+
+        room = post_room(post.id)
+        if not socket_rooms.join(request.sid, room):
+            emit('error', {'message': 'Too many subscriptions'})
+            return
+        return {'room': room}
+
+    @socketio.on('leave_post')
+    @validate_socket_data(['post_id'])
+    def handle_leave_post(data):
+        room = post_room(data['post_id'])
+        socket_rooms.leave(request.sid, room)
+        return {'room': room}
+
+    def sender():
+        """(user id, display name) of the connected client, from its authenticated socket"""
+        user_id = socket_rooms.user_id(request.sid)
+        return user_id, author_names({user_id}).get(user_id)
 
     @socketio.on('new_post')
-    @validate_socket_data(['title', 'author_id', 'author_name'])
+    @validate_socket_data(['title'])
     def handle_new_post(data):
-        """Broadcast new post to all connected clients"""
-        print(f"[Socket] New post by {data['author_name']} (ID: {data['author_id']}): {data['title']}")
-        
-      
-        emit('new_post', broadcast=True, include_self=False)
-        
+        """Relay a new post to the other clients in its forum"""
+        forum = data.get('forum', 'general')
+        # The author is whoever is connected, not whatever the client claims
+        author_id, author_name = sender()
+        data = dict(data, author_id=author_id, author_name=author_name)
+        print(f"[Socket] New post by {author_name} (ID: {author_id}): {data['title']}")
+
+        socket_rooms.emit('new_post', data, forum_room(forum), skip_sid=request.sid)
+
         # Send acknowledgement to sender
         emit('post_acknowledgement', {
             'status': 'success',
             'message': 'Your post was shared successfully',
-             
-        }, room=request.sid)
+        })
 
     @socketio.on('like_post')
-    @validate_socket_data(['postId', 'userId', 'userName'])
+    @validate_socket_data(['postId'])
     def handle_like_post(data):
-        """Handle post likes and notify relevant clients"""
-        print(f"[Socket] Post {data['postId']} liked by {data['userName']}")
-        
+        """Record a like as the REST endpoint does; watchers get the new total from the next flush"""
+        post = db.session.query(
+            CommunityPost.id, CommunityPost.forum, CommunityPost.author_id, CommunityPost.likes
+        ).filter_by(id=data['postId']).first()
+        if not post:
+            emit('error', {'message': 'Post not found'})
+            return
 
-     
-        
-        # Broadcast to all except the sender
-        emit('like_post', broadcast=True, include_self=False)
-        
-        # Optionally notify post owner only
-        emit('like_notification', {
-            'post_id': data['postId'],
-            'liked_by': data['userName']
-        }, room=f"user_{data['postOwnerId']}")  # Assuming postOwnerId is available
+        user_id, user_name = sender()
+        liked = like_counter.like(post.id, post.forum, user_id)
+        likes = (post.likes or 0) + like_counter.pending(post.id)
+        if not liked:
+            return {'postId': post.id, 'liked': False, 'likes': likes}
+
+        print(f"[Socket] Post {post.id} liked by {user_name}")
+        if post.author_id and post.author_id != user_id:
+            socket_rooms.emit('like_notification', {
+                'post_id': post.id,
+                'liked_by': user_name
+            }, user_room(post.author_id))
+
+        return {'postId': post.id, 'liked': True, 'likes': likes}
 
     @socketio.on('reply')
-    @validate_socket_data(['post_id', 'content', 'author_id', 'author_name'])
+    @validate_socket_data(['post_id', 'content'])
     def handle_reply(data):
-        """Handle post replies with threading support"""
-        print(f"[Socket] New reply on post {data['post_id']} by {data['author_name']}")
-        
-       
-        # Broadcast to all clients
-        emit('reply',  broadcast=True)
-        
-        # Send notification to post author
-        emit('reply_notification', {
-            'post_id': data['post_id'],
-            'replied_by': data['author_name'],
-            'preview': data['content'][:50] + '...' if len(data['content']) > 50 else data['content']
-        }, room=f"user_{data['post_author_id']}")
+        """Relay a reply to the clients watching the post"""
+        post = db.session.query(CommunityPost.id, CommunityPost.author_id).filter_by(id=data['post_id']).first()
+        if not post:
+            emit('error', {'message': 'Post not found'})
+            return
+
+        content = str(data['content'])
+        author_id, author_name = sender()
+        print(f"[Socket] New reply on post {post.id} by {author_name}")
+
+        socket_rooms.emit('reply', {
+            'post_id': post.id,
+            'content': content,
+            'author_id': author_id,
+            'author_name': author_name
+        }, post_room(post.id))
+
+        if post.author_id and post.author_id != author_id:
+            socket_rooms.emit('reply_notification', {
+                'post_id': post.id,
+                'replied_by': author_name,
+                'preview': content[:50] + '...' if len(content) > 50 else content
+            }, user_room(post.author_id))
 
     @socketio.on('subscribe_upgrade')
     @validate_socket_data(['user_id', 'subscription_level'])
     def handle_subscription_upgrade(data):
-        """Handle subscription upgrades with validation"""
+        """Announce a subscription upgrade; only admins may send it"""
+        if ADMIN_ROOM not in socket_rooms.rooms(request.sid):
+            emit('error', {'message': 'Access forbidden: insufficient role'})
+            return
+
         valid_levels = ['basic', 'premium', 'enterprise']
         if data['subscription_level'] not in valid_levels:
             emit('error', {
                 'message': f'Invalid subscription level. Must be one of: {", ".join(valid_levels)}'
             })
             return
+
+        user_id = identity_user_id(data['user_id'])
+        if user_id is None:
+            emit('error', {'message': 'Invalid user_id'})
+            return
             
-        print(f"[Socket] User {data['user_id']} upgraded to {data['subscription_level']}")
+        print(f"[Socket] User {user_id} upgraded to {data['subscription_level']}")
         
-        # Broadcast to all admin clients
-        emit('admin_notification', {
+        # Notify the connected admins
+        socket_rooms.emit('admin_notification', {
             'type': 'subscription_upgrade',
-            'user_id': data['user_id'],
+            'user_id': user_id,
             'new_level': data['subscription_level']
-        }, room='admin_clients')
+        }, ADMIN_ROOM)
         
         # Notify the specific user
-        emit('subscription_updated', {
+        socket_rooms.emit('subscription_updated', {
             'status': 'success',
             'new_level': data['subscription_level'],
            
-        }, room=f"user_{data['user_id']}")
+        }, user_room(user_id))
 
     # Error handler for Socket.IO
     @socketio.on_error_default
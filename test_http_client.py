@@ -0,0 +1,122 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from services.http_client import HttpClient
+
+
+class StubServer:
+    """Local HTTP server answering each request with the next scripted (status, delay)"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                stub.requests.append(self.command)
+                status, delay = stub.responses.pop(0) if stub.responses else (200, 0)
+                if delay:
+                    time.sleep(delay)
+                self.send_response(status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            do_GET = do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(*responses):
+        server = StubServer(responses)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def client():
+    return HttpClient(timeout=(1, 1), retries=2, backoff=0, max_backoff=0)
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/'
+
+
+def test_idempotent_request_is_retried_on_retryable_status(stub, client):
+    server = stub((503, 0), (200, 0))
+
+    response = client.get(server.url)
+
+    assert response.status_code == 200
+    assert server.requests == ['GET', 'GET']
+    assert client.metrics()[server.url.split('/')[2]]['retries'] == 1
+
+
+def test_post_is_not_retried_after_reaching_the_server(stub, client):
+    server = stub((503, 0), (200, 0))
+
+    response = client.post(server.url, json={})
+
+    assert response.status_code == 503
+    assert server.requests == ['POST']
+
+
+def test_post_is_not_retried_after_a_read_timeout(stub, client):
+    server = stub((200, 1.5), (200, 0))
+
+    with pytest.raises(requests.exceptions.ReadTimeout) as error:
+        client.post(server.url, json={})
+
+    assert not HttpClient.never_sent(error.value)
+    assert server.requests == ['POST']
+
+
+def test_refused_connection_is_never_sent_and_retried_for_post(client):
+    url = closed_port_url()
+
+    with pytest.raises(requests.exceptions.ConnectionError) as error:
+        client.post(url, json={})
+
+    assert HttpClient.never_sent(error.value)
+    metrics = client.metrics()[url.split('/')[2]]
+    assert metrics['requests'] == 3
+    assert metrics['retries'] == 2
+    assert metrics['errors'] == 3
+
+
+def test_retries_stop_at_the_limit(stub, client):
+    server = stub((503, 0), (503, 0), (503, 0), (200, 0))
+
+    response = client.get(server.url)
+
+    assert response.status_code == 503
+    assert len(server.requests) == 3
@@ -0,0 +1,162 @@
+import pytest
+
+from services.leaderboard_service import (
+    LeaderboardEngine, LocalLeaderboardBackend, RedisLeaderboardBackend, SkipList
+)
+
+
+class FakeRedis:
+    """The sorted-set commands RedisLeaderboardBackend uses, kept in a dict"""
+
+    def __init__(self):
+        self.sets = {}
+
+    def _ordered(self, key):
+        # Redis orders ties by member, so descending order reverses that too
+        return sorted(self.sets.get(key, {}).items(), key=lambda item: (item[1], item[0]), reverse=True)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.sets.pop(key, None) is not None)
+
+    def zadd(self, key, mapping):
+        zset = self.sets.setdefault(key, {})
+        added = sum(1 for member in mapping if member not in zset)
+        zset.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    def zincrby(self, key, amount, member):
+        zset = self.sets.setdefault(key, {})
+        zset[member] = zset.get(member, 0.0) + amount
+        return zset[member]
+
+    def zscore(self, key, member):
+        return self.sets.get(key, {}).get(member)
+
+    def zcard(self, key):
+        return len(self.sets.get(key, {}))
+
+    def zrevrank(self, key, member):
+        members = [item[0] for item in self._ordered(key)]
+        return members.index(member) if member in members else None
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        items = self._ordered(key)[start:stop + 1]
+        return items if withscores else [member for member, score in items]
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+def test_skip_list_keeps_score_then_member_order():
+    skiplist = SkipList()
+    for member, score in [('c', 5), ('a', 5), ('b', 1), ('d', 9)]:
+        skiplist.insert(member, score)
+
+    assert skiplist.range(1, 4) == [('b', 1), ('a', 5), ('c', 5), ('d', 9)]
+    assert [skiplist.rank(member, score) for member, score in [('b', 1), ('a', 5), ('c', 5), ('d', 9)]] == [1, 2, 3, 4]
+
+    # An update is a delete at the old score and an insert at the new one
+    assert skiplist.delete('a', 5)
+    skiplist.insert('a', 10)
+    assert not skiplist.delete('c', 6)
+    assert skiplist.delete('b', 1)
+
+    assert len(skiplist) == 3
+    assert skiplist.range(1, 3) == [('c', 5), ('d', 9), ('a', 10)]
+    assert skiplist.rank('b', 1) is None
+
+
+def test_skip_list_ranks_stay_consistent_under_churn():
+    skiplist = SkipList()
+    scores = {}
+    for i in range(300):
+        member = f'user-{i % 40}'
+        if member in scores:
+            assert skiplist.delete(member, scores[member])
+        scores[member] = (i * 7) % 13
+        skiplist.insert(member, scores[member])
+
+    expected = sorted(((score, member) for member, score in scores.items()))
+    assert skiplist.range(1, len(scores)) == [(member, score) for score, member in expected]
+    for position, (score, member) in enumerate(expected, start=1):
+        assert skiplist.rank(member, score) == position
+
+
+@pytest.fixture(params=['local', 'redis'])
+def engine(request):
+    engine = LeaderboardEngine()
+    if request.param == 'local':
+        engine.backend = LocalLeaderboardBackend()
+    else:
+        engine.backend = RedisLeaderboardBackend(FakeRedis(), 'test:leaderboard')
+    engine.refresh_seconds = None
+    engine.backend.load([('1', 50), ('2', 30), ('3', 30), ('4', 10), ('5', 70)])
+    engine._loaded_at = 0
+    return engine
+
+
+def test_top_orders_ties_like_redis(engine):
+    assert [(entry['user_id'], entry['total_xp']) for entry in engine.top(5)] == [(5, 70), (1, 50), (3, 30), (2, 30), (4, 10)]
+    assert [entry['rank'] for entry in engine.top(5)] == [1, 2, 3, 4, 5]
+
+
+def test_top_larger_than_the_board(engine):
+    assert [entry['user_id'] for entry in engine.top(50)] == [5, 1, 3, 2, 4]
+    assert [entry['user_id'] for entry in engine.top(1)] == [5]
+
+
+def test_around_at_the_top_and_bottom(engine):
+    me, neighbours = engine.around(5, radius=2)
+    assert me == {'rank': 1, 'user_id': 5, 'total_xp': 70}
+    assert [entry['user_id'] for entry in neighbours] == [5, 1, 3]
+
+    me, neighbours = engine.around(4, radius=2)
+    assert me['rank'] == 5
+    assert [entry['user_id'] for entry in neighbours] == [3, 2, 4]
+
+    assert engine.around(99) == (None, [])
+
+
+def test_set_xp_moves_a_user(engine):
+    assert engine.set_xp(4, 60) == 60
+    assert engine.rank(4) == {'rank': 2, 'user_id': 4, 'total_xp': 60}
+    assert [entry['user_id'] for entry in engine.top(3)] == [5, 4, 1]
+
+
+def test_update_xp_on_a_cold_engine_counts_the_gain_once(app):
+    from flask_jwt_extended import create_access_token
+    from extensions import db, leaderboard
+    from models.user import User
+
+    user = User(first_name='Ada', last_name='L', email='ada@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    client = app.test_client()
+
+    # Nothing loaded yet: warming the set reads the XP this request just committed
+    leaderboard._loaded_at = None
+    response = client.post('/api/leaderboard/update_xp', json={'xp': 10}, headers=headers)
+    assert response.get_json()['total_xp'] == 10
+    assert leaderboard.rank(user.id)['total_xp'] == 10
+
+    # Same once the refresh window has run out
+    leaderboard._loaded_at = -leaderboard.refresh_seconds * 2
+    response = client.post('/api/leaderboard/update_xp', json={'xp': 5}, headers=headers)
+    assert response.get_json()['total_xp'] == 15
+    assert leaderboard.rank(user.id)['total_xp'] == 15
@@ -0,0 +1,227 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from services.like_counter import LikeCounter
+from services.socket_rooms import forum_room, post_room
+
+
+class FakeSocketIO:
+    """Keeps scheduled background tasks so a test can run each flush window itself"""
+
+    def __init__(self):
+        self.tasks = []
+
+    def start_background_task(self, target):
+        self.tasks.append(target)
+
+    def sleep(self, seconds):
+        pass
+
+    def run_next(self):
+        self.tasks.pop(0)()
+
+
+class FakeRooms:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, rooms):
+        self.emitted.append((event, data, rooms))
+
+
+def new_counter(app):
+    counter = LikeCounter()
+    counter.init_app(app, FakeSocketIO(), FakeRooms())
+    return counter
+
+
+@pytest.fixture
+def posts(app):
+    from extensions import db
+    from models.community import CommunityPost
+    from models.user import User
+
+    users = [User(first_name=f'User{i}', last_name='L', email=f'user{i}@example.com', password_hash='x',
+                  is_approved=True) for i in range(3)]
+    db.session.add_all(users)
+    db.session.flush()
+    posts = [CommunityPost(title=f'Post {i}', author_id=users[0].id, forum=forum)
+             for i, forum in enumerate(['general', 'math'])]
+    db.session.add_all(posts)
+    db.session.commit()
+    return users, posts
+
+
+@pytest.fixture
+def post_updates(app):
+    """UPDATE community_posts statements as ((delta, post id) rows, executemany)"""
+    from extensions import db
+
+    updates = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE community_posts'):
+            rows = parameters if executemany else [parameters]
+            updates.append(([tuple(row[-2:]) for row in rows], executemany))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield updates
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def likes_of(post):
+    from extensions import db
+
+    db.session.refresh(post)
+    return post.likes
+
+
+def test_second_like_by_the_same_user_is_refused(app, posts):
+    users, (post, _) = posts
+    counter = new_counter(app)
+
+    assert counter.like(post.id, post.forum, users[1].id) is True
+    assert counter.like(post.id, post.forum, users[1].id) is False
+    assert counter.pending(post.id) == 1
+
+    assert counter.unlike(post.id, post.forum, users[1].id) is True
+    assert counter.unlike(post.id, post.forum, users[1].id) is False
+    assert counter.pending(post.id) == 0
+
+
+def test_each_window_applies_one_relative_update_per_post(app, posts, post_updates):
+    users, (general, math) = posts
+    counter = new_counter(app)
+
+    def add_likes(post_id, forum, count):
+        for _ in range(count):
+            counter._add(post_id, forum, 1)
+
+    threads = [threading.Thread(target=add_likes, args=(post.id, post.forum, 50))
+               for post in (general, math, general, math)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Only the first like of the window schedules a flush
+    assert len(counter.socketio.tasks) == 1
+    counter.socketio.run_next()
+
+    [(rows, executemany)] = post_updates
+    assert executemany
+    assert sorted(rows) == sorted([(100, general.id), (100, math.id)])
+    assert likes_of(general) == 100
+    assert likes_of(math) == 100
+    assert counter.pending(general.id) == 0
+    assert ('like_post', {'postId': math.id, 'likes': 100}, [forum_room('math'), post_room(math.id)]) \
+        in counter.rooms.emitted
+
+    # Likes after the flush open a second window
+    counter.like(general.id, general.forum, users[1].id)
+    counter.like(general.id, general.forum, users[2].id)
+    assert len(counter.socketio.tasks) == 1
+    counter.socketio.run_next()
+
+    assert len(post_updates) == 2
+    assert post_updates[1][0] == [(2, general.id)]
+    assert likes_of(general) == 102
+    assert likes_of(math) == 100
+
+
+def test_failed_flush_puts_its_increments_back(app, posts, post_updates):
+    from extensions import db
+
+    users, (post, _) = posts
+    counter = new_counter(app)
+    counter.like(post.id, post.forum, users[1].id)
+    counter.like(post.id, post.forum, users[2].id)
+
+    def fail_once(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE community_posts'):
+            event.remove(db.engine, 'before_cursor_execute', fail_once)
+            raise RuntimeError('database is locked')
+
+    event.listen(db.engine, 'before_cursor_execute', fail_once)
+    with pytest.raises(RuntimeError):
+        counter.flush()
+
+    assert counter.pending(post.id) == 2
+    assert likes_of(post) == 0
+    assert counter.rooms.emitted == []
+
+    assert counter.flush() == 1
+    assert likes_of(post) == 2
+    assert counter.pending(post.id) == 0
+
+
+def test_flush_window_retries_after_a_failure(app, posts):
+    from extensions import db
+
+    users, (post, _) = posts
+    counter = new_counter(app)
+    counter.like(post.id, post.forum, users[1].id)
+
+    def fail_once(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE community_posts'):
+            event.remove(db.engine, 'before_cursor_execute', fail_once)
+            raise RuntimeError('database is locked')
+
+    event.listen(db.engine, 'before_cursor_execute', fail_once)
+    counter.socketio.run_next()
+
+    assert likes_of(post) == 1
+    assert counter.socketio.tasks == []
+    assert counter.rooms.emitted == [('like_post', {'postId': post.id, 'likes': 1},
+                                      [forum_room(post.forum), post_room(post.id)])]
+
+
+def test_recount_fixes_drifted_counters(app, posts):
+    from extensions import db
+    from models.community import PostLike
+
+    users, (general, math) = posts
+    db.session.add_all([PostLike(post_id=general.id, user_id=users[1].id),
+                        PostLike(post_id=general.id, user_id=users[2].id)])
+    # A process died with unflushed likes on one post and a stale total on the other
+    general.likes = 0
+    math.likes = 7
+    db.session.commit()
+
+    counter = new_counter(app)
+    assert counter.recount() == 2
+    assert likes_of(general) == 2
+    assert likes_of(math) == 0
+    assert counter.recount() == 0
+
+
+def test_socket_likes_go_through_the_counter(app, posts, monkeypatch):
+    from flask_jwt_extended import create_access_token
+    from extensions import like_counter, socketio
+    from models.community import PostLike
+
+    users, (post, _) = posts
+    monkeypatch.setattr(like_counter, 'socketio', FakeSocketIO())
+
+    def connect(user):
+        return socketio.test_client(app, auth={'token': create_access_token(identity=str(user.id))})
+
+    liker, watcher = connect(users[1]), connect(users[2])
+    watcher.emit('join_post', {'post_id': post.id}, callback=True)
+    watcher.get_received()
+
+    assert liker.emit('like_post', {'postId': post.id}, callback=True) == {'postId': post.id, 'liked': True, 'likes': 1}
+    assert liker.emit('like_post', {'postId': post.id}, callback=True) == {'postId': post.id, 'liked': False, 'likes': 1}
+    assert PostLike.query.filter_by(post_id=post.id).count() == 1
+
+    # Nothing is broadcast until the flush, which sends the stored total
+    assert watcher.get_received() == []
+    like_counter.socketio.run_next()
+    assert [(message['name'], message['args']) for message in watcher.get_received()] == \
+        [('like_post', [{'postId': post.id, 'likes': 1}])]
+    assert likes_of(post) == 1
+
+    liker.disconnect()
+    watcher.disconnect()
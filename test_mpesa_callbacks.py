@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from services.mpesa_callbacks import record_callback
+
+
+@pytest.fixture
+def payment(app):
+    from extensions import db
+    from models.payment import Payment
+
+    payment = Payment(checkout_request_id='ref-1', mpesa_checkout_request_id='ws_CO_1', merchant_request_id='m-1',
+                      phone_number='254708374149', amount=1, status='sent_to_phone')
+    db.session.add(payment)
+    db.session.commit()
+    return payment
+
+
+def callback_outcomes():
+    from models.mpesa_callback import MpesaCallback
+
+    return [(callback.kind, callback.outcome) for callback in MpesaCallback.query.order_by(MpesaCallback.id)]
+
+
+def test_late_timeout_does_not_replace_completion(app, payment):
+    from extensions import db, mpesa_callback_applier
+
+    record_callback('result', 'ws_CO_1', merchant_request_id='m-1', result_code=0, result_desc='Processed')
+    record_callback('timeout', 'ws_CO_1', merchant_request_id='m-1')
+
+    mpesa_callback_applier.apply_batch()
+    db.session.refresh(payment)
+
+    assert payment.status == 'completed'
+    assert callback_outcomes() == [('result', 'applied'), ('timeout', 'ignored')]
+
+
+def test_completion_after_timeout_is_applied(app, payment):
+    from extensions import db, mpesa_callback_applier
+
+    record_callback('timeout', 'ws_CO_1', merchant_request_id='m-1')
+    record_callback('result', 'ws_CO_1', merchant_request_id='m-1', result_code=0, result_desc='Processed')
+
+    mpesa_callback_applier.apply_batch()
+    db.session.refresh(payment)
+
+    assert payment.status == 'completed'
+    assert callback_outcomes() == [('timeout', 'applied'), ('result', 'applied')]
+
+
+def test_unmatched_callbacks_are_set_aside_without_blocking_the_batch(app, payment):
+    from extensions import db, mpesa_callback_applier
+    from models.mpesa_callback import MpesaCallback
+
+    mpesa_callback_applier.batch_size = 2
+    record_callback('result', 'ws_CO_unknown_1', result_code=0)
+    record_callback('result', 'ws_CO_unknown_2', result_code=0)
+    record_callback('result', 'ws_CO_1', merchant_request_id='m-1', result_code=0, result_desc='Processed')
+
+    # Nothing settled, so the caller should wait for the next poll rather than spin
+    assert mpesa_callback_applier.apply_batch() is False
+    assert MpesaCallback.query.filter(MpesaCallback.next_attempt_at.isnot(None)).count() == 2
+
+    mpesa_callback_applier.apply_batch()
+    db.session.refresh(payment)
+    assert payment.status == 'completed'
+
+
+def test_unmatched_callbacks_are_given_up_on(app):
+    from extensions import db, mpesa_callback_applier
+    from models.mpesa_callback import MpesaCallback
+
+    record_callback('result', 'ws_CO_unknown', result_code=0)
+    callback = MpesaCallback.query.one()
+    callback.received_at = datetime.utcnow() - timedelta(seconds=mpesa_callback_applier.unmatched_seconds + 1)
+    db.session.commit()
+
+    mpesa_callback_applier.apply_batch()
+
+    assert callback_outcomes() == [('result', 'unmatched')]
+
+
+def test_callback_losing_a_race_is_decided_again(app, payment):
+    from extensions import db, mpesa_callback_applier
+    from models.payment import Payment
+
+    record_callback('timeout', 'ws_CO_1', merchant_request_id='m-1')
+
+    def cancel_first(conn, cursor, statement, parameters, context, executemany):
+        # Another process settles the payment between the batch's read and its UPDATE
+        if statement.startswith('UPDATE payments'):
+            cursor.execute("UPDATE payments SET status = 'cancelled' WHERE id = ?", (payment.id,))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', cancel_first)
+    try:
+        mpesa_callback_applier.apply_batch()
+    finally:
+        event.remove(engine, 'before_cursor_execute', cancel_first)
+
+    assert callback_outcomes() == [('timeout', None)]
+
+    mpesa_callback_applier.apply_batch()
+    assert db.session.get(Payment, payment.id).status == 'cancelled'
+    assert callback_outcomes() == [('timeout', 'ignored')]
@@ -0,0 +1,279 @@
+import json
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class SmtpSink:
+    """Local SMTP server that accepts every message except those to refused recipients"""
+
+    def __init__(self, refused=()):
+        self.refused = set(refused)
+        self.connections = 0
+        self.messages = []
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(f'{line}\r\n'.encode())
+
+            def handle(self):
+                sink.connections += 1
+                self.reply('220 sink')
+                recipients = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode().strip()
+                    verb = command[:4].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.reply('250 sink')
+                    elif verb == 'MAIL':
+                        recipients = []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        address = command.split(':', 1)[1].strip().strip('<>')
+                        if address in sink.refused:
+                            self.reply('550 No such user')
+                        else:
+                            recipients.append(address)
+                            self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        while self.rfile.readline() not in (b'.\r\n', b''):
+                            pass
+                        sink.messages.append(recipients)
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('250 OK')
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MailchimpStub:
+    """Local HTTP server answering each batch upsert with the next scripted (status, body)"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                stub.requests.append((self.path, json.loads(self.rfile.read(length))))
+                status, body = stub.responses.pop(0) if stub.responses else (200, {'errors': []})
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/3.0'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def servers(app, monkeypatch):
+    """Point the app's mail and Mailchimp settings at local servers"""
+    from extensions import newsletter_delivery_worker, socketio
+    from services.http_client import http_client
+
+    started = []
+
+    def start(refused=(), mailchimp=()):
+        sink = SmtpSink(refused)
+        stub = MailchimpStub(mailchimp)
+        started.extend([sink, stub])
+
+        state = app.extensions['mail']
+        for name, value in {'server': '127.0.0.1', 'port': sink.port, 'use_tls': False, 'use_ssl': False,
+                            'username': None, 'suppress': False}.items():
+            monkeypatch.setattr(state, name, value)
+        app.config.update(ADMIN_EMAIL='admin@example.com', MAILCHIMP_API_KEY='key-us1',
+                          MAILCHIMP_AUDIENCE_ID='list-1', MAILCHIMP_API_URL=stub.url)
+        newsletter_delivery_worker.init_app(app, socketio)
+        # Retries here are the worker's, not the HTTP client's
+        monkeypatch.setattr(http_client, 'retries', 0)
+        return sink, stub
+
+    yield start
+    for server in started:
+        server.close()
+
+
+def subscribe(email, phone):
+    from extensions import db, newsletter_delivery_worker
+    from models.newsletter import NewsletterSubscriber
+
+    subscriber = NewsletterSubscriber(name='Amina', email=email, phone=phone)
+    db.session.add(subscriber)
+    newsletter_delivery_worker.enqueue_subscription(subscriber)
+    db.session.commit()
+    return subscriber
+
+
+def deliveries(kind=None):
+    from models.newsletter_delivery import NewsletterDelivery
+
+    query = NewsletterDelivery.query.order_by(NewsletterDelivery.id)
+    if kind:
+        query = query.filter_by(kind=kind)
+    return query.all()
+
+
+def make_due(kind=None):
+    from extensions import db
+
+    for delivery in deliveries(kind):
+        if delivery.status == 'pending':
+            delivery.available_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_batch_shares_one_smtp_connection_and_one_mailchimp_call(app, servers):
+    from extensions import newsletter_delivery_worker
+
+    sink, stub = servers()
+    subscribe('amina@example.com', '254700000001')
+    subscribe('baraka@example.com', '254700000002')
+
+    newsletter_delivery_worker.process_batch()
+
+    assert [delivery.status for delivery in deliveries()] == ['sent'] * 6
+    assert sink.connections == 1
+    assert sorted(sink.messages) == sorted([['amina@example.com'], ['admin@example.com'],
+                                            ['baraka@example.com'], ['admin@example.com']])
+    assert len(stub.requests) == 1
+    path, body = stub.requests[0]
+    assert path == '/3.0/lists/list-1'
+    assert body['update_existing'] is True
+    assert [member['email_address'] for member in body['members']] == ['amina@example.com', 'baraka@example.com']
+
+
+def test_failed_deliveries_back_off_exponentially(app, servers):
+    from extensions import newsletter_delivery_worker
+
+    sink, stub = servers(mailchimp=[(503, {}), (503, {})])
+    subscribe('amina@example.com', '254700000001')
+
+    newsletter_delivery_worker.process_batch()
+    [member] = deliveries('mailchimp')
+    assert member.status == 'pending'
+    assert member.attempts == 1
+    assert '503' in member.last_error
+    assert timedelta(seconds=1) < member.available_at - datetime.utcnow() <= timedelta(seconds=2)
+
+    # Not due yet, so nothing is claimed
+    assert newsletter_delivery_worker.claim_batch() == []
+
+    make_due('mailchimp')
+    newsletter_delivery_worker.process_batch()
+    [member] = deliveries('mailchimp')
+    assert member.attempts == 2
+    assert timedelta(seconds=3) < member.available_at - datetime.utcnow() <= timedelta(seconds=4)
+
+    make_due('mailchimp')
+    newsletter_delivery_worker.process_batch()
+    [member] = deliveries('mailchimp')
+    assert member.status == 'sent'
+    assert member.last_error is None
+    assert len(stub.requests) == 3
+
+
+def test_deliveries_are_dead_after_max_attempts(app, servers):
+    from extensions import newsletter_delivery_worker
+
+    app.config['NEWSLETTER_DELIVERY_MAX_ATTEMPTS'] = 2
+    sink, stub = servers(refused=['amina@example.com'])
+    subscribe('amina@example.com', '254700000001')
+
+    newsletter_delivery_worker.process_batch()
+    [confirmation] = deliveries('confirmation_email')
+    assert confirmation.status == 'pending'
+    assert [delivery.status for delivery in deliveries('admin_email')] == ['sent']
+
+    make_due()
+    newsletter_delivery_worker.process_batch()
+    [confirmation] = deliveries('confirmation_email')
+    assert confirmation.status == 'dead'
+    assert confirmation.attempts == 2
+    assert 'amina@example.com' in confirmation.last_error
+
+    make_due()
+    assert newsletter_delivery_worker.claim_batch() == []
+
+    sink.refused.clear()
+    assert newsletter_delivery_worker.requeue_dead('confirmation_email') == 1
+    newsletter_delivery_worker.process_batch()
+    [confirmation] = deliveries('confirmation_email')
+    assert confirmation.status == 'sent'
+    assert confirmation.attempts == 1
+
+
+def test_rejected_mailchimp_members_are_dead_at_once(app, servers):
+    from extensions import newsletter_delivery_worker
+
+    rejected = {'errors': [{'email_address': 'Baraka@example.com', 'error': 'looks fake or invalid'}]}
+    sink, stub = servers(mailchimp=[(200, rejected)])
+    subscribe('amina@example.com', '254700000001')
+    subscribe('baraka@example.com', '254700000002')
+
+    newsletter_delivery_worker.process_batch()
+
+    amina, baraka = deliveries('mailchimp')
+    assert amina.status == 'sent'
+    assert baraka.status == 'dead'
+    assert baraka.attempts == 1
+    assert baraka.last_error == 'Mailchimp: looks fake or invalid'
+
+
+def test_expired_lock_is_reclaimed(app, servers):
+    from extensions import db, newsletter_delivery_worker
+
+    sink, stub = servers()
+    subscribe('amina@example.com', '254700000001')
+
+    # A worker claims the batch and dies before settling it
+    claimed = newsletter_delivery_worker.claim_batch()
+    assert len(claimed) == 3
+    first_token = claimed[0].claim_token
+    assert newsletter_delivery_worker.claim_batch() == []
+
+    for delivery in claimed:
+        delivery.locked_at = datetime.utcnow() - timedelta(seconds=newsletter_delivery_worker.lock_seconds - 5)
+    db.session.commit()
+    assert newsletter_delivery_worker.claim_batch() == []
+
+    for delivery in claimed:
+        delivery.locked_at = datetime.utcnow() - timedelta(seconds=newsletter_delivery_worker.lock_seconds + 1)
+    db.session.commit()
+
+    newsletter_delivery_worker.process_batch()
+
+    assert [delivery.status for delivery in deliveries()] == ['sent'] * 3
+    assert all(delivery.attempts == 2 and delivery.claim_token != first_token for delivery in deliveries())
+    assert len(sink.messages) == 2
@@ -0,0 +1,146 @@
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from services.payment_outbox import PaymentOutboxWorker
+
+PUSH_URL = 'https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
+TOKEN_URL = 'https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials'
+
+
+def http_error(url, status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response.request = requests.Request('POST', url).prepare()
+    return requests.exceptions.HTTPError(f'{status_code} Error', response=response)
+
+
+def refused(url):
+    reason = NewConnectionError(None, 'Connection refused')
+    error = requests.exceptions.ConnectionError(type('MaxRetryError', (), {'reason': reason})())
+    error.request = requests.Request('POST', url).prepare()
+    return error
+
+
+def read_timeout(url):
+    return requests.exceptions.ReadTimeout('Read timed out', request=requests.Request('POST', url).prepare())
+
+
+@pytest.mark.parametrize('error, outcome', [
+    (refused(PUSH_URL), 'retry'),
+    (http_error(PUSH_URL, 429), 'retry'),
+    (http_error(PUSH_URL, 401), 'retry'),
+    (http_error(TOKEN_URL, 503), 'retry'),
+    (read_timeout(TOKEN_URL), 'retry'),
+    (http_error(PUSH_URL, 400), 'failed'),
+    (ValueError('M-Pesa passkey must be set in environment variables'), 'failed'),
+    (http_error(PUSH_URL, 500), 'unconfirmed'),
+    (http_error(PUSH_URL, 503), 'unconfirmed'),
+    (read_timeout(PUSH_URL), 'unconfirmed'),
+])
+def test_only_pushes_that_never_reached_safaricom_are_retried(error, outcome):
+    assert PaymentOutboxWorker._classify_failure(error) == outcome
+
+
+@pytest.fixture
+def queue_payment(app):
+    from extensions import db
+    from models.payment import Payment
+    from models.payment_outbox import PaymentOutbox
+
+    def queue():
+        payment = Payment(checkout_request_id='ref-1', phone_number='254708374149', amount=1,
+                          account_reference='Test', transaction_desc='Test', status='pending')
+        job = PaymentOutbox(payment=payment)
+        db.session.add_all([payment, job])
+        db.session.commit()
+        return payment, job
+
+    return queue
+
+
+def send_with(monkeypatch, error):
+    from extensions import payment_outbox_worker
+    from resources.mpesa_resources import MpesaService
+
+    def initiate_stk_push(**kwargs):
+        raise error
+
+    monkeypatch.setattr(MpesaService, 'initiate_stk_push', staticmethod(initiate_stk_push))
+    assert payment_outbox_worker.process_next()
+
+
+def test_push_that_may_have_been_accepted_is_not_resent(app, monkeypatch, queue_payment):
+    from extensions import db, payment_outbox_worker
+
+    payment, job = queue_payment()
+    send_with(monkeypatch, http_error(PUSH_URL, 503))
+    db.session.refresh(payment)
+    db.session.refresh(job)
+
+    assert payment.status == 'unconfirmed'
+    assert job.status == 'unconfirmed'
+    assert payment_outbox_worker.claim_next() is None
+
+
+def test_push_that_never_left_is_retried_later(app, monkeypatch, queue_payment):
+    from extensions import db
+
+    payment, job = queue_payment()
+    send_with(monkeypatch, refused(PUSH_URL))
+    db.session.refresh(payment)
+    db.session.refresh(job)
+
+    assert payment.status == 'pending'
+    assert job.status == 'pending'
+    assert job.attempts == 1
+    assert job.available_at > job.updated_at
+
+
+def test_retries_give_up_after_max_attempts(app, monkeypatch, queue_payment):
+    from extensions import db, payment_outbox_worker
+
+    payment, job = queue_payment()
+    job.attempts = payment_outbox_worker.max_attempts - 1
+    db.session.commit()
+
+    send_with(monkeypatch, refused(PUSH_URL))
+    db.session.refresh(payment)
+
+    assert payment.status == 'failed'
+    assert payment.outbox.status == 'failed'
+
+
+@pytest.mark.parametrize('result', [
+    http_error(PUSH_URL, 503),
+    {'ResponseCode': '0', 'MerchantRequestID': 'm-1', 'CheckoutRequestID': 'ws_CO_1', 'CustomerMessage': 'Sent'},
+])
+def test_callback_that_lands_mid_push_is_not_overwritten(app, monkeypatch, queue_payment, result):
+    from extensions import db, payment_outbox_worker
+    from models.payment import Payment
+    from resources.mpesa_resources import MpesaService
+
+    payment, job = queue_payment()
+    emitted = []
+    monkeypatch.setattr(payment_outbox_worker.socketio, 'emit', lambda *args, **kwargs: emitted.append(args))
+
+    def initiate_stk_push(**kwargs):
+        # The ?ref= callback completes the payment before Safaricom's response reaches us
+        Payment.query.filter_by(id=payment.id).update({'status': 'completed', 'mpesa_receipt_number': 'RCPT1'})
+        db.session.commit()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(MpesaService, 'initiate_stk_push', staticmethod(initiate_stk_push))
+    assert payment_outbox_worker.process_next()
+    db.session.refresh(payment)
+    db.session.refresh(job)
+
+    assert payment.status == 'completed'
+    assert payment.mpesa_receipt_number == 'RCPT1'
+    assert job.status in ('unconfirmed', 'sent')
+    assert job.locked_at is None
+    assert emitted == []
+    if isinstance(result, dict):
+        assert payment.mpesa_checkout_request_id == 'ws_CO_1'
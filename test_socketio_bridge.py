@@ -0,0 +1,59 @@
+import time
+
+import pytest
+from flask import Flask
+from flask_socketio import SocketIO
+
+from services.socketio_bridge import LocalPubSubManager, client_manager_for
+
+
+class Worker:
+    """A Socket.IO server on its own client manager, recording the packets it would send"""
+
+    def __init__(self, channel):
+        self.socketio = SocketIO(Flask(__name__), client_manager=LocalPubSubManager(channel=channel),
+                                 async_mode='threading')
+        self.sent = []
+        server = self.socketio.server
+        server._send_eio_packet = lambda eio_sid, packet: self.sent.append((eio_sid, packet.data))
+        server.manager_initialized = True
+        server.manager.initialize()
+
+    def connect(self, eio_sid, room):
+        sid = self.socketio.server.manager.connect(eio_sid, '/')
+        self.socketio.server.manager.enter_room(sid, '/', room)
+
+    def received(self, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while not self.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.sent
+
+
+def test_emit_on_one_server_reaches_clients_of_another():
+    first, second = Worker('test-bridge'), Worker('test-bridge')
+    second.connect('client-1', 'forum_math')
+
+    first.socketio.emit('new_post', {'id': 1}, to='forum_math')
+    first.socketio.emit('new_post', {'id': 2}, to='forum_other')
+
+    sent = second.received()
+    time.sleep(0.1)
+    assert len(sent) == 1
+    assert sent[0][0] == 'client-1'
+    assert '"id":1' in sent[0][1].replace(' ', '')
+
+
+def test_servers_on_other_channels_are_not_bridged():
+    first, second = Worker('test-bridge-a'), Worker('test-bridge-b')
+    second.connect('client-1', 'forum_math')
+
+    first.socketio.emit('new_post', {'id': 1}, to='forum_math')
+
+    assert second.received(timeout=0.2) == []
+
+
+def test_unknown_backend_is_rejected():
+    assert client_manager_for({'SOCKETIO_BACKEND': 'none'}) is None
+    with pytest.raises(ValueError):
+        client_manager_for({'SOCKETIO_BACKEND': 'nope'})
@@ -0,0 +1,96 @@
+import uuid
+
+import pytest
+
+from services.token_revocation import BloomFilter, SQLRevocationBackend, TokenRevocationStore
+
+
+@pytest.fixture
+def user(app):
+    from extensions import db
+    from models.user import User
+
+    user = User(first_name='Ada', last_name='L', email='ada@example.com', password_hash='x', is_approved=True)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def new_store(app):
+    store = TokenRevocationStore()
+    store.init_app(app)
+    return store
+
+
+def payload(jti=None):
+    return {'jti': jti or uuid.uuid4().hex, 'type': 'access', 'sub': '1', 'exp': 4102444800}
+
+
+def test_logged_out_token_is_rejected_on_the_next_request(app, user):
+    from flask_jwt_extended import create_access_token
+
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    client = app.test_client()
+
+    assert client.get('/api/me', headers=headers).status_code == 200
+    assert client.post('/api/logout', headers=headers).status_code == 200
+    assert client.get('/api/me', headers=headers).status_code == 401
+
+
+def test_bloom_filter_miss_answers_without_the_backend(app, monkeypatch):
+    store = new_store(app)
+    store.revoke(payload())
+
+    def contains(jti):
+        raise AssertionError('the backend should not be asked about ids the filter has never seen')
+
+    monkeypatch.setattr(store.backend, 'contains', contains)
+    assert store.is_revoked(uuid.uuid4().hex) is False
+
+
+def test_bloom_filter_hit_is_confirmed_by_the_backend(app):
+    store = new_store(app)
+    revoked = payload()
+    store.revoke(revoked)
+
+    # A false positive: in the filter but never revoked
+    false_positive = uuid.uuid4().hex
+    store._bloom.add(false_positive)
+
+    assert store.is_revoked(revoked['jti']) is True
+    assert store.is_revoked(false_positive) is False
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000)
+    items = [uuid.uuid4().hex for _ in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+
+
+def test_other_store_sees_a_revocation_after_the_sync_interval(app):
+    revoking, other = new_store(app), new_store(app)
+    token = payload()
+
+    # The other worker has a fresh filter from before the logout
+    assert other.is_revoked(token['jti']) is False
+    revoking.revoke(token)
+
+    assert revoking.is_revoked(token['jti']) is True
+    assert other.is_revoked(token['jti']) is False
+
+    # JWT_REVOCATION_SYNC_SECONDS later it pulls the ids revoked elsewhere
+    other._synced_at -= other.sync_seconds
+    assert other.is_revoked(token['jti']) is True
+
+
+def test_prune_drops_expired_revocations(app):
+    store = new_store(app)
+    expired = dict(payload(), exp=1)
+    store.revoke(expired)
+
+    assert store.prune() == 1
+    assert isinstance(store.backend, SQLRevocationBackend)
+    assert store.backend.contains(expired['jti']) is False
@@ -1,4 +1,12 @@
-from extensions import jwt
+import threading
+import time
+from collections import OrderedDict
+from flask import g, current_app
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from extensions import jwt, db
+from models.user import User
 
 @jwt.user_identity_loader
 def user_identity_lookup(user):
@@ -8,4 +16,128 @@ def user_identity_lookup(user):
 
 
 # create_access_token(identity=user)
-# …it will automatically embed both id and role.
\ No newline at end of file
+# …it will automatically embed both id and role.
+
+
+class AccessCache:
+    """Short-lived LRU of each user's (role, is_approved) state.
+
+    Entries expire after AUTH_CACHE_TTL seconds and are dropped as soon as a
+    commit in this process changes a user's role or approval, so other
+    workers see such a change within one TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            state, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return state
+
+    def set(self, user_id, state):
+        ttl = current_app.config.get('AUTH_CACHE_TTL', 30)
+        max_size = current_app.config.get('AUTH_CACHE_SIZE', 10000)
+
+        with self._lock:
+            self._entries[user_id] = (state, time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+access_cache = AccessCache()
+
+_UNLOADED = object()
+
+
+class CurrentIdentity:
+    """The authenticated caller of this request; the user row is loaded at most once"""
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self._user = _UNLOADED
+        self._access = None
+
+    @property
+    def user(self):
+        if self._user is _UNLOADED:
+            self._user = db.session.get(User, self.id) if self.id is not None else None
+            if self._user is not None:
+                access_cache.set(self.id, (self._user.role, bool(self._user.is_approved)))
+        return self._user
+
+    @property
+    def access(self):
+        """(role, is_approved) for the user, or None if they no longer exist"""
+        if self._access is None:
+            self._access = access_cache.get(self.id)
+        if self._access is None and self.user is not None:
+            self._access = (self.user.role, bool(self.user.is_approved))
+        return self._access
+
+    @property
+    def role(self):
+        return self.access[0] if self.access else None
+
+    @property
+    def is_approved(self):
+        return bool(self.access and self.access[1])
+
+
+def identity_user_id(identity):
+    # Tokens carry either {"id": ..., "role": ...} or the bare user id
+    user_id = identity.get("id") if isinstance(identity, dict) else identity
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_current_identity():
+    """Identity for the verified JWT of the current request"""
+    identity = g.get('current_identity')
+    if identity is None:
+        identity = CurrentIdentity(identity_user_id(get_jwt_identity()))
+        g.current_identity = identity
+    return identity
+
+
+def get_current_user():
+    """User for the verified JWT of the current request, or None"""
+    return get_current_identity().user
+
+
+@event.listens_for(User.role, 'set')
+@event.listens_for(User.is_approved, 'set')
+def _track_access_change(target, value, oldvalue, initiator):
+    session = object_session(target)
+    if session is not None and target.id is not None:
+        session.info.setdefault('access_changed', set()).add(target.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_changed_access(session):
+    for user_id in session.info.pop('access_changed', ()):
+        access_cache.invalidate(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_access_changes(session):
+    session.info.pop('access_changed', None)
@@ -1,20 +1,20 @@
 # utils/decorators.py
 
 from functools import wraps
-from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
-from flask import jsonify
-from models.user import User
+from flask_jwt_extended import verify_jwt_in_request
+from utils.auth import get_current_identity
 
 # Generic role-based decorator
 def role_required(*roles):
+    # Plain dict errors work for both Flask-RESTful resources and blueprint views
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             verify_jwt_in_request()
-            claims = get_jwt()
-            user_role = claims.get("role")
+            # Role comes from the request identity, cached per user between requests
+            user_role = get_current_identity().role
             if user_role not in roles:
-                return jsonify({"msg": "Access forbidden: insufficient role"}), 403
+                return {"msg": "Access forbidden: insufficient role"}, 403
             return fn(*args, **kwargs)
         return wrapper
     return decorator
@@ -24,10 +24,8 @@ def approved_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        if not user or not user.is_approved:
-            return jsonify({"msg": "Account not approved. Please wait for admin approval."}), 403
+        if not get_current_identity().is_approved:
+            return {"msg": "Account not approved. Please wait for admin approval."}, 403
         return fn(*args, **kwargs)
     return wrapper
 
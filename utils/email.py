@@ -1,18 +1,32 @@
-
 from flask_mail import Message
 from extensions import mail
 from flask import current_app
 
+# Message builders; callers either send them one at a time below or
+# several over one SMTP connection (see services/newsletter_delivery.py)
+
+def build_email(subject, recipients, body):
+    return Message(subject, recipients=recipients, body=body)
+
+def subscriber_confirmation_message(email, name):
+    body = f"Hi {name},\n\nThank you for subscribing to EduHive!"
+    return build_email("Welcome to EduHive!", [email], body)
+
+def admin_subscription_message(name, email, phone):
+    """Admin notice for a new subscriber, or None when ADMIN_EMAIL isn't configured"""
+    admin_email = current_app.config.get("ADMIN_EMAIL")
+    if not admin_email:
+        return None
+    body = f"New subscriber:\n\nName: {name}\nEmail: {email}\nPhone: {phone}"
+    return build_email("New Newsletter Subscriber", [admin_email], body)
+
 def send_email(subject, recipients, body):
-    msg = Message(subject, recipients=recipients, body=body)
-    mail.send(msg)
+    mail.send(build_email(subject, recipients, body))
 
 def send_subscriber_confirmation(email, name):
-    body = f"Hi {name},\n\nThank you for subscribing to EduHive!"
-    send_email("Welcome to EduHive!", [email], body)
+    mail.send(subscriber_confirmation_message(email, name))
 
 def notify_admin_of_subscription(name, email, phone):
-    admin_email = current_app.config.get("ADMIN_EMAIL")
-    if admin_email:
-        body = f"New subscriber:\n\nName: {name}\nEmail: {email}\nPhone: {phone}"
-        send_email("New Newsletter Subscriber", [admin_email], body)
+    msg = admin_subscription_message(name, email, phone)
+    if msg:
+        mail.send(msg)
@@ -104,6 +104,31 @@ def calculate_quiz_statistics(attempts):
         'average_time': round(sum(times) / len(times), 0) if times else 0
     }
 
+def get_daily_window(days, end_date=None):
+    """Get the ISO dates of the last N days (oldest first) and the datetime the window starts"""
+    end_date = end_date or datetime.utcnow().date()
+    dates = [(end_date - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+    start = datetime.combine(end_date - timedelta(days=max(days - 1, 0)), datetime.min.time())
+    return dates, start
+
+def fill_daily_series(dates, rows_by_date, empty):
+    """Build one entry per date from grouped rows, zero-filling days without data"""
+    series = []
+    for date in dates:
+        entry = {'date': date}
+        entry.update(empty)
+        entry.update(rows_by_date.get(date, {}))
+        series.append(entry)
+    return series
+
+def get_accuracy_difficulty_rating(accuracy_rate):
+    """Rate a question by the percentage of correct answers it gets"""
+    if accuracy_rate > 80:
+        return 'Easy'
+    elif accuracy_rate < 50:
+        return 'Hard'
+    return 'Medium'
+
 def get_quiz_difficulty_color(difficulty):
     """Get color code for quiz difficulty"""
     colors = {
@@ -193,13 +218,10 @@ def calculate_xp_for_quiz(quiz, score, is_passed):
 
 def generate_quiz_summary_data(quiz, user_id=None):
     """Generate comprehensive quiz summary data"""
-    from models.quiz_attempt import QuizAttempt
-
-    # Get all attempts for this quiz
-    all_attempts = QuizAttempt.query.filter_by(quiz_id=quiz.id, status='completed').all()
+    from models.quiz_stats import QuizStats
 
-    # Calculate general statistics
-    stats = calculate_quiz_statistics(all_attempts)
+    # Read general statistics from the per-quiz rollup
+    stats = QuizStats.summary_for(quiz.id)
 
     summary = {
         'quiz_info': {
@@ -226,8 +248,9 @@ def generate_quiz_summary_data(quiz, user_id=None):
     # Add user-specific data if user_id provided
     if user_id:
         user_attempts = quiz.get_user_attempts(user_id)
-        user_best_score = quiz.get_user_best_score(user_id)
-        can_attempt, message = quiz.can_user_attempt(user_id)
+        attempt_summary = quiz.get_user_attempt_summary(user_id)
+        user_best_score = quiz.get_user_best_score(user_id, summary=attempt_summary)
+        can_attempt, message = quiz.can_user_attempt(user_id, summary=attempt_summary)
 
         summary['user_data'] = {
             'attempts_count': len(user_attempts),
@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    """Opaque cursor for the last row of a page, e.g. its (created_at, id)"""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Inverse of encode_cursor; raises ValueError for a cursor this API did not issue"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+
+    try:
+        return [datetime.fromisoformat(value) if kind is datetime else kind(value)
+                for value, kind in zip(values, types)]
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_after(columns, values, descending=True):
+    """Filter for the rows after `values` in (columns...) order.
+
+    Written out as (a < x) OR (a = x AND b < y) rather than a row-value
+    comparison, which not every database supports. The redundant a <= x
+    bound lets the planner seek straight to the cursor in the composite
+    index instead of walking it from the start.
+    """
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        beyond = column < value if descending else column > value
+        clauses.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], beyond))
+
+    seek = columns[0] <= values[0] if descending else columns[0] >= values[0]
+    return and_(seek, or_(*clauses))
+
+
+def keyset_page(query, columns, cursor_values=None, limit=20, descending=True):
+    """Fetch one page ordered by `columns`; returns (rows, next cursor values or None)"""
+    if cursor_values is not None:
+        query = query.filter(keyset_after(columns, cursor_values, descending))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    # One extra row tells whether there is a next page without counting
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, [getattr(last, column.key) for column in columns]
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+import zlib
+
+from flask import Response, stream_with_context
+
+
+def iter_query(query, chunk_size=1000):
+    """Iterate a query's rows from a server-side cursor, chunk_size rows at a time"""
+    return query.execution_options(stream_results=True).yield_per(chunk_size)
+
+
+def csv_lines(rows, fields, serialize, chunk_size=1000):
+    """CSV text in chunks of about chunk_size rows, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+
+    count = 0
+    for row in rows:
+        writer.writerow(serialize(row))
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def ndjson_lines(rows, serialize, chunk_size=1000):
+    """One JSON object per line, in chunks of about chunk_size rows"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(serialize(row), default=str))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_export(query, fields, serialize, export_format, filename, chunk_size=1000, compress=False):
+    """Streamed CSV or NDJSON download of a query, without loading it into memory"""
+    rows = iter_query(query, chunk_size)
+
+    if export_format == 'ndjson':
+        body = ndjson_lines(rows, serialize, chunk_size)
+        mimetype = 'application/x-ndjson'
+    else:
+        body = csv_lines(rows, fields, serialize, chunk_size)
+        mimetype = 'text/csv'
+
+    filename = f'{filename}.{export_format}'
+    if compress:
+        # Sent as a .gz file rather than Content-Encoding so the download stays compressed on disk
+        body = gzip_chunks(body)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )